@@ -1,6 +1,10 @@
+import uuid
+
+import httpx
 import streamlit as st
 
-from app.graph.rag_graph import run_streaming_rag
+from app.api.client import stream_rag_events
+from app.utils.settings import settings
 
 # Configuração da Página e Título
 st.set_page_config(
@@ -14,6 +18,9 @@ st.write(
 # Gerenciamento do Histórico de Chat
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# Identifica a conversa no serviço: perguntas de seguimento usam o histórico da sessão
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -31,36 +38,76 @@ if prompt := st.chat_input("Ex: Quais os precedentes da súmula 70 vigente?"):
         details_expander = st.expander("🔎 **Detalhes da Busca (Self-Query)**")
         query_placeholder = details_expander.empty()
         filter_placeholder = details_expander.empty()
+        conversation_placeholder = details_expander.empty()
+        rerank_placeholder = details_expander.empty()
+        context_placeholder = details_expander.empty()
+        timings_placeholder = details_expander.empty()
         answer_placeholder = st.empty()
 
         full_answer = ""
 
-        # Chama a função do backend e processa os eventos
+        # Consome o serviço RAG (app.api.server) por SSE
         # Esta é a única interação entre o frontend e o backend!
-        for event in run_streaming_rag(prompt):
-            if event["type"] == "details":
-                data = event["data"]
-                query_placeholder.markdown(f"**Busca Semântica:** `{data['query']}`")
-                filter_placeholder.markdown(
-                    f"**Filtro de Metadados:** `{data['filter']}`"
-                )
+        try:
+            for event in stream_rag_events(prompt, session_id=st.session_state.session_id):
+                if event["type"] == "details":
+                    data = event["data"]
+                    query_placeholder.markdown(f"**Busca Semântica:** `{data['query']}`")
+                    filter_placeholder.markdown(
+                        f"**Filtro de Metadados:** `{data['filter']}`"
+                    )
+                    if data.get("conversation", {}).get("reused_docs"):
+                        conv = data["conversation"]
+                        conversation_placeholder.markdown(
+                            f"**Seguimento:** `{conv['standalone_question']}` "
+                            f"({conv['reused_docs']} trechos do turno anterior, sem nova busca)"
+                        )
+                    if "rerank" in data:
+                        rr = data["rerank"]
+                        rerank_placeholder.markdown(
+                            f"**Rerank:** {rr['kept']} de {rr['candidates']} trechos em {rr['latency_ms']:.1f} ms"
+                        )
+                    if "context" in data:
+                        ctx = data["context"]
+                        context_placeholder.markdown(
+                            f"**Contexto:** {ctx['tokens_kept']} de {ctx['tokens_in']} tokens, "
+                            f"{ctx['chunks_kept']} de {ctx['chunks_in']} trechos"
+                        )
+                    if "timings" in data:
+                        tm = data["timings"]
+                        steps = ", ".join(
+                            f"{name.removeprefix('node.')} {ms:.0f} ms" for name, ms in tm.items()
+                            if name.startswith("node.") and ms is not None
+                        )
+                        timings_placeholder.markdown(
+                            f"**Tempos:** {steps}; primeiro token em {tm.get('time_to_first_token') or 0:.0f} ms"
+                        )
+
+                elif event["type"] == "token":
+                    token = event["data"]
+                    full_answer += token
+                    answer_placeholder.markdown(full_answer + "▌")  # O ▌ simula um cursor
 
-            elif event["type"] == "token":
-                token = event["data"]
-                full_answer += token
-                answer_placeholder.markdown(full_answer + "▌")  # O ▌ simula um cursor
+                elif event["type"] == "sources":
+                    answer_placeholder.markdown(full_answer)  # Resposta final sem o cursor
+                    sources = event["data"]
+                    if sources:
+                        with st.expander("📚 **Fontes Utilizadas**"):
+                            for source in sources:
+                                st.markdown(
+                                    f"- **Arquivo:** `{source['pdf_name']}`\n"
+                                    f"- **Súmula:** `{source['num_sumula']}`\n"
+                                    f"- **Tipo:** `{source['chunk_type']}`"
+                                )
 
-            elif event["type"] == "sources":
-                answer_placeholder.markdown(full_answer)  # Resposta final sem o cursor
-                sources = event["data"]
-                if sources:
-                    with st.expander("📚 **Fontes Utilizadas**"):
-                        for source in sources:
-                            st.markdown(
-                                f"- **Arquivo:** `{source['pdf_name']}`\n"
-                                f"- **Súmula:** `{source['num_sumula']}`\n"
-                                f"- **Tipo:** `{source['chunk_type']}`"
-                            )
+                elif event["type"] == "error":
+                    answer_placeholder.markdown(full_answer)
+                    st.error(f"Erro no serviço RAG: {event['data']}")
+        except httpx.HTTPError as e:
+            st.error(
+                f"Serviço RAG indisponível em {settings.RAG_SERVICE_URL} ({e}). "
+                "Inicie-o com `python -m app.api.server`."
+            )
 
     # Adiciona a resposta completa ao histórico de chat
     st.session_state.messages.append({"role": "assistant", "content": full_answer})
@@ -0,0 +1,30 @@
+"""
+Cliente do serviço SSE (app.api.server), usado pelo app.py.
+Devolve os mesmos eventos de run_streaming_rag: details, token, sources (e error).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Generator, Optional
+
+import httpx
+
+from app.api.sse import parse_sse
+from app.utils.settings import settings
+
+# Sem limite de leitura: o primeiro token pode demorar; conexão e escrita continuam limitadas
+_TIMEOUT = httpx.Timeout(10.0, read=None)
+
+
+def stream_rag_events(
+    question: str, base_url: Optional[str] = None, session_id: Optional[str] = None
+) -> Generator[Dict[str, Any], None, None]:
+    """Com `session_id`, a pergunta continua a conversa da sessão no serviço."""
+    url = f"{(base_url or settings.RAG_SERVICE_URL).rstrip('/')}/ask"
+    payload = {"question": question, **({"session_id": session_id} if session_id else {})}
+    with httpx.stream("POST", url, json=payload, timeout=_TIMEOUT) as response:
+        if response.status_code != 200:
+            response.read()
+            message = response.json().get("error") if response.headers.get("content-type", "").startswith("application/json") else response.text
+            yield {"type": "error", "data": f"HTTP {response.status_code}: {message}"}
+            return
+        yield from parse_sse(response.iter_lines())
@@ -0,0 +1,269 @@
+"""
+Serviço ASGI que expõe o RAG (arun_streaming_rag) por Server-Sent Events.
+
+Rotas:
+- GET  /ask?question=...[&session_id=...]     (compatível com EventSource)
+- POST /ask  {"question": "...", "session_id": "..."}
+- GET  /health               (capacidade e ocupação do worker)
+- GET  /metrics              (métricas do worker no formato texto do Prometheus)
+
+Com `session_id`, a pergunta é um turno da conversa da sessão (memória em
+app.graph.memory); sem ele, é avulsa. Os eventos details/token/sources do RAG viram eventos SSE (ver app.api.sse); falhas
+durante a geração viram `event: error`. Cada worker limita as gerações simultâneas
+(SERVER_MAX_CONCURRENCY) e a fila de espera (SERVER_MAX_QUEUE / SERVER_QUEUE_TIMEOUT);
+acima disso responde 503 com Retry-After. O próximo evento só é pedido ao grafo depois
+que o anterior foi entregue ao servidor (`await send`), então um cliente lento segura a
+geração em vez de acumular tokens em memória. Se o cliente desconectar, a geração é
+cancelada.
+
+Execução (requer o extra `server`, com o uvicorn: `uv sync --extra server`):
+    python -m app.api.server            # SERVER_WORKERS processos, cada um com seus clientes
+    uvicorn app.api.server:app --workers 4
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.api.sse import format_sse
+from app.graph.rag_graph import arun_streaming_rag, start_warm_up, warm_up as warm_up_graph
+from app.utils import telemetry
+from app.utils.settings import settings
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+StreamFn = Callable[[str, Optional[str]], AsyncIterator[Dict[str, Any]]]
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """Vagas de geração por worker, com fila limitada e tempo máximo de espera."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("fila cheia")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("tempo de espera esgotado")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class RAGServer:
+    def __init__(
+        self,
+        stream_fn: Optional[StreamFn] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        warm_up: Optional[str] = None,
+    ) -> None:
+        self.stream_fn = stream_fn or arun_streaming_rag
+        self._limiter = limiter
+        # "background" (padrão), "blocking" ou "off"; ver SERVER_WARM_UP
+        self.warm_up = warm_up or settings.SERVER_WARM_UP
+
+    @property
+    def limiter(self) -> ConcurrencyLimiter:
+        # Criado dentro do event loop do worker (asyncio.Semaphore fica preso ao loop)
+        if self._limiter is None:
+            self._limiter = ConcurrencyLimiter(
+                settings.SERVER_MAX_CONCURRENCY, settings.SERVER_MAX_QUEUE, settings.SERVER_QUEUE_TIMEOUT
+            )
+        return self._limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if self.warm_up == "blocking":
+                    try:
+                        await asyncio.to_thread(warm_up_graph)
+                    except Exception as e:
+                        print(f"⚠️ Falha no aquecimento (seguindo sem): {e}")
+                elif self.warm_up == "background":
+                    # Aceita requisições já; as que chegarem antes pagam o que faltar
+                    start_warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path, method = scope["path"], scope["method"]
+        if path == "/health" and method == "GET":
+            await _send_json(send, 200, {"status": "ok", **self.limiter.as_dict()})
+            return
+        if path == "/metrics" and method == "GET":
+            await _send_metrics(send, self.limiter)
+            return
+        if path != "/ask" or method not in ("GET", "POST"):
+            await _send_json(send, 404, {"error": "rota não encontrada"})
+            return
+
+        question, session_id = await _read_request(scope, receive)
+        if not question:
+            await _send_json(send, 400, {"error": "informe `question`"})
+            return
+
+        try:
+            async with self.limiter.slot():
+                await self._stream(question, session_id, receive, send)
+        except Overloaded as e:
+            await _send_json(send, 503, {"error": f"serviço sobrecarregado ({e})"}, [(b"retry-after", b"1")])
+
+    async def _stream(self, question: str, session_id: Optional[str], receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+
+        async def pump() -> None:
+            events = self.stream_fn(question, session_id)
+            try:
+                async for event in events:
+                    await send({"type": "http.response.body", "body": format_sse(event["type"], event["data"]), "more_body": True})
+            except Exception as e:
+                print(f"⚠️ Erro ao gerar a resposta: {e}")
+                await send({"type": "http.response.body", "body": format_sse("error", str(e)), "more_body": True})
+            finally:
+                await events.aclose()
+
+        pump_task = asyncio.create_task(pump())
+        disconnect_task = asyncio.create_task(_wait_disconnect(receive))
+        done, _ = await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        if disconnect_task in done:
+            # Cliente foi embora: cancela o grafo (e as chamadas ao LLM em andamento)
+            pump_task.cancel()
+            await asyncio.gather(pump_task, return_exceptions=True)
+            return
+        disconnect_task.cancel()
+        await pump_task
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _wait_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _read_request(scope: Scope, receive: Receive) -> Tuple[str, Optional[str]]:
+    """Pergunta e session_id (None quando ausente ou vazio)."""
+    if scope["method"] == "GET":
+        params = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+        question, session_id = (params.get("question") or [""])[0], (params.get("session_id") or [""])[0]
+    else:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body") or len(body) > MAX_BODY_BYTES:
+                break
+        try:
+            data = json.loads(body or b"{}")
+            question, session_id = str(data.get("question") or ""), str(data.get("session_id") or "")
+        except (ValueError, AttributeError):
+            return "", None
+    return question.strip(), session_id.strip() or None
+
+
+async def _send_metrics(send: Send, limiter: ConcurrencyLimiter) -> None:
+    # Ocupação do worker como gauges, junto das métricas do RAG (app.utils.telemetry)
+    gauges = "".join(
+        f"# TYPE rag_server_{name} gauge\nrag_server_{name} {value}\n" for name, value in limiter.as_dict().items()
+    )
+    body = (telemetry.render_prometheus() + gauges).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send: Send, status: int, data: Dict[str, Any], headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+            + (headers or []),
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+app = RAGServer()
+
+
+def main() -> None:
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise ImportError("O servidor requer o pacote `uvicorn` (uv sync --extra server ou pip install uvicorn).") from e
+
+    uvicorn.run(
+        "app.api.server:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        lifespan="on",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Formato Server-Sent Events dos eventos do RAG (details, token, sources, error).
+
+Cada evento vira `event: <tipo>` + `data: <JSON>`; o JSON vai em uma única linha,
+então tokens com quebras de linha não quebram o protocolo.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+
+def format_sse(event_type: str, data: Any) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event_type}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class _SSEDecoder:
+    def __init__(self) -> None:
+        self.event_type = "message"
+        self.data_lines: List[str] = []
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        if not line:
+            return self.flush()
+        if line.startswith("event:"):
+            self.event_type = line[6:].strip()
+        elif line.startswith("data:"):
+            self.data_lines.append(line[5:].lstrip())
+        return None
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        event = None
+        if self.data_lines:
+            event = {"type": self.event_type, "data": json.loads("\n".join(self.data_lines))}
+        self.event_type, self.data_lines = "message", []
+        return event
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Converte as linhas de um stream SSE de volta em {"type", "data"}."""
+    decoder = _SSEDecoder()
+    for line in lines:
+        event = decoder.feed(line)
+        if event:
+            yield event
+    event = decoder.flush()
+    if event:
+        yield event
+
+
+async def aparse_sse(lines: AsyncIterable[str]) -> AsyncIterator[Dict[str, Any]]:
+    decoder = _SSEDecoder()
+    async for line in lines:
+        event = decoder.feed(line)
+        if event:
+            yield event
+    event = decoder.flush()
+    if event:
+        yield event
@@ -0,0 +1,298 @@
+"""
+Perguntas em lote para avaliações offline: lê um CSV ou JSONL de perguntas como stream
+e grava uma linha JSONL por pergunta (resposta, fontes, consulta e filtro) assim que ela
+termina. Uma execução interrompida retoma de onde parou: os ids já respondidos no
+arquivo de saída são pulados e as perguntas com erro são refeitas.
+
+As perguntas andam em lotes de BATCH_SIZE: as consultas do lote são construídas em
+paralelo (regras ou query constructor), a busca sai de uma vez (asearch_structured_batch:
+um embedding por lote e query_batch_points por filtro) e cada geração entra na fila do
+LLM enquanto o lote seguinte já é buscado. Query constructor e geração dividem as
+BATCH_LLM_CONCURRENCY vagas de chamadas simultâneas ao LLM. O cache de respostas é o
+mesmo das consultas avulsas.
+
+Uso:
+    python -m app.graph.batch perguntas.csv respostas.jsonl [--batch-size 32] [--concurrency 8]
+
+CSV: coluna `question` (ou `pergunta`) e, opcional, `id`; JSONL: objetos com os mesmos
+campos. Sem id, vale o número da pergunta no arquivo.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from langchain_core.documents import Document
+from langchain_core.structured_query import StructuredQuery
+
+from app.graph.context import pack_context
+from app.graph.rag_graph import (
+    COLLECTION_NAME,
+    QA_PROMPT,
+    TOP_K,
+    answer_chain,
+    format_filter_for_display,
+    format_sources,
+    rerank_candidates,
+    search_k,
+)
+from app.retrieval.retriever import SelfQueryConfig, aconstruct_query, asearch_structured_batch
+from app.utils import telemetry
+from app.utils.answer_cache import get_answer_cache
+from app.utils.settings import settings
+
+QUESTION_FIELDS = ("question", "pergunta")
+
+
+@dataclass
+class BatchQuestion:
+    id: str
+    question: str
+
+
+@dataclass
+class BatchReport:
+    questions: int = 0
+    skipped: int = 0
+    answered: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    searches: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        return (
+            f"{self.questions} perguntas ({self.skipped} já respondidas, puladas), {self.answered} respondidas "
+            f"({self.cache_hits} do cache), {self.errors} com erro, {self.searches} buscadas em lote "
+            f"em {self.elapsed:.1f}s — {self.questions / elapsed:.2f} perguntas/s"
+        )
+
+
+def iter_questions(path: str | Path) -> Iterator[BatchQuestion]:
+    """Perguntas do arquivo, lidas sob demanda (CSV ou JSONL, pela extensão)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Formato de perguntas não suportado: {path.name} (use .csv ou .jsonl)")
+    with open(path, encoding="utf-8", newline="") as f:
+        rows: Iterable[Dict[str, Any]] = csv.DictReader(f) if suffix == ".csv" else (json.loads(line) for line in f if line.strip())
+        for n, row in enumerate(rows, start=1):
+            question = next((str(row[field]).strip() for field in QUESTION_FIELDS if row.get(field)), "")
+            if not question:
+                print(f"⚠️ Pergunta {n} de {path.name} sem o campo question/pergunta; ignorada.")
+                continue
+            yield BatchQuestion(id=str(row.get("id") or n), question=question)
+
+
+def completed_ids(path: str | Path) -> Set[str]:
+    """
+    Ids já respondidos em uma saída anterior. Vale a última linha de cada id (uma
+    pergunta refeita após erro sai respondida) e a linha truncada pela interrupção é ignorada.
+    """
+    done: Set[str] = set()
+    path = Path(path)
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("error"):
+                done.discard(str(record["id"]))
+            else:
+                done.add(str(record["id"]))
+    return done
+
+
+class _ResultWriter:
+    """Saída JSONL em modo append: uma linha por pergunta, gravada (flush) assim que ela termina."""
+
+    def __init__(self, path: str | Path, report: BatchReport) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Linha incompleta de uma execução interrompida: a próxima começa em linha nova
+        truncated = path.exists() and path.stat().st_size and path.read_bytes()[-1:] != b"\n"
+        self.file = open(path, "a", encoding="utf-8")
+        if truncated:
+            self.file.write("\n")
+        self.report = report
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        if record.get("error"):
+            self.report.errors += 1
+        else:
+            self.report.answered += 1
+
+    def error(self, item: BatchQuestion, error: BaseException) -> None:
+        print(f"⚠️ Pergunta {item.id}: {type(error).__name__}: {error}")
+        self.write({"id": item.id, "question": item.question, "error": f"{type(error).__name__}: {error}"})
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _record(item: BatchQuestion, answer: str, sources: List[Dict[str, Any]], details: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": item.id, "question": item.question, "answer": answer, "sources": sources, "details": details, "error": None}
+
+
+async def _answer(
+    item: BatchQuestion,
+    structured_query: StructuredQuery,
+    docs: List[Document],
+    cache_key: Optional[str],
+    k: int,
+    llm_slots: asyncio.Semaphore,
+    writer: _ResultWriter,
+) -> None:
+    """Rerank, contexto e geração de uma pergunta já buscada; grava o resultado (ou o erro)."""
+    try:
+        docs, rerank_report = rerank_candidates(item.question, docs, k)
+        context, docs, context_report = pack_context(docs)
+        prompt = QA_PROMPT.invoke({"question": item.question, "context": context})
+        async with llm_slots:
+            with telemetry.span("generation"):
+                answer = await answer_chain().ainvoke(prompt)
+        sources = format_sources(docs)
+        details = {
+            "query": structured_query.query,
+            "filter": format_filter_for_display(structured_query.filter),
+            "cache": "miss" if cache_key else "skip",
+        }
+        if rerank_report is not None:
+            details["rerank"] = rerank_report.as_dict()
+        details["context"] = context_report.as_dict()
+        cache = get_answer_cache()
+        if cache is not None and cache_key is not None:
+            cache.set(cache_key, {"answer": answer, "sources": sources, "details": details})
+        writer.write(_record(item, answer, sources, details))
+    except Exception as e:
+        writer.error(item, e)
+
+
+async def _run_chunk(
+    chunk: List[BatchQuestion],
+    cfg: SelfQueryConfig,
+    k: int,
+    llm_slots: asyncio.Semaphore,
+    writer: _ResultWriter,
+    report: BatchReport,
+) -> List[asyncio.Task]:
+    """Consultas e busca do lote; devolve as tasks de geração (que seguem em paralelo)."""
+    with telemetry.span("batch", questions=len(chunk)) as span:
+        queries = await asyncio.gather(
+            *(aconstruct_query(item.question, cfg, llm_slots=llm_slots) for item in chunk), return_exceptions=True
+        )
+        cache = get_answer_cache()
+        pending = []
+        for item, structured_query in zip(chunk, queries):
+            if isinstance(structured_query, Exception):
+                writer.error(item, structured_query)
+                continue
+            cache_key = cached = None
+            if cache is not None:
+                cache_key = cache.make_key(item.question, structured_query.filter, cfg.collection_name, k)
+                cached = cache.get(cache_key)
+                telemetry.count("rag_answer_cache_total", result="hit" if cached else "miss")
+            if cached:
+                report.cache_hits += 1
+                writer.write(_record(item, cached["answer"], cached["sources"], {**cached["details"], "cache": "hit"}))
+                continue
+            pending.append((item, structured_query, cache_key))
+        span.set(searches=len(pending))
+        if not pending:
+            return []
+
+        try:
+            found = await asearch_structured_batch([(item.question, sq) for item, sq, _ in pending], cfg)
+        except Exception as e:
+            for item, _, _ in pending:
+                writer.error(item, e)
+            return []
+        report.searches += len(pending)
+    return [
+        asyncio.create_task(_answer(item, structured_query, docs, cache_key, k, llm_slots, writer))
+        for (item, structured_query, cache_key), docs in zip(pending, found)
+    ]
+
+
+async def arun_batch(
+    source: str | Path,
+    output: str | Path,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    collection_name: str = COLLECTION_NAME,
+    k: int = TOP_K,
+) -> BatchReport:
+    """
+    Responde as perguntas de `source` e grava os resultados em `output` (JSONL, append).
+    Gerações pendentes ficam limitadas a dois lotes: a leitura do arquivo não se adianta
+    além do que o LLM consegue acompanhar.
+    """
+    batch_size = batch_size or settings.BATCH_SIZE
+    llm_slots = asyncio.Semaphore(concurrency or settings.BATCH_LLM_CONCURRENCY)
+    # Busca e rerank como no grafo: k × RERANK_OVERFETCH candidatos quando o rerank está ligado
+    cfg = SelfQueryConfig(collection_name=collection_name, k=search_k(k))
+    done = completed_ids(output)
+    report = BatchReport()
+    start = time.perf_counter()
+
+    def remaining() -> Iterator[BatchQuestion]:
+        for item in iter_questions(source):
+            if item.id in done:
+                report.skipped += 1
+            else:
+                report.questions += 1
+                yield item
+
+    writer = _ResultWriter(output, report)
+    pending: Set[asyncio.Task] = set()
+    try:
+        questions = remaining()
+        while chunk := list(islice(questions, batch_size)):
+            pending.update(await _run_chunk(chunk, cfg, k, llm_slots, writer, report))
+            while len(pending) > batch_size:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            await asyncio.wait(pending)
+    finally:
+        for task in pending:
+            task.cancel()
+        writer.close()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def run_batch(source: str | Path, output: str | Path, **kwargs: Any) -> BatchReport:
+    """Versão síncrona de arun_batch (roda o próprio event loop)."""
+    return asyncio.run(arun_batch(source, output, **kwargs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Responde perguntas em lote (CSV/JSONL) e grava os resultados em JSONL.")
+    parser.add_argument("source", help="arquivo de perguntas (.csv ou .jsonl)")
+    parser.add_argument("output", help="arquivo JSONL de saída (retoma se já existir)")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"perguntas por lote (padrão: {settings.BATCH_SIZE})")
+    parser.add_argument(
+        "--concurrency", type=int, default=None, help=f"chamadas simultâneas ao LLM (padrão: {settings.BATCH_LLM_CONCURRENCY})"
+    )
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    report = run_batch(
+        args.source, args.output, batch_size=args.batch_size, concurrency=args.concurrency, collection_name=args.collection
+    )
+    print(f"✅ {report.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Montagem do contexto da geração dentro de um orçamento de tokens.
+
+Em vez de concatenar todos os trechos recuperados, o contexto:
+- descarta trechos repetidos da mesma súmula (mesmo chunk_type, ou texto contido em
+  outro trecho da súmula), mantendo o de maior score;
+- ordena por score (o do rerank, quando houver) e, no empate (ou sem score, nas buscas só por filtro), pela
+  prioridade do tipo: conteudo_principal > referencias_normativas > precedentes;
+- inclui os trechos nessa ordem até CONTEXT_TOKEN_BUDGET. Um trecho que não cabe
+  inteiro é cortado por linhas (listas de precedentes perdem os itens finais) se
+  ainda sobrar espaço útil; senão fica de fora. Assim o que sai primeiro é sempre o
+  conteúdo de menor valor.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens
+
+CHUNK_PRIORITY = {"conteudo_principal": 0, "referencias_normativas": 1, "precedentes": 2}
+SEPARATOR = "\n\n---\n\n"
+# Abaixo disso não vale cortar um trecho: fica de fora
+MIN_TRIM_TOKENS = 64
+
+
+@dataclass
+class PackReport:
+    budget: int
+    tokens_in: int = 0
+    tokens_kept: int = 0
+    chunks_in: int = 0
+    chunks_kept: int = 0
+    duplicates: int = 0
+    dropped: List[str] = field(default_factory=list)
+    trimmed: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        return (
+            f"Contexto: {self.tokens_kept}/{self.tokens_in} tokens (orçamento {self.budget}), "
+            f"{self.chunks_kept}/{self.chunks_in} trechos, {self.duplicates} duplicados, "
+            f"{len(self.dropped)} descartados, {len(self.trimmed)} cortados"
+        )
+
+
+def _label(doc: Document) -> str:
+    md = doc.metadata or {}
+    return f"{md.get('num_sumula', '?')}:{md.get('chunk_type', 'chunk')}"
+
+
+def _header(doc: Document) -> str:
+    md = doc.metadata or {}
+    return (
+        f"[{md.get('pdf_name', '?')} | Súmula {md.get('num_sumula', '?')} | {md.get('chunk_type', 'chunk')}]"
+        f"\nstatus_atual: {md.get('status_atual', 'não informado')}"
+        f"\ndata_status: {md.get('data_status', 'não informado')}"
+    )
+
+
+def format_doc(doc: Document) -> str:
+    return f"{_header(doc)}\n\n{doc.page_content}"
+
+
+def _score(doc: Document) -> Optional[float]:
+    md = doc.metadata or {}
+    return md.get("rerank_score", md.get("score"))
+
+
+def _key(doc: Document) -> Tuple[Any, Any]:
+    md = doc.metadata or {}
+    return (md.get("num_sumula"), md.get("chunk_type"))
+
+
+def _normalized(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def dedupe(docs: List[Document]) -> Tuple[List[Document], int]:
+    """Remove trechos repetidos da mesma súmula, mantendo o de maior score (ou o primeiro)."""
+    best: Dict[Tuple[Any, Any], Document] = {}
+    for doc in docs:
+        current = best.get(_key(doc))
+        if current is None or (_score(doc) or 0.0) > (_score(current) or 0.0):
+            best[_key(doc)] = doc
+    unique = [doc for doc in docs if best[_key(doc)] is doc]
+
+    # Trecho cujo texto já aparece inteiro em outro trecho da mesma súmula
+    texts = [_normalized(doc.page_content) for doc in unique]
+    kept = []
+    for i, doc in enumerate(unique):
+        num = (doc.metadata or {}).get("num_sumula")
+        contained = any(
+            j != i
+            and (unique[j].metadata or {}).get("num_sumula") == num
+            and texts[i] in texts[j]
+            and (len(texts[i]) < len(texts[j]) or j < i)
+            for j in range(len(unique))
+        )
+        if not contained:
+            kept.append(doc)
+    return kept, len(docs) - len(kept)
+
+
+def _rank(docs: List[Document]) -> List[Document]:
+    def key(item: Tuple[int, Document]) -> Tuple[float, int, int]:
+        position, doc = item
+        priority = CHUNK_PRIORITY.get((doc.metadata or {}).get("chunk_type"), len(CHUNK_PRIORITY))
+        return (-(_score(doc) or 0.0), priority, position)
+
+    return [doc for _, doc in sorted(enumerate(docs), key=key)]
+
+
+def _trim(doc: Document, max_tokens: int) -> Optional[Document]:
+    """Mantém as primeiras linhas do trecho que cabem em `max_tokens` (com o cabeçalho)."""
+    lines = doc.page_content.splitlines()
+    kept: List[str] = []
+    for line in lines:
+        candidate = kept + [line, f"[... {len(lines) - len(kept) - 1} linhas omitidas]"]
+        if count_tokens(format_doc(Document(page_content="\n".join(candidate), metadata=doc.metadata))) > max_tokens:
+            break
+        kept.append(line)
+    if not kept:
+        return None
+    omitted = len(lines) - len(kept)
+    if omitted:
+        kept.append(f"[... {omitted} linhas omitidas]")
+    return Document(page_content="\n".join(kept), metadata=doc.metadata)
+
+
+def pack_context(docs: List[Document], budget: Optional[int] = None) -> Tuple[str, List[Document], PackReport]:
+    """Retorna (contexto, trechos incluídos, relatório) respeitando o orçamento de tokens."""
+    budget = settings.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    report = PackReport(budget=budget, chunks_in=len(docs))
+    report.tokens_in = count_tokens(SEPARATOR.join(format_doc(d) for d in docs)) if docs else 0
+
+    unique, report.duplicates = dedupe(docs)
+    separator_tokens = count_tokens(SEPARATOR)
+    kept: List[Document] = []
+    used = 0
+    for doc in _rank(unique):
+        overhead = separator_tokens if kept else 0
+        remaining = budget - used - overhead
+        tokens = count_tokens(format_doc(doc))
+        if tokens <= remaining:
+            kept.append(doc)
+            used += overhead + tokens
+            continue
+        trimmed = _trim(doc, remaining) if remaining >= MIN_TRIM_TOKENS else None
+        if trimmed is None:
+            report.dropped.append(_label(doc))
+            continue
+        kept.append(trimmed)
+        used += overhead + count_tokens(format_doc(trimmed))
+        report.trimmed.append(_label(doc))
+
+    context = SEPARATOR.join(format_doc(d) for d in kept)
+    report.tokens_kept = count_tokens(context) if kept else 0
+    report.chunks_kept = len(kept)
+    return context, kept, report
@@ -0,0 +1,197 @@
+"""
+Memória das conversas (session_id -> thread do LangGraph).
+
+- Checkpointer do grafo das conversas (CONVERSATION_BACKEND): SQLite local ("sqlite",
+  padrão: SqliteSaver/AsyncSqliteSaver do langgraph-checkpoint-sqlite), memória do
+  processo ("memory") ou nenhum ("none": sem sessões, toda pergunta é avulsa). Sessões
+  paradas há mais de CONVERSATION_TTL segundos são apagadas na abertura do banco.
+- Seguimentos: regras decidem se a pergunta depende do turno anterior; quando ela cita
+  pelo número a mesma súmula do turno anterior, os trechos já recuperados são
+  reaproveitados (sem busca nem embedding). Referências sem número ("dela", "dessa
+  súmula") são reescritas pelo LLM, e a pergunta reescrita decide o reaproveitamento.
+- Histórico do prompt limitado em turnos e tokens (CONVERSATION_MAX_TURNS,
+  CONVERSATION_HISTORY_TOKENS).
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Set
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.structured_query import Comparison, Operation
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.base.id import UUID
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.retrieval.query_parser import fold, parse_query, sumula_numbers
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+
+# Intervalos de 100 ns entre a época dos UUIDs (1582-10-15) e a do Unix: os ids dos
+# checkpoints são UUID v6, com o instante da gravação
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def expire_sessions(checkpointer: SqliteSaver, ttl: float) -> int:
+    """Apaga as sessões (threads) sem checkpoint novo há mais de `ttl` segundos; devolve quantas."""
+    checkpointer.setup()
+    cutoff = int((time.time() - ttl) * 10**7) + _UUID_EPOCH_OFFSET
+    with checkpointer.cursor(transaction=False) as cur:
+        latest = cur.execute("SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id").fetchall()
+    stale = [thread_id for thread_id, checkpoint_id in latest if UUID(checkpoint_id).time < cutoff]
+    for thread_id in stale:
+        checkpointer.delete_thread(thread_id)
+    return len(stale)
+
+
+_checkpointer_lock = threading.Lock()
+_checkpointer: Optional[BaseCheckpointSaver] = None
+
+
+def get_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """Checkpointer configurado em settings.CONVERSATION_BACKEND (None quando desativado)."""
+    global _checkpointer
+    backend_name = settings.CONVERSATION_BACKEND
+    if backend_name == "none":
+        return None
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                if backend_name == "sqlite":
+                    Path(settings.CONVERSATION_PATH).parent.mkdir(parents=True, exist_ok=True)
+                    saver = SqliteSaver(sqlite3.connect(settings.CONVERSATION_PATH, check_same_thread=False))
+                    if settings.CONVERSATION_TTL:
+                        expire_sessions(saver, settings.CONVERSATION_TTL)
+                    _checkpointer = saver
+                else:
+                    _checkpointer = InMemorySaver()
+    return _checkpointer
+
+
+def set_checkpointer(checkpointer: Optional[BaseCheckpointSaver]) -> None:
+    global _checkpointer
+    with _checkpointer_lock:
+        _checkpointer = checkpointer
+
+
+@asynccontextmanager
+async def async_checkpointer() -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    """
+    Checkpointer das consultas assíncronas. Com "sqlite", um AsyncSqliteSaver sobre o
+    mesmo arquivo, aberto pela consulta e fechado no fim (a conexão aiosqlite tem thread
+    própria e fica presa ao event loop que a abriu); nos outros backends, o de get_checkpointer.
+    """
+    checkpointer = get_checkpointer()
+    if not isinstance(checkpointer, SqliteSaver):
+        yield checkpointer
+        return
+    async with AsyncSqliteSaver.from_conn_string(settings.CONVERSATION_PATH) as saver:
+        yield saver
+
+
+# --- Seguimentos -----------------------------------------------------------------
+# "e" no início ("e os precedentes?", "e quanto à vigência?"), sobre o texto original:
+# o "É" de "É possível...?" vira "e" quando os acentos são retirados
+_CONJUNCTION_RE = re.compile(r"^\s*[eE]\s")
+# Pronomes e demonstrativos que apontam para o turno anterior (texto sem acentos e em minúsculas)
+_FOLLOW_UP_RE = re.compile(
+    r"\b(?:dela|nela|ela|dessa|desta|nessa|nesta|daquela|naquela)\b"
+    r"|\b(?:essa|esta|aquela|mesma)\s+(?:sumula|orientacao|enunciado|entendimento)\b"
+)
+
+
+@dataclass
+class FollowUp:
+    """Como tratar a pergunta em relação ao turno anterior."""
+
+    standalone_question: str
+    follow_up: bool = False
+    sumula: Optional[str] = None  # súmula apontada (pelas regras ou pela pergunta reescrita)
+    kind: str = "new_topic"  # "new_topic", "rules" ou "condense"
+    needs_condense: bool = False  # referência que as regras não resolvem: o LLM reescreve
+
+
+def resolve_follow_up(question: str, previous_sumulas: List[str]) -> FollowUp:
+    """
+    Regras, sem LLM. Súmula citada pelo número: a pergunta já é autônoma (e reaproveita
+    os trechos quando é a mesma do turno anterior). Referência sem número ("e os
+    precedentes dela?"): reescrita pelo LLM, que decide a súmula pelo histórico. Sem
+    referência: assunto novo.
+    """
+    numbers = sumula_numbers(question)
+    anaphoric = bool(_CONJUNCTION_RE.match(question) or _FOLLOW_UP_RE.search(fold(question)))
+    if numbers:
+        sumula = numbers[0] if len(numbers) == 1 else None
+        follow_up = anaphoric or sumula in previous_sumulas
+        return FollowUp(question, follow_up=follow_up, sumula=sumula, kind="rules" if follow_up else "new_topic")
+    if not anaphoric:
+        return FollowUp(question)
+    return FollowUp(question, follow_up=True, kind="condense", needs_condense=True)
+
+
+def condensed(standalone_question: str) -> FollowUp:
+    """Seguimento a partir da pergunta reescrita pelo LLM."""
+    numbers = sumula_numbers(standalone_question)
+    return FollowUp(standalone_question, follow_up=True, sumula=numbers[0] if len(numbers) == 1 else None, kind="condense")
+
+
+def sumulas_of(docs: List[Document]) -> List[str]:
+    """Súmulas dos trechos, na ordem em que aparecem."""
+    return list(dict.fromkeys(str(d.metadata["num_sumula"]) for d in docs if d.metadata.get("num_sumula") is not None))
+
+
+def _filter_values(directive: Any, attribute: str) -> Set[str]:
+    if isinstance(directive, Comparison):
+        return {str(directive.value)} if directive.attribute == attribute else set()
+    if isinstance(directive, Operation):
+        return set().union(*(_filter_values(arg, attribute) for arg in directive.arguments))
+    return set()
+
+
+def reusable_docs(candidates: List[Document], sumula: str, question: str) -> List[Document]:
+    """
+    Trechos já recuperados da súmula apontada, restritos ao tipo pedido (ex.: precedentes).
+    Vazio quando o tipo pedido não está entre eles: aí o turno faz a busca normal.
+    """
+    docs = [d for d in candidates if str(d.metadata.get("num_sumula")) == sumula]
+    parsed = parse_query(question)
+    wanted = _filter_values(parsed.structured_query.filter, "chunk_type") if parsed else set()
+    if wanted:
+        docs = [d for d in docs if d.metadata.get("chunk_type") in wanted]
+    # Cópias: o rerank grava o score novo nos metadados
+    return [Document(page_content=d.page_content, metadata=dict(d.metadata), id=d.id) for d in docs]
+
+
+def bounded_history(
+    messages: List[BaseMessage],
+    max_turns: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> List[BaseMessage]:
+    """
+    Últimos turnos (pergunta + resposta) que cabem no orçamento, do mais recente para o
+    mais antigo; a resposta que não cabe inteira é cortada e encerra o histórico.
+    """
+    max_turns = settings.CONVERSATION_MAX_TURNS if max_turns is None else max_turns
+    budget = settings.CONVERSATION_HISTORY_TOKENS if max_tokens is None else max_tokens
+    turns = [messages[i:i + 2] for i in range(0, len(messages) - 1, 2)][-max_turns:] if max_turns > 0 else []
+    kept: List[BaseMessage] = []
+    for human, ai in reversed(turns):
+        question_tokens = count_tokens(human.content)
+        if question_tokens >= budget:
+            break
+        answer = truncate_to_tokens(ai.content, budget - question_tokens)
+        budget -= question_tokens + count_tokens(answer)
+        kept[:0] = [human, ai if answer == ai.content else AIMessage(content=answer)]
+        if answer != ai.content:
+            break
+    return kept
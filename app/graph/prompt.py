@@ -24,3 +24,15 @@ Estruture sua resposta da seguinte maneira:
 - Fundamente TODA a sua resposta *exclusivamente* no contexto fornecido.
 - Não adicione opiniões, interpretações, exemplos ou informações externas de qualquer natureza. Apenas transcreva o que está no contexto.
 """
+
+
+CONDENSE_SYSTEM_PROMPT = """
+Você reescreve perguntas de uma conversa sobre as súmulas do tribunal.
+
+Com base no histórico, reescreva a última pergunta do usuário como uma pergunta autônoma,
+que possa ser entendida sem o histórico: substitua referências como "ela", "dessa súmula"
+ou "a anterior" pelo número da súmula a que se referem (ex.: "Súmula 70") e mantenha os
+demais termos da pergunta.
+
+Responda somente com a pergunta autônoma, sem explicações.
+"""
@@ -1,34 +1,96 @@
-from typing import Annotated, List, Dict, Any, Generator, TypedDict
+"""
+Grafo LangGraph do RAG (analyze -> retrieve -> rerank -> pack -> generate) e os pontos
+de entrada de streaming.
+
+Com session_id, a consulta roda no grafo das conversas (checkpointer de app.graph.memory,
+uma thread por sessão): `contextualize` na entrada resolve seguimentos e, quando a
+pergunta volta à súmula do turno anterior, pula direto para o rerank com os trechos já
+recuperados; `remember` no fim grava o turno no histórico.
+
+O import do módulo é leve: clientes e integrações pesadas (OpenAI, Qdrant, retriever)
+são importados na primeira consulta, o grafo é compilado em get_compiled_graph() e
+warm_up() / start_warm_up() adiantam tudo isso (em segundo plano, no caso do serviço).
+"""
+from contextlib import aclosing, closing, nullcontext
+from functools import partial
+from typing import Annotated, List, Dict, Any, AsyncGenerator, Callable, Generator, Optional, Tuple, TypedDict
 import re
+import threading
+import time
 
 from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompt_values import PromptValue
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langchain_core.structured_query import StructuredQuery
-from langfuse.langchain import CallbackHandler
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from app.retrieval.rerank import RerankReport, rerank as rerank_docs
+from app.graph.context import PackReport, SEPARATOR, format_doc, pack_context
+from app.graph.memory import (
+    FollowUp,
+    async_checkpointer,
+    bounded_history,
+    condensed,
+    get_checkpointer,
+    resolve_follow_up,
+    reusable_docs,
+    sumulas_of,
+)
+from app.graph.prompt import CONDENSE_SYSTEM_PROMPT, SYSTEM_PROMPT_JURIDICO
+from app.utils import telemetry
+from app.utils.answer_cache import get_answer_cache
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens
 
-from app.ingest.embed_qdrant import EmbeddingSelfQuery
-from app.retrieval.retriever import build_self_query_retriever, SelfQueryConfig
-from app.graph.prompt import SYSTEM_PROMPT_JURIDICO
+COLLECTION_NAME = settings.COLLECTION_NAME
+TOP_K = 5
 
-langfuse_handler = CallbackHandler()
+QA_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_PROMPT_JURIDICO),
+        # Turnos anteriores da sessão (vazio nas perguntas avulsas)
+        MessagesPlaceholder("history", optional=True),
+        (
+            "human",
+            "Pergunta: {question}\n\nContexto (trechos):\n{context}\n\nResponda de forma direta. Ao final, liste fontes no formato: (Status da Súmula: metadata.status_atual, Número da Súmula: metadata.num_sumula, Data da Publicação:  metadata.data_status).",
+        ),
+    ]
+)
+
+CONDENSE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", CONDENSE_SYSTEM_PROMPT),
+        MessagesPlaceholder("history"),
+        ("human", "{question}"),
+    ]
+)
 
 
 # Definição do Estado do Grafo
 class RAGState(TypedDict):
     question: str
+    # Pergunta autônoma do turno (conversas): a da busca, do rerank e da geração
+    standalone_question: str
+    conversation: Dict[str, Any]
+    structured_query: StructuredQuery
     docs: List[Document]
-    answer: Generator[str, None, None]
+    # Candidatos da última busca, guardados na sessão para os seguimentos
+    retrieved_docs: List[Document]
+    rerank_report: RerankReport
+    context: str
+    context_report: PackReport
+    answer: str
     generated_query: str
     generated_filter: str
     messages: Annotated[list, add_messages]
 
 
 # --- Funções Auxiliares ---
-def _format_filter_for_display(filter_obj: Any) -> str:
+def format_filter_for_display(filter_obj: Any) -> str:
     """Formata o filtro do LangChain para uma exibição mais amigável."""
     if not filter_obj:
         return "Nenhum filtro aplicado."
@@ -45,138 +107,596 @@ def _format_filter_for_display(filter_obj: Any) -> str:
 
 
 def _format_docs(docs: List[Document]) -> str:
-    parts = []
-    for d in docs:
-        md = d.metadata or {}
-        head = (
-            f"[{md.get('pdf_name', '?')} | Súmula {md.get('num_sumula', '?')} | {md.get('chunk_type', 'chunk')}]"
-            f"\nstatus_atual: {md.get('status_atual', 'não informado')}"
-            f"\ndata_status: {md.get('data_status', 'não informado')}"
-        )
-        parts.append(f"{head}\n\n{d.page_content}")
-    return "\n\n---\n\n".join(parts)
+    """Todos os trechos, sem orçamento (o nó `pack` monta o contexto da geração)."""
+    return SEPARATOR.join(format_doc(d) for d in docs)
+
+
+def format_sources(docs: List[Document]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "pdf_name": d.metadata.get("pdf_name"),
+            "data_status": d.metadata.get("data_status"),
+            "data_status_ano": d.metadata.get("data_status_ano"),
+            "status_atual": d.metadata.get("status_atual"),
+            "num_sumula": d.metadata.get("num_sumula"),
+            "chunk_type": d.metadata.get("chunk_type"),
+        }
+        for d in docs
+    ]
+
+
+def search_k(k: int) -> int:
+    """Candidatos buscados para entregar k trechos: com o rerank, k × RERANK_OVERFETCH."""
+    return k * settings.RERANK_OVERFETCH if settings.RERANK_ENABLED else k
+
+
+def rerank_candidates(question: str, docs: List[Document], k: int) -> Tuple[List[Document], Optional[RerankReport]]:
+    """Até k trechos dos candidatos: repontuados quando RERANK_ENABLED (senão, na ordem da busca e sem relatório)."""
+    if not settings.RERANK_ENABLED:
+        return docs[:k], None
+    return rerank_docs(question, docs, k)
+
+
+def _question(state: RAGState) -> str:
+    return state.get("standalone_question") or state["question"]
 
 
 # --- Nós do Grafo ---
-def retrieve(
+# Cada nó tem a versão síncrona (get_compiled_graph().stream) e a assíncrona (astream).
+def contextualize(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Nó de entrada das conversas: resolve a pergunta em relação ao turno anterior
+    (regras; o LLM só reescreve referências ambíguas) e, se ela aponta para a mesma
+    súmula, devolve os trechos já recuperados, que seguem direto para o rerank.
+    """
+    follow_up = _resolve_follow_up(state)
+    if follow_up.needs_condense:
+        with telemetry.span("condense"):
+            follow_up = condensed(_condense_chain().invoke(_condense_input(state), config=config).strip())
+    return _contextualize_output(state, follow_up)
+
+
+async def acontextualize(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    follow_up = _resolve_follow_up(state)
+    if follow_up.needs_condense:
+        with telemetry.span("condense"):
+            follow_up = condensed((await _condense_chain().ainvoke(_condense_input(state), config=config)).strip())
+    return _contextualize_output(state, follow_up)
+
+
+def _resolve_follow_up(state: RAGState) -> FollowUp:
+    if not state.get("messages"):
+        return FollowUp(state["question"])
+    # As fontes do turno anterior (trechos que entraram no contexto) dizem de que súmula se falava
+    return resolve_follow_up(state["question"], sumulas_of(state.get("docs") or []))
+
+
+def _condense_chain():
+    from app.ingest.embed_qdrant import get_shared_embedder
+
+    return CONDENSE_PROMPT | get_shared_embedder().llm | StrOutputParser()
+
+
+def _condense_input(state: RAGState) -> Dict[str, Any]:
+    return {"question": state["question"], "history": bounded_history(state.get("messages") or [])}
+
+
+def _contextualize_output(state: RAGState, follow_up: FollowUp) -> Dict[str, Any]:
+    history = state.get("messages") or []
+    docs: List[Document] = []
+    if history and follow_up.sumula and settings.CONVERSATION_REUSE_DOCS:
+        docs = reusable_docs(state.get("retrieved_docs") or [], follow_up.sumula, follow_up.standalone_question)
+
+    kind = follow_up.kind if history else "first"
+    conversation = {
+        "turn": (state.get("conversation") or {}).get("turn", 0) + 1 if history else 1,
+        "kind": kind,
+        "standalone_question": follow_up.standalone_question,
+        "reused_docs": len(docs),
+    }
+    telemetry.count("rag_conversation_turns_total", kind=kind, reused=bool(docs))
+    output: Dict[str, Any] = {"standalone_question": follow_up.standalone_question, "conversation": conversation}
+    if docs:
+        output.update(
+            docs=docs,
+            generated_query=follow_up.standalone_question,
+            generated_filter=f"num_sumula = '{follow_up.sumula}' (trechos do turno anterior)",
+        )
+    return output
+
+
+def _route_turn(state: RAGState) -> str:
+    return "reuse" if state["conversation"]["reused_docs"] else "search"
+
+
+def analyze(
     state: RAGState,
     config: RunnableConfig,
-    collection_name: str = "sumulas_jornada",
+    collection_name: str = COLLECTION_NAME,
     k: int = 5,
 ) -> Dict[str, Any]:
-    """Nó que executa o SelfQueryRetriever e extrai os detalhes da consulta gerada."""
-    print("Executando o nó de recuperação...")
+    """Nó que gera o StructuredQuery (regras ou uma única chamada ao LLM) e os detalhes para exibição."""
+    from app.retrieval.retriever import SelfQueryConfig, construct_query
+
     cfg = SelfQueryConfig(collection_name=collection_name, k=k)
-    retriever = build_self_query_retriever(cfg)
+    structured_query: StructuredQuery = construct_query(_question(state), cfg, config=config)
+    return _analyze_output(structured_query)
 
-    structured_query: StructuredQuery = retriever.query_constructor.invoke(
-        {"query": state["question"]}, config=config
-    )
-    docs = retriever.invoke(state["question"], config=config)
 
-    print(f"Busca finalizada. Encontrados {len(docs)} documentos.")
+async def aanalyze(
+    state: RAGState,
+    config: RunnableConfig,
+    collection_name: str = COLLECTION_NAME,
+    k: int = 5,
+) -> Dict[str, Any]:
+    from app.retrieval.retriever import SelfQueryConfig, aconstruct_query
+
+    cfg = SelfQueryConfig(collection_name=collection_name, k=k)
+    structured_query = await aconstruct_query(_question(state), cfg, config=config)
+    return _analyze_output(structured_query)
+
+
+def _analyze_output(structured_query: StructuredQuery) -> Dict[str, Any]:
     return {
-        "docs": docs,
+        "structured_query": structured_query,
         "generated_query": structured_query.query,
-        "generated_filter": _format_filter_for_display(structured_query.filter),
+        "generated_filter": format_filter_for_display(structured_query.filter),
     }
 
 
-def generate_stream(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
-    """Nó que gera a resposta final em formato de stream."""
+def retrieve(
+    state: RAGState,
+    config: RunnableConfig,
+    collection_name: str = COLLECTION_NAME,
+    k: int = 5,
+) -> Dict[str, Any]:
+    """Nó que executa a busca com o StructuredQuery gerado em `analyze`."""
+    from app.retrieval.retriever import SelfQueryConfig, search_structured
+
+    print("Executando o nó de recuperação...")
+    cfg = SelfQueryConfig(collection_name=collection_name, k=k)
+    docs = search_structured(_question(state), state["structured_query"], cfg)
+    telemetry.count("rag_documents_total", len(docs), stage="retrieve")
+
+    print(f"Busca finalizada. Encontrados {len(docs)} documentos.")
+    return {"docs": docs, "retrieved_docs": docs}
+
+
+async def aretrieve(
+    state: RAGState,
+    config: RunnableConfig,
+    collection_name: str = COLLECTION_NAME,
+    k: int = 5,
+) -> Dict[str, Any]:
+    from app.retrieval.retriever import SelfQueryConfig, asearch_structured
+
+    cfg = SelfQueryConfig(collection_name=collection_name, k=k)
+    docs = await asearch_structured(_question(state), state["structured_query"], cfg)
+    telemetry.count("rag_documents_total", len(docs), stage="retrieve")
+    return {"docs": docs, "retrieved_docs": docs}
+
+
+def _record_summary(summary: str) -> None:
+    # No span do nó (node.rerank / node.pack), em vez de imprimir a cada requisição
+    span = telemetry.current_span()
+    if span is not None:
+        span.set(summary=summary)
+
+
+def rerank(state: RAGState, config: RunnableConfig, k: int = 5) -> Dict[str, Any]:
+    """Nó que repontua os candidatos da busca e mantém até k (ver app.retrieval.rerank)."""
+    docs, report = rerank_docs(_question(state), state.get("docs", []), k)
+    _record_summary(report.summary())
+    return {"docs": docs, "rerank_report": report}
+
+
+async def arerank(state: RAGState, config: RunnableConfig, k: int = 5) -> Dict[str, Any]:
+    return rerank(state, config, k)
+
+
+def pack(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    """Nó que monta o contexto dentro de CONTEXT_TOKEN_BUDGET (ver app.graph.context)."""
+    context, docs, report = pack_context(state.get("docs", []))
+    telemetry.count("rag_tokens_total", report.tokens_kept, kind="context")
+    telemetry.count("rag_documents_total", len(docs), stage="context")
+    _record_summary(report.summary())
+    return {"context": context, "docs": docs, "context_report": report}
+
+
+async def apack(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    return pack(state, config)
+
+
+def answer_chain():
+    from app.ingest.embed_qdrant import get_shared_embedder
+
+    return get_shared_embedder().llm | StrOutputParser()
+
+
+def _qa_input(state: RAGState) -> Dict[str, Any]:
+    return {"question": _question(state), "context": state["context"], "history": bounded_history(state.get("messages") or [])}
+
+
+def _build_prompt(state: RAGState, config: RunnableConfig) -> PromptValue:
+    with telemetry.span("prompt_build") as span:
+        prompt = QA_PROMPT.invoke(_qa_input(state), config=config)
+        tokens = count_tokens(prompt.to_string())
+        span.set(prompt_tokens=tokens)
+        telemetry.count("rag_tokens_total", tokens, kind="prompt")
+    return prompt
+
+
+def _record_chunk(span: telemetry.SpanRecord, parts: List[str], chunk: str, start: float) -> None:
+    if chunk and "ttft_ms" not in span.attributes:
+        ttft = time.perf_counter() - start
+        span.set(ttft_ms=round(ttft * 1000, 2))
+        telemetry.observe("rag_time_to_first_token_seconds", ttft)
+    parts.append(chunk)
+
+
+def _finish_generation(span: telemetry.SpanRecord, parts: List[str]) -> Dict[str, Any]:
+    answer = "".join(parts)
+    tokens = count_tokens(answer)
+    span.set(completion_tokens=tokens)
+    telemetry.count("rag_tokens_total", tokens, kind="completion")
+    return {"answer": answer}
+
+
+def generate(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Nó que gera a resposta final. Os tokens chegam ao chamador pelo stream_mode
+    "messages" do grafo enquanto o LLM responde, dentro do nó (e do seu trace);
+    o span "generation" guarda o tempo até o primeiro token e os tokens da resposta.
+    """
     print("Executando o nó de geração...")
-    QA_PROMPT = ChatPromptTemplate.from_messages(
-        [
-            ("system", SYSTEM_PROMPT_JURIDICO),
-            (
-                "human",
-                "Pergunta: {question}\n\nContexto (trechos):\n{context}\n\nResponda de forma direta. Ao final, liste fontes no formato: (Status da Súmula: metadata.status_atual, Número da Súmula: metadata.num_sumula, Data da Publicação:  metadata.data_status).",
-            ),
-        ]
-    )
+    prompt = _build_prompt(state, config)
+    with telemetry.span("generation") as span:
+        start, parts = time.perf_counter(), []
+        for chunk in answer_chain().stream(prompt, config=config):
+            _record_chunk(span, parts, chunk, start)
+        return _finish_generation(span, parts)
 
-    embedder = EmbeddingSelfQuery()
-    llm = embedder.llm
-    context = _format_docs(state.get("docs", []))
-    chain = QA_PROMPT | llm | StrOutputParser()
 
-    answer_stream = chain.stream(
-        {"question": state["question"], "context": context},
-        config=config,
-    )
-    return {"answer": answer_stream}
+async def agenerate(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    from app.ingest.embed_qdrant import get_shared_embedder
+
+    prompt = _build_prompt(state, config)
+    with telemetry.span("generation") as span:
+        start, parts = time.perf_counter(), []
+        # Direto do LLM: no astream, o StrOutputParser passa cada token por run_in_executor
+        async for message in get_shared_embedder().llm.astream(prompt, config=config):
+            _record_chunk(span, parts, message.text(), start)
+        return _finish_generation(span, parts)
+
+
+def remember(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    """Nó final das conversas: grava o turno no histórico, que guarda até CONVERSATION_MAX_TURNS turnos."""
+    messages = state.get("messages") or []
+    excess = max(len(messages) + 2 - 2 * settings.CONVERSATION_MAX_TURNS, 0)
+    return {
+        "messages": [RemoveMessage(id=m.id) for m in messages[:excess]]
+        + [HumanMessage(content=state["question"]), AIMessage(content=state["answer"])]
+    }
+
+
+async def aremember(state: RAGState, config: RunnableConfig) -> Dict[str, Any]:
+    return remember(state, config)
+
+
+def _node(name: str, func: Callable, afunc: Callable, **kwargs: Any) -> RunnableLambda:
+    """Nó com as duas versões, cada uma medida no span "node.<name>"."""
+    traced = telemetry.traced(f"node.{name}")
+    return RunnableLambda(partial(traced(func), **kwargs), afunc=partial(traced(afunc), **kwargs), name=name)
 
 
 # --- Construção do Grafo ---
-def build_streaming_graph(collection_name: str = "sumulas_jornada", k: int = 5):
-    """Compila o grafo LangGraph com os nós para streaming."""
+def build_streaming_graph(collection_name: str = COLLECTION_NAME, k: int = TOP_K, checkpointer: Any = None):
+    """
+    Compila o grafo LangGraph com os nós para streaming. Com `checkpointer`, é o grafo
+    das conversas: `contextualize` na entrada (seguimento sobre a mesma súmula vai direto
+    para o rerank) e `remember` depois da geração.
+    """
+    # Com o rerank, a busca traz mais candidatos e o nó `rerank` reduz para até k
+    fetch_k = search_k(k)
+    after_search = "rerank" if settings.RERANK_ENABLED else "pack"
     graph = StateGraph(RAGState)
-    graph.add_node(
-        "retrieve",
-        lambda s, config: retrieve(
-            s, config=config, collection_name=collection_name, k=k
-        ),
-    )
-    graph.add_node("generate", generate_stream)
-    graph.set_entry_point("retrieve")
-    graph.add_edge("retrieve", "generate")
-    graph.add_edge("generate", END)
-    return graph.compile()
+    graph.add_node("analyze", _node("analyze", analyze, aanalyze, collection_name=collection_name, k=k))
+    graph.add_node("retrieve", _node("retrieve", retrieve, aretrieve, collection_name=collection_name, k=fetch_k))
+    graph.add_node("pack", _node("pack", pack, apack))
+    graph.add_node("generate", _node("generate", generate, agenerate))
+    graph.add_edge("analyze", "retrieve")
+    if settings.RERANK_ENABLED:
+        graph.add_node("rerank", _node("rerank", rerank, arerank, k=k))
+        graph.add_edge("retrieve", "rerank")
+        graph.add_edge("rerank", "pack")
+    else:
+        graph.add_edge("retrieve", "pack")
+    graph.add_edge("pack", "generate")
+    if checkpointer is None:
+        graph.set_entry_point("analyze")
+        graph.add_edge("generate", END)
+    else:
+        graph.add_node("contextualize", _node("contextualize", contextualize, acontextualize))
+        graph.add_node("remember", _node("remember", remember, aremember))
+        graph.set_entry_point("contextualize")
+        graph.add_conditional_edges("contextualize", _route_turn, {"reuse": after_search, "search": "analyze"})
+        graph.add_edge("generate", "remember")
+        graph.add_edge("remember", END)
+    return graph.compile(checkpointer=checkpointer)
 
 
-# Instância única do grafo compilado para ser reutilizada
-COMPILED_GRAPH = build_streaming_graph()
+# Grafos compilados, criados no primeiro uso: o das perguntas avulsas (chave None) e o
+# das conversas, um por checkpointer
+_graph_lock = threading.Lock()
+_compiled_graphs: Dict[Any, Any] = {}
 
 
-# --- Função Principal (Ponto de Entrada para o Frontend) ---
-def run_streaming_rag(question: str) -> Generator[Dict[str, Any], None, None]:
+def get_compiled_graph(conversational: bool = False):
+    """O grafo das conversas só existe com CONVERSATION_BACKEND ativo; senão, o avulso."""
+    key = get_checkpointer() if conversational else None
+    graph = _compiled_graphs.get(key)
+    if graph is None:
+        with _graph_lock:
+            graph = _compiled_graphs.get(key)
+            if graph is None:
+                graph = _compiled_graphs[key] = build_streaming_graph(checkpointer=key)
+    return graph
+
+
+def __getattr__(name: str) -> Any:
+    # Compatibilidade: `from app.graph.rag_graph import COMPILED_GRAPH` compila na hora
+    if name == "COMPILED_GRAPH":
+        return get_compiled_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up(collection_name: str = COLLECTION_NAME, k: int = TOP_K) -> float:
     """
-    Função de alto nível que executa o fluxo RAG e retorna um gerador de eventos para o frontend.
+    Adianta o que a primeira consulta pagaria: compila os grafos (abre o banco das
+    conversas), importa os clientes,
+    monta o retriever (conecta ao Qdrant e lê a coleção), o handler do Langfuse e o
+    encoding do tiktoken. Devolve os segundos gastos.
     """
+    from app.retrieval.retriever import SelfQueryConfig, get_self_query_retriever
+    from app.utils.tokens import get_encoding
+
+    start = time.perf_counter()
+    with telemetry.span("warm_up"):
+        get_compiled_graph()
+        get_compiled_graph(conversational=True)
+        # Um retriever por k: o de `analyze` (k) e o de `retrieve` (k × RERANK_OVERFETCH)
+        for size in dict.fromkeys((k, search_k(k))):
+            get_self_query_retriever(SelfQueryConfig(collection_name=collection_name, k=size))
+        telemetry.get_langfuse_handler()
+        get_encoding()
+    return time.perf_counter() - start
+
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def start_warm_up(collection_name: str = COLLECTION_NAME, k: int = TOP_K) -> threading.Thread:
+    """warm_up() em uma thread daemon (uma só por processo); falhas só são registradas."""
+    global _warm_up_thread
+
+    def run() -> None:
+        try:
+            print(f"✅ Aquecimento concluído em {warm_up(collection_name, k):.1f}s")
+        except Exception as e:
+            print(f"⚠️ Falha no aquecimento (seguindo sem): {e}")
+
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
 
-    # run_config = {"callbacks": [langfuse_handler], "run_name": "Chat"}
-    run_config = RunnableConfig(
-        callbacks=[langfuse_handler],
+
+# "updates": saída de cada nó; "messages": tokens do LLM à medida que são gerados
+STREAM_MODES = ["updates", "messages"]
+
+
+def _run_config(session_id: Optional[str] = None) -> RunnableConfig:
+    # Langfuse só quando configurado (LANGFUSE_ENABLED); o handler é criado na primeira consulta
+    langfuse_handler = telemetry.get_langfuse_handler()
+    config = RunnableConfig(
+        callbacks=[langfuse_handler] if langfuse_handler is not None else [],
         run_name="Chat",
         tags=["live-demo", "sumulas"],
-        metadata={"collection": "sumulas_jornada", "k": 5, "user": "Caio"},
+        metadata={"collection": COLLECTION_NAME, "k": TOP_K, "user": "Caio"},
     )
+    if session_id is not None:
+        config["configurable"] = {"thread_id": session_id}
+        config["metadata"]["langfuse_session_id"] = session_id
+    return config
+
+
+def _prepare(question: str, session_id: Optional[str]) -> tuple:
+    """
+    Grafo, entrada e config da consulta, e se ela é um turno de conversa: com sessão (e
+    CONVERSATION_BACKEND ativo), o grafo das conversas na thread da sessão, com a
+    pergunta como entrada (o resto do estado vem do turno anterior).
+    """
+    graph = get_compiled_graph(conversational=session_id is not None)
+    if graph.checkpointer is None:
+        return graph, {"question": question, "messages": []}, _run_config(), False
+    return graph, {"question": question}, _run_config(session_id), True
+
+
+class _EventTranslator:
+    """
+    Converte os eventos do grafo (modos "updates" e "messages") nos eventos do
+    frontend: details (após `analyze`, de novo após `pack`, com os relatórios do
+    rerank e do contexto, e no fim com os tempos por etapa e os tokens do span
+    `request`), token e sources. Compartilhado pelas versões síncrona e assíncrona; esta
+usa afeed/afinish, que consultam e gravam o cache de respostas fora do event loop.
+    Nas conversas, o cache de respostas fica de fora (a resposta depende do histórico)
+    e os detalhes trazem o turno (`conversation`).
+    """
 
-    initial_state: RAGState = {"question": question, "messages": []}
-    final_state = {}
+    def __init__(self, question: str, request: Optional[telemetry.SpanRecord] = None, use_cache: bool = True) -> None:
+        self.question = question
+        self.request = request
+        self.cache = get_answer_cache() if use_cache else None
+        self.cache_key = None
+        self.details: Dict[str, Any] = {}
+        self.conversation: Optional[Dict[str, Any]] = None
+        self.docs: List[Document] = []
+        self.answer_parts: List[str] = []
+        self.done = False  # resposta servida do cache: o grafo não precisa continuar
 
-    # Executa o grafo em modo streaming
-    for event in COMPILED_GRAPH.stream(initial_state, config=run_config):
-        if "retrieve" in event:
-            output = event["retrieve"]
-            yield {
-                "type": "details",
-                "data": {
+    def feed(self, mode: str, chunk: Any, cached: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        if mode == "messages":
+            message, metadata = chunk
+            # Só os tokens da geração (o query constructor também usa o LLM em `analyze`)
+            if metadata.get("langgraph_node") == "generate" and message.content:
+                self.answer_parts.append(message.content)
+                events.append({"type": "token", "data": message.content})
+            return events
+
+        if "contextualize" in chunk:
+            output = chunk["contextualize"]
+            self.conversation = output["conversation"]
+            if output.get("docs"):
+                # Trechos do turno anterior: sem `analyze`, os detalhes saem daqui
+                self.details = {
                     "query": output["generated_query"],
                     "filter": output["generated_filter"],
-                },
+                    "cache": "skip",
+                    "conversation": self.conversation,
+                }
+                events.append({"type": "details", "data": self.details})
+
+        if "analyze" in chunk:
+            output = chunk["analyze"]
+            self.details = {
+                "query": output["generated_query"],
+                "filter": output["generated_filter"],
             }
+            if self.conversation is not None:
+                self.details["conversation"] = self.conversation
+            if self.cache is not None:
+                if self.cache_key is None:  # afeed já consultou o cache
+                    self.cache_key = self.cache.make_key(
+                        self.question, output["structured_query"].filter, COLLECTION_NAME, TOP_K
+                    )
+                    cached = self.cache.get(self.cache_key)
+                telemetry.count("rag_answer_cache_total", result="hit" if cached else "miss")
+            self.details["cache"] = "hit" if cached else "miss"
+            if self.request is not None:
+                self.request.set(cache=self.details["cache"])
+            events.append({"type": "details", "data": self.details})
 
-        if "generate" in event:
-            answer_stream = event["generate"]["answer"]
-            # Itera sobre o gerador de tokens da resposta
-            for token in answer_stream:
-                yield {"type": "token", "data": token}
+            if cached:
+                events.append({"type": "token", "data": cached["answer"]})
+                events.append({"type": "sources", "data": cached["sources"]})
+                self.done = True
 
-        if END in event:
-            final_state = event[END]
+        if "retrieve" in chunk:
+            self.docs = chunk["retrieve"]["docs"]
 
-    # Formata e retorna as fontes no final do fluxo
-    docs = final_state.get("docs", [])
-    sources = [
-        {
-            "pdf_name": d.metadata.get("pdf_name"),
-            "data_status": d.metadata.get("data_status"),
-            "data_status_ano": d.metadata.get("data_status_ano"),
-            "status_atual": d.metadata.get("status_atual"),
-            "num_sumula": d.metadata.get("num_sumula"),
-            "chunk_type": d.metadata.get("chunk_type"),
-        }
-        for d in docs
-    ]
-    yield {"type": "sources", "data": sources}
+        if "rerank" in chunk:
+            self.docs = chunk["rerank"]["docs"]
+            self.details = {**self.details, "rerank": chunk["rerank"]["rerank_report"].as_dict()}
+
+        if "pack" in chunk:
+            # As fontes passam a ser só os trechos que entraram no contexto
+            self.docs = chunk["pack"]["docs"]
+            self.details = {**self.details, "context": chunk["pack"]["context_report"].as_dict()}
+            events.append({"type": "details", "data": self.details})
+        return events
+
+    async def afeed(self, mode: str, chunk: Any) -> List[Dict[str, Any]]:
+        """feed com a consulta ao cache fora do event loop (AnswerCache.amake_key/aget)."""
+        cached = None
+        if mode == "updates" and "analyze" in chunk and self.cache is not None:
+            self.cache_key = await self.cache.amake_key(
+                self.question, chunk["analyze"]["structured_query"].filter, COLLECTION_NAME, TOP_K
+            )
+            cached = await self.cache.aget(self.cache_key)
+        return self.feed(mode, chunk, cached)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        # Formata e retorna as fontes no final do fluxo
+        sources = format_sources(self.docs)
+        if self.cache is not None and self.cache_key is not None:
+            self.cache.set(self.cache_key, self._entry(sources))
+        return self._final_events(sources)
+
+    async def afinish(self) -> List[Dict[str, Any]]:
+        sources = format_sources(self.docs)
+        if self.cache is not None and self.cache_key is not None:
+            await self.cache.aset(self.cache_key, self._entry(sources))
+        return self._final_events(sources)
+
+    def _entry(self, sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"answer": "".join(self.answer_parts), "sources": sources, "details": self.details}
+
+    def _final_events(self, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        if self.request is not None:
+            trace = self.request.trace
+            attributes = trace.attributes()
+            self.details = {
+                **self.details,
+                "timings": {**trace.timings(), "time_to_first_token": attributes.get("ttft_ms")},
+                "tokens": {kind: attributes.get(f"{kind}_tokens") for kind in ("prompt", "completion")},
+            }
+            events.append({"type": "details", "data": self.details})
+        return events + [{"type": "sources", "data": sources}]
+
+
+# --- Função Principal (Ponto de Entrada para o Frontend) ---
+def run_streaming_rag(question: str, session_id: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+    """
+    Função de alto nível que executa o fluxo RAG e retorna um gerador de eventos para o frontend.
+    Se a resposta para (pergunta normalizada, filtro) estiver no cache, ela é reproduzida
+    pelos mesmos eventos e a busca/geração não são executadas. Com `session_id`, a pergunta
+    é um turno da conversa da sessão (ver app.graph.memory).
+    """
+    graph, graph_input, config, conversational = _prepare(question, session_id)
+
+    # Executa o grafo em modo streaming; os spans dos nós ficam sob o span `request`.
+    # Nas conversas, o checkpoint da sessão é gravado uma vez, no fim (durability="exit")
+    with telemetry.span("request", conversation=conversational) as request:
+        translator = _EventTranslator(question, request, use_cache=not conversational)
+        stream = graph.stream(
+            graph_input, config=config, stream_mode=STREAM_MODES, durability="exit" if conversational else None
+        )
+        with closing(stream):
+            for mode, chunk in stream:
+                yield from translator.feed(mode, chunk)
+                if translator.done:
+                    return
+        yield from translator.finish()
+
+
+async def arun_streaming_rag(question: str, session_id: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Versão assíncrona de run_streaming_rag, com o mesmo esquema de eventos. Roda os nós
+    assíncronos do grafo (clientes Qdrant/OpenAI assíncronos), sem ocupar uma thread por
+    requisição. Se o consumidor abandonar a consulta (aclose() no gerador ou cancelamento
+    da task), o grafo é encerrado e as chamadas em andamento são canceladas; nada é
+    gravado no cache nem no histórico da sessão.
+    """
+    graph, graph_input, config, conversational = _prepare(question, session_id)
+
+    # O grafo das conversas usa o checkpointer assíncrono (AsyncSqliteSaver da consulta)
+    async with async_checkpointer() if conversational else nullcontext() as checkpointer:
+        if checkpointer is not None and checkpointer is not graph.checkpointer:
+            graph = graph.copy(update={"checkpointer": checkpointer})
+        with telemetry.span("request", conversation=conversational) as request:
+            translator = _EventTranslator(question, request, use_cache=not conversational)
+            stream = graph.astream(
+                graph_input, config=config, stream_mode=STREAM_MODES, durability="exit" if conversational else None
+            )
+            async with aclosing(stream):
+                async for mode, chunk in stream:
+                    for event in await translator.afeed(mode, chunk):
+                        yield event
+                    if translator.done:
+                        return
+            for event in await translator.afinish():
+                yield event
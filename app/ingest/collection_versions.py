@@ -0,0 +1,374 @@
+"""
+Coleções versionadas atrás de um alias do Qdrant.
+
+O nome usado pelas consultas (COLLECTION_NAME, ex.: "sumulas_jornada") é um alias que
+aponta para uma versão física `sumulas_jornada_v{N}`. A reindexação completa grava uma
+versão nova ao lado da ativa, com a indexação HNSW desligada durante o upload e
+religada no fim (o Qdrant otimiza os segmentos de uma vez); só então o alias é trocado,
+em uma única operação atômica, e as versões antigas além de COLLECTION_KEEP_VERSIONS são
+apagadas junto com o manifesto, o vocabulário esparso e o dead letter de cada uma.
+
+As consultas resolvem o alias para a versão física (cache de COLLECTION_ALIAS_TTL
+segundos), então o vocabulário BM25 usado na busca é sempre o da versão consultada.
+Uma coleção antiga com o nome do alias (anterior ao versionamento) bloqueia a troca:
+`migrate-legacy` a copia antes para `{alias}_v0`, que fica disponível para rollback.
+Cada ingestão que altera pontos grava a versão dos dados nos metadados da versão física
+(set_data_version): o cache de respostas de qualquer servidor a lê com data_version.
+
+Uso:
+    python -m app.ingest.collection_versions list [--collection sumulas_jornada]
+    python -m app.ingest.collection_versions rollback [--version 3]
+    python -m app.ingest.collection_versions swap --version 4
+    python -m app.ingest.collection_versions gc [--keep 2]
+    python -m app.ingest.collection_versions migrate-legacy [--collection sumulas_jornada]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http import models
+
+if __package__ in (None, ""):
+    REPO_ROOT = Path(__file__).resolve().parents[2]
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+from app.utils.settings import settings
+
+
+@dataclass
+class CollectionVersion:
+    name: str
+    number: int
+    points: int
+    status: str
+    active: bool
+
+
+def version_name(alias: str, number: int) -> str:
+    return f"{alias}_v{number}"
+
+
+def version_number(alias: str, name: str) -> Optional[int]:
+    match = re.fullmatch(rf"{re.escape(alias)}_v(\d+)", name)
+    return int(match.group(1)) if match else None
+
+
+def _collection_names(client: QdrantClient) -> List[str]:
+    return [c.name for c in client.get_collections().collections]
+
+
+def active_version(client: QdrantClient, alias: str) -> Optional[str]:
+    """Coleção física para a qual o alias aponta (None se o alias não existe)."""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def list_versions(client: QdrantClient, alias: str) -> List[CollectionVersion]:
+    """Versões `{alias}_v{N}` existentes, da mais antiga para a mais nova."""
+    active = active_version(client, alias)
+    versions = []
+    for name in _collection_names(client):
+        number = version_number(alias, name)
+        if number is None:
+            continue
+        info = client.get_collection(name)
+        points = info.points_count if info.points_count is not None else client.count(name, exact=True).count
+        versions.append(CollectionVersion(name, number, points, str(info.status.value), name == active))
+    return sorted(versions, key=lambda v: v.number)
+
+
+def next_version(client: QdrantClient, alias: str) -> str:
+    numbers = [n for n in (version_number(alias, name) for name in _collection_names(client)) if n is not None]
+    return version_name(alias, max(numbers, default=0) + 1)
+
+
+def collection_exists(client: QdrantClient, name: str) -> bool:
+    """Coleção física ou alias com esse nome."""
+    return active_version(client, name) is not None or name in _collection_names(client)
+
+
+def is_legacy(client: QdrantClient, alias: str) -> bool:
+    """Coleção física com o nome do alias, anterior ao versionamento."""
+    return active_version(client, alias) is None and alias in _collection_names(client)
+
+
+def require_versioned(client: QdrantClient, alias: str) -> None:
+    """ValueError (com o comando de migração) se `alias` ainda é uma coleção sem versão."""
+    if is_legacy(client, alias):
+        raise ValueError(
+            f"'{alias}' é uma coleção sem versão: o alias não pode ser criado no lugar dela. "
+            f"Copie-a para '{version_name(alias, 0)}' com "
+            f"`python -m app.ingest.collection_versions migrate-legacy --collection {alias}` e repita."
+        )
+
+
+# Alias -> coleção física e coleção física -> versão dos dados, por cliente: (valor, expira em)
+_alias_lock = threading.Lock()
+_alias_cache: Dict[Tuple[int, str], Tuple[str, float]] = {}
+_data_version_cache: Dict[Tuple[int, str], Tuple[str, float]] = {}
+
+# Chave, nos metadados da coleção física, da versão dos dados gravada pela ingestão
+DATA_VERSION_KEY = "data_version"
+
+
+def resolve_collection(client: QdrantClient, name: str, ttl: Optional[float] = None) -> str:
+    """
+    Coleção física por trás de `name` (o próprio nome quando não é um alias), guardada
+    por `ttl` segundos (padrão COLLECTION_ALIAS_TTL; 0 consulta sempre o Qdrant).
+    """
+    key = (id(client), name)
+    cached = _cached(_alias_cache, key)
+    if cached is not None:
+        return cached
+    return _store(_alias_cache, key, active_version(client, name) or name, ttl)
+
+
+async def aresolve_collection(client: AsyncQdrantClient, name: str, ttl: Optional[float] = None) -> str:
+    """resolve_collection pelo AsyncQdrantClient, sem bloquear o event loop."""
+    key = (id(client), name)
+    cached = _cached(_alias_cache, key)
+    if cached is not None:
+        return cached
+    aliases = (await client.get_aliases()).aliases
+    resolved = next((a.collection_name for a in aliases if a.alias_name == name), name)
+    return _store(_alias_cache, key, resolved, ttl)
+
+
+def set_data_version(client: QdrantClient, collection: str, version: str) -> None:
+    """Grava a versão dos dados nos metadados da coleção física (requer Qdrant 1.16+)."""
+    client.update_collection(collection, metadata={DATA_VERSION_KEY: version})
+    clear_alias_cache()
+
+
+def data_version(client: QdrantClient, name: str, ttl: Optional[float] = None) -> str:
+    """
+    "{coleção física}@{versão dos dados}" de `name`, igual para todos os processos que
+    consultam o mesmo Qdrant: muda com a troca do alias e com cada ingestão que grava
+    set_data_version ("-" se nenhuma gravou). Guardada por `ttl` segundos, como o alias.
+    """
+    physical = resolve_collection(client, name, ttl)
+    key = (id(client), physical)
+    cached = _cached(_data_version_cache, key)
+    if cached is not None:
+        return cached
+    metadata = client.get_collection(physical).config.metadata or {}
+    return _store(_data_version_cache, key, f"{physical}@{metadata.get(DATA_VERSION_KEY, '-')}", ttl)
+
+
+def _cached(cache: Dict[Tuple[int, str], Tuple[str, float]], key: Tuple[int, str]) -> Optional[str]:
+    with _alias_lock:
+        cached = cache.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    return None
+
+
+def _store(cache: Dict[Tuple[int, str], Tuple[str, float]], key: Tuple[int, str], value: str, ttl: Optional[float]) -> str:
+    ttl = settings.COLLECTION_ALIAS_TTL if ttl is None else ttl
+    with _alias_lock:
+        cache[key] = (value, time.monotonic() + ttl)
+    return value
+
+
+def clear_alias_cache() -> None:
+    with _alias_lock:
+        _alias_cache.clear()
+        _data_version_cache.clear()
+
+
+def begin_bulk_load(client: QdrantClient, name: str) -> Optional[int]:
+    """
+    Desliga a indexação HNSW da coleção durante o upload (indexing_threshold=0: os
+    segmentos ficam só com os vetores brutos). Devolve o limiar anterior, para
+    finish_bulk_load religar.
+    """
+    threshold = client.get_collection(name).config.optimizer_config.indexing_threshold
+    client.update_collection(name, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0))
+    return threshold
+
+
+def finish_bulk_load(
+    client: QdrantClient, name: str, indexing_threshold: Optional[int], timeout: Optional[float] = None
+) -> bool:
+    """
+    Religa a indexação e espera a otimização terminar (status verde) por até `timeout`
+    segundos (padrão COLLECTION_OPTIMIZE_TIMEOUT). False se o tempo acabou: a coleção
+    já está completa e o Qdrant continua indexando em segundo plano.
+    """
+    if indexing_threshold is not None:
+        client.update_collection(
+            name, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold)
+        )
+    deadline = time.monotonic() + (settings.COLLECTION_OPTIMIZE_TIMEOUT if timeout is None else timeout)
+    while client.get_collection(name).status != models.CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(1)
+    return True
+
+
+def _invalidate_answers(alias: str) -> None:
+    # As respostas em cache foram geradas sobre a versão que deixou de ser a ativa
+    from app.utils.answer_cache import get_answer_cache
+
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate(alias)
+
+
+def swap_alias(client: QdrantClient, alias: str, name: str) -> Optional[str]:
+    """
+    Aponta o alias para `name` em uma única operação (as consultas passam de uma
+    versão para a outra sem intervalo) e invalida as respostas em cache do alias.
+    Devolve a versão que estava ativa. Uma coleção sem versão com o nome do alias não é
+    tocada: ValueError (ver migrate_legacy).
+    """
+    require_versioned(client, alias)
+    previous = active_version(client, alias)
+    operations: List[models.AliasOperations] = []
+    if previous is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(
+        models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=name, alias_name=alias))
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+    clear_alias_cache()
+    _invalidate_answers(alias)
+    return previous
+
+
+def rollback(client: QdrantClient, alias: str, number: Optional[int] = None) -> str:
+    """Volta o alias para a versão `number` (padrão: a anterior à ativa). Devolve o nome dela."""
+    versions = list_versions(client, alias)
+    if number is None:
+        active = next((v.number for v in versions if v.active), None)
+        older = [v for v in versions if active is not None and v.number < active]
+        if not older:
+            raise ValueError(f"Nenhuma versão de '{alias}' anterior à ativa para voltar.")
+        target = older[-1].name
+    else:
+        target = version_name(alias, number)
+        if target not in {v.name for v in versions}:
+            raise ValueError(f"A versão '{target}' não existe (ou já foi apagada pelo gc).")
+    swap_alias(client, alias, target)
+    return target
+
+
+def migrate_legacy(client: QdrantClient, alias: str, batch_size: int = 128) -> str:
+    """
+    Coloca uma coleção sem versão atrás do alias: copia os pontos (e o manifesto e o
+    vocabulário esparso) para `{alias}_v0` no mesmo layout, confere a contagem e só
+    então apaga a original e cria o alias para a cópia. O nome fica sem coleção só
+    entre essas duas chamadas, e os dados continuam em `_v0`. Devolve o nome da versão.
+    """
+    from app.ingest.vector_layout import VectorLayout, migrate_collection
+
+    if not is_legacy(client, alias):
+        raise ValueError(f"'{alias}' não é uma coleção sem versão; nada a migrar.")
+    target = version_name(alias, 0)
+    if target in _collection_names(client):
+        raise ValueError(f"'{target}' já existe; apague-a ou confira se a migração já foi feita.")
+    migrate_collection(client, alias, VectorLayout.of_collection(client, alias), target, batch_size)
+    client.delete_collection(alias)
+    client.update_collection_aliases(
+        change_aliases_operations=[
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))
+        ]
+    )
+    remove_version_state(alias)
+    clear_alias_cache()
+    _invalidate_answers(alias)
+    return target
+
+
+def remove_version_state(name: str) -> None:
+    """Manifesto, vocabulário esparso e dead letter gravados pela ingestão da versão."""
+    from app.ingest.manifest import manifest_path
+    from app.ingest.sparse_encoder import sparse_vocab_path
+    from app.ingest.structured_extraction import dead_letter_path
+
+    for path_of in (manifest_path, sparse_vocab_path, dead_letter_path):
+        path_of(name).unlink(missing_ok=True)
+
+
+def gc_versions(client: QdrantClient, alias: str, keep: Optional[int] = None) -> List[str]:
+    """
+    Apaga as versões mais antigas, mantendo as `keep` mais recentes (padrão
+    COLLECTION_KEEP_VERSIONS) e sempre a ativa. Devolve os nomes apagados.
+    """
+    keep = settings.COLLECTION_KEEP_VERSIONS if keep is None else keep
+    versions = list_versions(client, alias)
+    kept = {v.name for v in versions[-keep:]} if keep > 0 else set()
+    removed = []
+    for version in versions:
+        if version.active or version.name in kept:
+            continue
+        client.delete_collection(version.name)
+        remove_version_state(version.name)
+        removed.append(version.name)
+    return removed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Versões da coleção atrás do alias do Qdrant.")
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME, help="alias das consultas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="versões existentes e a ativa")
+    swap = sub.add_parser("swap", help="aponta o alias para uma versão")
+    swap.add_argument("--version", type=int, required=True)
+    back = sub.add_parser("rollback", help="volta para a versão anterior (ou --version)")
+    back.add_argument("--version", type=int, default=None)
+    gc = sub.add_parser("gc", help="apaga versões antigas")
+    gc.add_argument("--keep", type=int, default=settings.COLLECTION_KEEP_VERSIONS)
+    sub.add_parser("migrate-legacy", help="copia a coleção sem versão para a versão 0 e cria o alias")
+    args = parser.parse_args(argv)
+
+    client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT, timeout=settings.QDRANT_TIMEOUT)
+    alias = args.collection
+    if args.command == "list":
+        versions = list_versions(client, alias)
+        if not versions:
+            print(f"Nenhuma versão de '{alias}'.")
+        for version in versions:
+            marker = "*" if version.active else " "
+            print(f"{marker} {version.name:<32} {version.points:>7} pontos  {version.status}")
+        return
+
+    if args.command == "gc":
+        removed = gc_versions(client, alias, args.keep)
+        print(f"✅ {len(removed)} versões apagadas: {', '.join(removed) or '-'}")
+        return
+
+    previous = active_version(client, alias)
+    try:
+        if args.command == "swap":
+            target = version_name(alias, args.version)
+            if target not in _collection_names(client):
+                print(f"⚠️ A versão '{target}' não existe.")
+                sys.exit(1)
+            swap_alias(client, alias, target)
+        elif args.command == "rollback":
+            target = rollback(client, alias, args.version)
+        else:
+            target = migrate_legacy(client, alias)
+            previous = f"{alias} sem versão"
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        sys.exit(1)
+
+    print(f"✅ '{alias}' agora aponta para '{target}' (antes: '{previous or '-'}').")
+
+
+if __name__ == "__main__":
+    main()
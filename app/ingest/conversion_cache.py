@@ -0,0 +1,222 @@
+"""
+Cache persistente das conversões PDF -> texto do MarkItDown, endereçado pelo conteúdo.
+
+A chave é o sha256 do PDF (o mesmo do manifesto da ingestão) mais a versão do
+conversor: trocar o MarkItDown (ou CONVERTER_REVISION) invalida tudo sem apagar nada.
+Os textos ficam comprimidos (gzip) em `<dir>/<2 primeiros hex>/<chave>.txt.gz` e o
+índice, com nome do PDF e tempo da conversão original, em SQLite (`index.sqlite`).
+
+Consulta para depuração:
+    python -m app.ingest.conversion_cache stats
+    python -m app.ingest.conversion_cache list [--pdf "Súmula 070"]
+    python -m app.ingest.conversion_cache show "Súmula 070-87.pdf"
+    python -m app.ingest.conversion_cache prune   # remove conversões de outras versões
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    REPO_ROOT = Path(__file__).resolve().parents[2]
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+from app.utils.settings import settings
+
+# Incrementar quando o pós-processamento de convert_pdf mudar a saída
+CONVERTER_REVISION = 1
+
+
+def converter_version() -> str:
+    from markitdown import __version__
+
+    return f"markitdown-{__version__}-r{CONVERTER_REVISION}"
+
+
+@dataclass
+class ConversionEntry:
+    key: str
+    sha256: str
+    converter: str
+    pdf_name: str
+    chars: int
+    stored_bytes: int
+    convert_seconds: float
+    created_at: float
+    hits: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class ConversionStats:
+    hits: int = 0
+    misses: int = 0
+    seconds_saved: float = 0.0
+    seconds_spent: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Conversões: {self.hits} do cache, {self.misses} feitas ({self.seconds_spent:.1f}s), "
+            f"~{self.seconds_saved:.1f}s economizados"
+        )
+
+
+class ConversionCache:
+    def __init__(self, directory: str | Path | None = None, converter: Optional[str] = None) -> None:
+        self.directory = Path(directory or settings.CONVERSION_CACHE_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.converter = converter or converter_version()
+        self._conn = sqlite3.connect(
+            self.directory / "index.sqlite", check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            " key TEXT PRIMARY KEY, sha256 TEXT NOT NULL, converter TEXT NOT NULL, pdf_name TEXT NOT NULL,"
+            " chars INTEGER NOT NULL, stored_bytes INTEGER NOT NULL, convert_seconds REAL NOT NULL,"
+            " created_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversions_pdf ON conversions (pdf_name)")
+        self._lock = threading.Lock()
+        self.stats = ConversionStats()
+
+    def key(self, sha256: str) -> str:
+        return hashlib.sha256(f"{self.converter}\0{sha256}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt.gz"
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM conversions").fetchone()[0]
+
+    def get(self, sha256: str) -> Optional[str]:
+        """Texto convertido do PDF com este hash, ou None (conta o tempo economizado)."""
+        key = self.key(sha256)
+        with self._lock:
+            row = self._conn.execute("SELECT convert_seconds FROM conversions WHERE key = ?", (key,)).fetchone()
+        path = self._path(key)
+        if row is None or not path.exists():
+            return None
+        text = gzip.decompress(path.read_bytes()).decode("utf-8")
+        with self._lock:
+            self._conn.execute("UPDATE conversions SET hits = hits + 1 WHERE key = ?", (key,))
+            self.stats.hits += 1
+            self.stats.seconds_saved += row[0]
+        return text
+
+    def put(self, sha256: str, pdf_name: str, text: str, convert_seconds: float) -> ConversionEntry:
+        key = self.key(sha256)
+        data = gzip.compress(text.encode("utf-8"), mtime=0)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        entry = ConversionEntry(
+            key=key,
+            sha256=sha256,
+            converter=self.converter,
+            pdf_name=pdf_name,
+            chars=len(text),
+            stored_bytes=len(data),
+            convert_seconds=round(convert_seconds, 4),
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversions VALUES (:key, :sha256, :converter, :pdf_name, :chars,"
+                " :stored_bytes, :convert_seconds, :created_at, :hits)",
+                entry.as_dict(),
+            )
+            self.stats.misses += 1
+            self.stats.seconds_spent += convert_seconds
+        return entry
+
+    def entries(self, pdf_name: Optional[str] = None, all_versions: bool = False) -> List[ConversionEntry]:
+        """Conversões guardadas (da versão atual, salvo `all_versions`), filtradas por trecho do nome."""
+        query = "SELECT * FROM conversions WHERE 1 = 1"
+        params: List[Any] = []
+        if not all_versions:
+            query += " AND converter = ?"
+            params.append(self.converter)
+        if pdf_name:
+            query += " AND pdf_name LIKE ?"
+            params.append(f"%{pdf_name}%")
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY pdf_name, created_at", params).fetchall()
+        return [ConversionEntry(*row) for row in rows]
+
+    def read(self, entry: ConversionEntry) -> str:
+        return gzip.decompress(self._path(entry.key).read_bytes()).decode("utf-8")
+
+    def prune(self) -> int:
+        """Remove conversões de outras versões do conversor; devolve quantas."""
+        stale = [e for e in self.entries(all_versions=True) if e.converter != self.converter]
+        for entry in stale:
+            self._path(entry.key).unlink(missing_ok=True)
+        with self._lock:
+            self._conn.executemany("DELETE FROM conversions WHERE key = ?", [(e.key,) for e in stale])
+        return len(stale)
+
+    def summary(self) -> Dict[str, Any]:
+        current = self.entries()
+        return {
+            "directory": str(self.directory),
+            "converter": self.converter,
+            "entries": len(current),
+            "other_versions": len(self) - len(current),
+            "chars": sum(e.chars for e in current),
+            "stored_bytes": sum(e.stored_bytes for e in current),
+            "convert_seconds": round(sum(e.convert_seconds for e in current), 2),
+            "hits": sum(e.hits for e in current),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Consulta o cache de conversões PDF -> texto.")
+    parser.add_argument("--dir", default=None, help=f"diretório do cache (padrão: {settings.CONVERSION_CACHE_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="totais da versão atual do conversor")
+    listing = sub.add_parser("list", help="conversões guardadas")
+    listing.add_argument("--pdf", default=None, help="trecho do nome do PDF")
+    listing.add_argument("--all-versions", action="store_true")
+    show = sub.add_parser("show", help="imprime o texto convertido de um PDF (nome ou chave)")
+    show.add_argument("name")
+    sub.add_parser("prune", help="remove conversões de outras versões do conversor")
+    args = parser.parse_args(argv)
+
+    cache = ConversionCache(args.dir)
+    if args.command == "stats":
+        print(json.dumps(cache.summary(), ensure_ascii=False, indent=2))
+    elif args.command == "list":
+        for entry in cache.entries(args.pdf, args.all_versions):
+            print(
+                f"{entry.key[:12]}  {entry.pdf_name:<28} {entry.chars:>7} chars {entry.stored_bytes:>7} bytes "
+                f"{entry.convert_seconds:>6.2f}s  {entry.hits:>3} hits  {entry.converter}"
+            )
+    elif args.command == "show":
+        matches = [e for e in cache.entries(all_versions=True) if e.key.startswith(args.name) or e.pdf_name == args.name]
+        if not matches:
+            print(f"Nenhuma conversão para '{args.name}'.")
+            sys.exit(1)
+        entry = max(matches, key=lambda e: (e.converter == cache.converter, e.created_at))
+        print(f"# {entry.pdf_name} ({entry.converter}, sha256 {entry.sha256[:12]})\n")
+        print(cache.read(entry))
+    else:
+        print(f"✅ {cache.prune()} conversões de outras versões removidas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,162 @@
-from qdrant_client import QdrantClient
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from app.utils.settings import settings
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.vectorstores import VectorStore
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_qdrant import QdrantVectorStore
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+
+from app.ingest.collection_versions import resolve_collection
+from app.ingest.embedding_cache import CachedEmbeddings
+from app.ingest.sparse_encoder import BM25SparseEncoder, sparse_vocab_path
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
 
 
 class EmbeddingSelfQuery:
-    def __init__(self) -> None:
-        self.llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
-        self.client = QdrantClient(
+    def __init__(
+        self,
+        llm: Optional[BaseChatModel] = None,
+        client: Optional[QdrantClient] = None,
+        model: Optional[Embeddings] = None,
+        cache_embeddings: Optional[bool] = None,
+        async_client: Optional[AsyncQdrantClient] = None,
+    ) -> None:
+        self.llm = llm or ChatOpenAI(
+            model=settings.LLM_MODEL,
+            temperature=0,
+            http_client=httpx.Client(limits=_http_limits()),
+            http_async_client=httpx.AsyncClient(limits=_http_limits()),
+        )
+        self.client = client or QdrantClient(
             host=settings.QDRANT_HOST,
             port=settings.QDRANT_PORT,
-            timeout=120,
+            timeout=settings.QDRANT_TIMEOUT,
+            limits=_http_limits(),
         )
 
-        self.model = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-        )
+        # Cliente assíncrono do caminho `arun_streaming_rag`; criado no primeiro uso
+        self._async_client = async_client
 
-    def get_qdrant_vector_store(self, collection_name: str) -> QdrantVectorStore:
-        return QdrantVectorStore(
-            client=self.client,
-            collection_name=collection_name,
-            embedding=self.model,
-            sparse_vector_name="text-sparse",
-            vector_name="text-dense",
+        self.model = model or OpenAIEmbeddings(
+            model=settings.EMBEDDING_MODEL,
+            # Vetor encurtado pela API (ver app.ingest.vector_layout); None = dimensão nativa
+            dimensions=settings.EMBEDDING_DIMENSIONS if settings.EMBEDDING_DIMENSIONS < 3072 else None,
+            http_client=httpx.Client(limits=_http_limits()),
+            http_async_client=httpx.AsyncClient(limits=_http_limits()),
+        )
+        if cache_embeddings is None:
+            cache_embeddings = settings.EMBEDDING_CACHE_ENABLED
+        # Embeddings usados pelo vector store: o modelo, com cache em disco por conteúdo
+        self.embeddings: Embeddings = (
+            CachedEmbeddings(self.model, settings.EMBEDDING_CACHE_DIR) if cache_embeddings else self.model
         )
+
+        self._vector_stores: Dict[Tuple[str, str], QdrantVectorStore] = {}
+        self._local_stores: Dict[str, VectorStore] = {}
+        self._sparse_encoders: Dict[str, BM25SparseEncoder] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        """
+        AsyncQdrantClient para os mesmos host/porta. Os clientes assíncronos (Qdrant e
+        OpenAI) ficam presos ao event loop em que foram usados pela primeira vez: use-os
+        a partir de um único loop de longa duração (ex.: o servidor ASGI).
+        """
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncQdrantClient(
+                        host=settings.QDRANT_HOST,
+                        port=settings.QDRANT_PORT,
+                        timeout=settings.QDRANT_TIMEOUT,
+                        limits=_http_limits(),
+                    )
+        return self._async_client
+
+    def get_sparse_encoder(self, collection_name: str) -> BM25SparseEncoder:
+        """Encoder BM25 da coleção, com o vocabulário persistido pela ingestão."""
+        encoder = self._sparse_encoders.get(collection_name)
+        if encoder is None:
+            encoder = BM25SparseEncoder(sparse_vocab_path(collection_name))
+            self._sparse_encoders[collection_name] = encoder
+        return encoder
+
+    def get_qdrant_vector_store(self, collection_name: str, retrieval_mode: str = "dense") -> QdrantVectorStore:
+        """
+        `retrieval_mode`: "dense", "sparse" ou "hybrid" (denso + BM25 com fusão RRF no
+        servidor). A ingestão usa "hybrid" para gravar os dois vetores.
+        """
+        # Alias -> versão ativa: o vocabulário BM25 é o gravado para a versão (ver app.ingest.collection_versions)
+        collection_name = resolve_collection(self.client, collection_name)
+        # O QdrantVectorStore valida a coleção no servidor ao ser criado; reaproveita por coleção e modo.
+        key = (collection_name, retrieval_mode)
+        with self._lock:
+            store = self._vector_stores.get(key)
+            if store is None:
+                store = QdrantVectorStore(
+                    client=self.client,
+                    collection_name=collection_name,
+                    embedding=self.embeddings,
+                    sparse_embedding=self.get_sparse_encoder(collection_name),
+                    retrieval_mode=RetrievalMode(retrieval_mode),
+                    sparse_vector_name="text-sparse",
+                    vector_name="text-dense",
+                )
+                self._vector_stores[key] = store
+            return store
+
+    def get_vector_store(self, collection_name: str, retrieval_mode: str = "dense") -> Union[QdrantVectorStore, VectorStore]:
+        """
+        Vector store das consultas conforme VECTOR_BACKEND: o QdrantVectorStore ou o
+        snapshot local (app.retrieval.local_store, só busca densa).
+        """
+        if settings.VECTOR_BACKEND != "local":
+            return self.get_qdrant_vector_store(collection_name, retrieval_mode)
+
+        from app.retrieval.local_store import LocalVectorStore, snapshot_path
+
+        with self._lock:
+            store = self._local_stores.get(collection_name)
+            if store is None:
+                if retrieval_mode != "dense":
+                    print(f"⚠️ Backend local só faz busca densa (retrieval_mode '{retrieval_mode}' ignorado).")
+                store = LocalVectorStore(snapshot_path(collection_name), self.embeddings, collection_name)
+                self._local_stores[collection_name] = store
+            return store
+
+
+# --- Registro de recursos do processo ------------------------------------------
+_shared_lock = threading.Lock()
+_shared_embedder: Optional[EmbeddingSelfQuery] = None
+
+
+def get_shared_embedder() -> EmbeddingSelfQuery:
+    """
+    Retorna o EmbeddingSelfQuery compartilhado pelo processo (cliente Qdrant, LLM e
+    modelo de embeddings mantidos vivos entre as requisições).
+    """
+    global _shared_embedder
+    if _shared_embedder is None:
+        with _shared_lock:
+            if _shared_embedder is None:
+                _shared_embedder = EmbeddingSelfQuery()
+    return _shared_embedder
+
+
+def set_shared_embedder(embedder: Optional[EmbeddingSelfQuery]) -> None:
+    """Substitui a instância compartilhada (ex.: modelos falsos em benchmarks)."""
+    global _shared_embedder
+    with _shared_lock:
+        _shared_embedder = embedder
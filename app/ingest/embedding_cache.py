@@ -0,0 +1,218 @@
+"""
+Cache persistente de embeddings, endereçado pelo hash do conteúdo.
+
+Os vetores dos trechos (embed_documents) ficam em um arquivo float32 contíguo mapeado
+em memória (`vectors.f32`) e o índice hash -> linha em SQLite (`index.sqlite`), um
+diretório por modelo/dimensão. O arquivo só cresce e pode ser gravado por vários
+processos (ingestões em paralelo): a linha de cada vetor é decidida sob um lock do
+arquivo (fcntl.flock), que cobre a leitura do tamanho, a escrita e o índice.
+
+As consultas (embed_query) não entram no arquivo, que cresceria a cada pergunta nova:
+ficam em um LRU em memória de EMBEDDING_QUERY_CACHE_MAX_ENTRIES vetores por processo.
+
+Sem cópia, só embed_arrays/aembed_arrays: devolvem views float32 das linhas do arquivo
+mapeado. A interface Embeddings do LangChain (embed_documents, embed_query e as versões
+assíncronas), usada pela ingestão (QdrantVectorStore.add_texts) e pela busca, devolve
+listas de float: cada vetor é copiado uma vez em .tolist(), que o cliente do Qdrant
+serializaria de qualquer forma.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils import telemetry
+from app.utils.settings import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: só o lock entre threads
+    fcntl = None
+
+
+class EmbeddingStore:
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._vectors_path.touch(exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.directory / "index.sqlite", check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.dim: Optional[int] = self._stored_dim()
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def _stored_dim(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _matrix(self) -> np.memmap:
+        if self.dim is None:
+            # Outra instância (ou processo) gravou o primeiro vetor depois da abertura
+            self.dim = self._stored_dim()
+        rows = self._vectors_path.stat().st_size // (4 * self.dim)
+        if self._mmap is None or self._mmap.shape[0] != rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    def lookup(self, keys: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                )
+        return found
+
+    def append(self, keys: Sequence[str], vectors: np.ndarray) -> Dict[str, int]:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = self._stored_dim()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+            with open(self._vectors_path, "ab") as fh:
+                # Outro processo pode estar anexando ao mesmo arquivo: tamanho, escrita e
+                # índice dentro do mesmo lock, senão duas gravações recebem as mesmas linhas
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    first_row = os.fstat(fh.fileno()).st_size // (4 * self.dim)
+                    fh.write(vectors.tobytes())
+                    fh.flush()
+                    rows = {key: first_row + i for i, key in enumerate(keys)}
+                    self._conn.executemany("INSERT OR REPLACE INTO vectors (key, row) VALUES (?, ?)", rows.items())
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+            return rows
+
+    def vectors(self, rows: Sequence[int]) -> List[np.ndarray]:
+        """Linhas do arquivo mapeado como views (sem cópia)."""
+        with self._lock:
+            matrix = self._matrix()
+        return [matrix[row] for row in rows]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envolve um modelo de embeddings: textos já vistos saem do EmbeddingStore (trechos)
+    ou do LRU de consultas, e as faltas de cada chamada são enviadas ao modelo em uma
+    única requisição.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        directory: str | Path,
+        namespace: Optional[str] = None,
+        max_queries: Optional[int] = None,
+    ) -> None:
+        self.underlying = underlying
+        self.namespace = namespace or _model_namespace(underlying)
+        self.store = EmbeddingStore(Path(directory) / self.namespace)
+        self.max_queries = settings.EMBEDDING_QUERY_CACHE_MAX_ENTRIES if max_queries is None else max_queries
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        telemetry.count("rag_embedding_cache_total", hits, result="hit")
+        telemetry.count("rag_embedding_cache_total", misses, result="miss")
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, int], Dict[str, str]]:
+        keys = [self._key(t) for t in texts]
+        rows = self.store.lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in rows}
+        self._count(len(texts) - len(missing), len(missing))
+        return keys, rows, missing
+
+    def _cached_query(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+        self._count(int(vector is not None), int(vector is None))
+        return vector
+
+    def _remember_query(self, key: str, vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._queries[key] = array
+            while len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+        return array
+
+    def embed_arrays(self, texts: List[str]) -> List[np.ndarray]:
+        keys, rows, missing = self._lookup(texts)
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            rows.update(self.store.append(list(missing), np.asarray(new_vectors, dtype=np.float32)))
+        return self.store.vectors([rows[key] for key in keys])
+
+    async def aembed_arrays(self, texts: List[str]) -> List[np.ndarray]:
+        """Como embed_arrays, com as faltas enviadas pelo cliente assíncrono do modelo."""
+        keys, rows, missing = self._lookup(texts)
+        if missing:
+            new_vectors = await self.underlying.aembed_documents(list(missing.values()))
+            rows.update(self.store.append(list(missing), np.asarray(new_vectors, dtype=np.float32)))
+        return self.store.vectors([rows[key] for key in keys])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Contrato do LangChain: listas de float (cópia de cada vetor); sem cópia, embed_arrays
+        return [v.tolist() for v in self.embed_arrays(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = self._remember_query(key, self.underlying.embed_query(text))
+        return vector.tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [v.tolist() for v in await self.aembed_arrays(texts)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = self._remember_query(key, await self.underlying.aembed_query(text))
+        return vector.tolist()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "stored": len(self.store), "queries": len(self._queries)}
+
+
+def _model_namespace(model: Embeddings) -> str:
+    name = getattr(model, "model", None) or type(model).__name__
+    dims = getattr(model, "dimensions", None) or getattr(model, "size", None)
+    namespace = f"{name}-{dims}" if dims else str(name)
+    return re.sub(r"[^\w.-]", "_", namespace)
@@ -12,14 +12,25 @@ Why: dual-mode import so it runs via `python -m app.ingest.extract_text` or `pyt
 """
 from __future__ import annotations
 
-import json
 import os
-import re
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
-from qdrant_client.http.models import Distance, SparseVectorParams, VectorParams
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    Modifier,
+    PayloadSchemaType,
+    SparseVectorParams,
+)
 from markitdown import MarkItDown
 
 # --- dual-mode import: module or script ---------------------------------------
@@ -28,123 +39,443 @@ if __package__ in (None, ""):
     REPO_ROOT = Path(__file__).resolve().parents[2]
     if str(REPO_ROOT) not in sys.path:
         sys.path.insert(0, str(REPO_ROOT))
+    from app.ingest.collection_versions import (  # type: ignore
+        begin_bulk_load,
+        collection_exists,
+        finish_bulk_load,
+        gc_versions,
+        next_version,
+        require_versioned,
+        resolve_collection,
+        set_data_version,
+        swap_alias,
+        version_number,
+    )
+    from app.ingest.conversion_cache import ConversionCache  # type: ignore
     from app.ingest.embed_qdrant import EmbeddingSelfQuery  # type: ignore
+    from app.ingest.manifest import IngestManifest, file_sha256, manifest_path, point_id  # type: ignore
+    from app.ingest.structured_extraction import (  # type: ignore
+        BatchAccumulator,
+        DeadLetter,
+        ExtractionJob,
+        StructuredExtractor,
+        dead_letter_path,
+        to_chunks,
+    )
+    from app.ingest.sumula_parser import try_parse  # type: ignore
+    from app.ingest.vector_layout import DENSE_VECTOR, VectorLayout  # type: ignore
+    from app.utils.answer_cache import get_answer_cache  # type: ignore
+    from app.utils.settings import settings  # type: ignore
 else:
     # When run as `python -m app.ingest.extract_text`
+    from .collection_versions import (
+        begin_bulk_load,
+        collection_exists,
+        finish_bulk_load,
+        gc_versions,
+        next_version,
+        require_versioned,
+        resolve_collection,
+        set_data_version,
+        swap_alias,
+        version_number,
+    )
+    from .conversion_cache import ConversionCache
     from .embed_qdrant import EmbeddingSelfQuery
+    from .manifest import IngestManifest, file_sha256, manifest_path, point_id
+    from .structured_extraction import (
+        BatchAccumulator,
+        DeadLetter,
+        ExtractionJob,
+        StructuredExtractor,
+        dead_letter_path,
+        to_chunks,
+    )
+    from .sumula_parser import try_parse
+    from .vector_layout import DENSE_VECTOR, VectorLayout
+    from ..utils.answer_cache import get_answer_cache
+    from ..utils.settings import settings
 # ------------------------------------------------------------------------------
 
 md = MarkItDown()
 
+# Índices de payload usados pelos filtros do self-query e pela busca só por metadados
+PAYLOAD_INDEXES = {
+    "num_sumula": PayloadSchemaType.KEYWORD,
+    "status_atual": PayloadSchemaType.KEYWORD,
+    "chunk_type": PayloadSchemaType.KEYWORD,
+    "data_status_ano": PayloadSchemaType.INTEGER,
+}
+
 
-def process_pdf_file(file_path: str, embedder: EmbeddingSelfQuery) -> List[Dict[str, Any]]:
+def ensure_collection(client: QdrantClient, collection: str, layout: VectorLayout | None = None) -> None:
     """
-    Usa o LLM do embedder para extrair metadados/chunks e retorna lista de {text, metadata}.
+    Cria a coleção (se preciso) e os índices de payload dos campos filtráveis. O vetor
+    denso segue `layout` (padrão: EMBEDDING_DIMENSIONS / VECTOR_QUANTIZATION).
     """
-    pdf_name = os.path.basename(file_path)
+    layout = layout or VectorLayout.from_settings()
+    # IDF do BM25 calculado pelo Qdrant sobre o vetor esparso (ver sparse_encoder)
+    sparse_params = SparseVectorParams(modifier=Modifier.IDF)
+    if not client.collection_exists(collection_name=collection):
+        client.create_collection(
+            collection_name=collection,
+            vectors_config={DENSE_VECTOR: layout.vector_params()},
+            sparse_vectors_config={"text-sparse": sparse_params},
+            quantization_config=layout.quantization_config(),
+        )
+        print(f"Coleção '{collection}' criada ({layout.describe()}).")
+    else:
+        print(f"Coleção '{collection}' já existe.")
+        existing = VectorLayout.of_collection(client, collection)
+        if existing.dimensions != layout.dimensions:
+            raise ValueError(
+                f"A coleção '{collection}' tem vetores de {existing.dimensions} dimensões e a configuração pede "
+                f"{layout.dimensions}. Migre com `python -m app.ingest.vector_layout migrate --collection "
+                f"{collection} --dimensions {layout.dimensions}` ou ajuste EMBEDDING_DIMENSIONS."
+            )
+        if existing.quantization != layout.quantization:
+            print(
+                f"⚠️ Coleção com quantização '{existing.quantization}' (configurado: '{layout.quantization}'); "
+                "para trocar, use `python -m app.ingest.vector_layout migrate`."
+            )
+        current = client.get_collection(collection).config.params.sparse_vectors or {}
+        if "text-sparse" in current and current["text-sparse"].modifier != Modifier.IDF:
+            client.update_collection(collection_name=collection, sparse_vectors_config={"text-sparse": sparse_params})
+
+    for field, schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=f"metadata.{field}",
+            field_schema=schema,
+        )
+
+
+def convert_pdf(file_path: str) -> Tuple[str, str]:
+    """Conversão PDF -> texto (CPU). Função de módulo para rodar no ProcessPoolExecutor."""
     result = md.convert(str(file_path))
-    text_content = result.text_content or ""
-
-    prompt = f"""
-Você é um especialista jurídico do Tribunal de Contas de Minas Gerais.
-Analise o texto abaixo e extraia:
-
-1️⃣ Metadados:
-- num_sumula: número da súmula (ex: 71)
-- data_status: última data (formato DD/MM/AA)
-- data_status_ano: última data (formato AAAA)
-- status_atual: último status (VIGENTE, REVOGADA, ALTERADA, etc.)
-- pdf_name: nome do arquivo PDF
-
-2️⃣ Chunks (máximo de 3):
-- conteudo_principal: texto vigente até antes de 'REFERÊNCIAS NORMATIVAS'
-- referencias_normativas: texto após 'REFERÊNCIAS NORMATIVAS:' até antes de 'PRECEDENTES:'
-- precedentes: texto após 'PRECEDENTES:' até o final
-
-Retorne **somente** um JSON no formato:
-{{
-  "metadados": {{
-    "num_sumula": "...",
-    "data_status": "...",
-    "data_status_ano": "...",
-    "status_atual": "...",
-    "pdf_name": "{pdf_name}"
-  }},
-  "chunks": {{
-    "conteudo_principal": "...",
-    "referencias_normativas": "...",
-    "precedentes": "..."
-  }}
-}}
-
-Texto da súmula:
-{text_content[:12000]}
-"""
+    return os.path.basename(file_path), result.text_content or ""
 
-    try:
-        response = embedder.llm.invoke(prompt)
-        json_text = re.sub(r"```[\w-]*", "", response.content).replace("```", "").strip()
-        data = json.loads(json_text)
-
-        metadados = data.get("metadados", {})
-        chunks = data.get("chunks", {})
-
-        processed: List[Dict[str, Any]] = []
-        for idx, (tipo, texto) in enumerate(chunks.items()):
-            if not texto or idx >= 3:
-                continue
-            metadata = {
-                "num_sumula": metadados.get("num_sumula"),
-                "data_status": metadados.get("data_status"),
-                "data_status_ano": metadados.get("data_status_ano"),
-                "status_atual": metadados.get("status_atual"),
-                "pdf_name": metadados.get("pdf_name", pdf_name),
-                "chunk_type": tipo,
-                "chunk_index": idx,
-            }
-            processed.append({"text": texto.strip(), "metadata": metadata})
-
-        return processed
-
-    except Exception as e:
-        print(f"⚠️ Erro ao processar {pdf_name}: {e}")
-        return []
-
-
-def main(collection: str = "sumulas_jornada", pasta_pdfs: str | None = None) -> None:
-    # Use repo-root/sumulas por padrão (why: execução a partir de qualquer CWD)
-    repo_root = Path(__file__).resolve().parents[2]
-    pdf_dir = Path(pasta_pdfs) if pasta_pdfs else repo_root / "sumulas"
 
-    embedder = EmbeddingSelfQuery()
+def _convert_timed(file_path: str) -> Tuple[str, str, float]:
+    start = time.perf_counter()
+    pdf_name, text_content = convert_pdf(file_path)
+    return pdf_name, text_content, time.perf_counter() - start
 
-    if not embedder.client.collection_exists(collection_name=collection):
-        embedder.client.create_collection(
-            collection_name=collection,
-            vectors_config={"text-dense": VectorParams(size=3072, distance=Distance.COSINE)},
-            sparse_vectors_config={"text-sparse": SparseVectorParams()},
+
+def process_pdf_file(file_path: str, embedder: EmbeddingSelfQuery) -> List[Dict[str, Any]]:
+    """
+    Converte um PDF e extrai metadados/chunks (parser local; LLM do embedder se a
+    validação do parser falhar); retorna lista de {text, metadata} ([] se falhar).
+    """
+    pdf_name, text_content = convert_pdf(file_path)
+    item, _ = try_parse(text_content, pdf_name)
+    if item is not None:
+        return to_chunks(item, pdf_name)
+    results, _ = StructuredExtractor(embedder.llm).extract([ExtractionJob.from_text(pdf_name, text_content)])
+    return results.get(pdf_name, [])
+
+
+@dataclass
+class IngestReport:
+    docs: int = 0
+    failed: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    parsed: int = 0
+    llm_calls: int = 0
+    conversions: int = 0
+    conversion_hits: int = 0
+    conversion_seconds_saved: float = 0.0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        docs = self.docs or 1
+        return (
+            f"{self.docs} PDFs processados ({self.failed} com falha, {self.failed / docs:.1%}), "
+            f"{self.chunks} chunks inseridos, {self.skipped} inalterados, {self.deleted} removidos, "
+            f"{self.conversions} conversões ({self.conversion_hits} do cache, "
+            f"~{self.conversion_seconds_saved:.1f}s economizados), "
+            f"{self.parsed} extraídos pelo parser local, {self.llm_calls} chamadas ao LLM ({self.llm_calls / docs:.2f}/doc) "
+            f"em {self.elapsed:.1f}s — {self.docs / elapsed:.2f} docs/s, {self.chunks / elapsed:.2f} chunks/s"
         )
-        print(f"Coleção '{collection}' criada.")
-    else:
-        print(f"Coleção '{collection}' já existe.")
 
-    vector_store = embedder.get_qdrant_vector_store(collection)
-    pdf_files = list(pdf_dir.glob("*.pdf"))
+
+def _pdf_filter(pdf_names: List[str]) -> Filter:
+    return Filter(must=[FieldCondition(key="metadata.pdf_name", match=MatchAny(any=pdf_names))])
+
+
+def _delete_stale_points(client: QdrantClient, collection: str, ids_by_pdf: Dict[str, List[str]]) -> None:
+    """
+    Apaga, em uma só requisição, os pontos dos PDFs do lote que não vieram nesta ingestão
+    (tipos de chunk sumidos, IDs aleatórios antigos). Os IDs derivam do nome do PDF, então
+    a união dos mantidos vale para todos os PDFs do filtro.
+    """
+    client.delete(
+        collection_name=collection,
+        points_selector=FilterSelector(
+            filter=Filter(
+                must=[FieldCondition(key="metadata.pdf_name", match=MatchAny(any=list(ids_by_pdf)))],
+                must_not=[HasIdCondition(has_id=[pid for keep_ids in ids_by_pdf.values() for pid in keep_ids])],
+            )
+        ),
+    )
+
+
+def _promote_version(client: QdrantClient, alias: str, target: str, threshold: int | None, report: IngestReport) -> None:
+    """Fim da reindexação em versão nova: religa a indexação e troca o alias se a versão está completa."""
+    if not finish_bulk_load(client, target, threshold):
+        print(f"⚠️ '{target}' ainda está indexando; o alias é trocado e a indexação termina em segundo plano.")
+    if report.failed or not report.chunks:
+        print(
+            f"⚠️ '{target}' ficou incompleta ({report.failed} PDFs com falha, {report.chunks} chunks); "
+            f"'{alias}' continua na versão anterior. Reprocesse com --collection {target} --dead-letter-only "
+            f"e promova com `python -m app.ingest.collection_versions swap --version {version_number(alias, target)}`."
+        )
+        return
+    previous = swap_alias(client, alias, target)
+    removed = gc_versions(client, alias)
+    print(f"✅ '{alias}' agora aponta para '{target}' (antes: '{previous or '-'}'); versões apagadas: {', '.join(removed) or '-'}")
+
+
+def main(
+    collection: str = settings.COLLECTION_NAME,
+    pasta_pdfs: str | None = None,
+    embedder: EmbeddingSelfQuery | None = None,
+    convert_workers: int | None = None,
+    llm_concurrency: int = 8,
+    batch_size: int = 64,
+    max_retries: int = 3,
+    full_rebuild: bool = False,
+    dry_run: bool = False,
+    dead_letter_only: bool = False,
+    use_parser: bool | None = None,
+    reconvert: bool = False,
+    new_version: bool | None = None,
+) -> IngestReport:
+    """
+    Pipeline em estágios: conversão dos PDFs em um pool de processos, extração pelo
+    parser local (`use_parser`, padrão EXTRACTION_PARSER_ENABLED) ou, se a validação
+    dele falhar, estruturada via LLM (várias súmulas curtas por requisição) em um pool
+    de threads limitado a `llm_concurrency`, e embedding + upsert no Qdrant em lotes de
+    `batch_size` chunks de vários documentos. `convert_workers=0` converte na thread
+    principal.
+
+    As conversões ficam no cache endereçado pelo hash do PDF (CONVERSION_CACHE_ENABLED);
+    `reconvert` converte de novo mesmo quando há texto em cache (e o regrava).
+
+    Documentos cuja extração continua inválida após `max_retries` vão para o arquivo de
+    dead-letter da coleção; `dead_letter_only` reprocessa só eles.
+
+    Incremental por padrão: o manifesto de hashes decide o que processar; os pontos
+    têm IDs determinísticos (pdf_name + chunk_type), então alterações são regravadas
+    no lugar. `full_rebuild` reprocessa todos os PDFs; `dry_run` só lista o que mudaria.
+
+    `collection` é o alias das consultas (ver app.ingest.collection_versions). As
+    atualizações incrementais vão para a versão ativa; a reindexação completa
+    (`new_version`, padrão: `full_rebuild` ou coleção ainda inexistente) grava uma versão
+    nova com a indexação desligada durante o upload e troca o alias no fim.
+    """
+    # Use repo-root/sumulas por padrão (why: execução a partir de qualquer CWD)
+    repo_root = Path(__file__).resolve().parents[2]
+    pdf_dir = Path(pasta_pdfs) if pasta_pdfs else repo_root / "sumulas"
+
+    report = IngestReport()
+    pdf_files = {p.name: p for p in sorted(pdf_dir.glob("*.pdf"))}
     if not pdf_files:
         print(f"Nenhum PDF encontrado na pasta: {pdf_dir}")
-        return
+        return report
+
+    embedder = embedder or EmbeddingSelfQuery()
+    if new_version is None:
+        new_version = (full_rebuild and not dead_letter_only) or not collection_exists(embedder.client, collection)
+    if new_version:
+        # A versão nova termina na troca do alias: uma coleção sem versão com o nome dele
+        # precisa ser migrada antes (falha aqui, não depois da ingestão inteira)
+        require_versioned(embedder.client, collection)
+    # Coleção física gravada: versão nova ao lado da ativa ou a própria versão ativa
+    target = next_version(embedder.client, collection) if new_version else resolve_collection(embedder.client, collection, ttl=0)
+
+    manifest = IngestManifest(manifest_path(target))
+    hashes = {name: file_sha256(path) for name, path in pdf_files.items()}
+    plan = manifest.plan(hashes)
+    if full_rebuild:
+        plan.changed = sorted(set(plan.changed) | set(plan.unchanged))
+        plan.unchanged = []
+    dead_letter = DeadLetter(dead_letter_path(target))
+    if dead_letter_only:
+        retry = set(dead_letter.names())
+        plan.added = [n for n in plan.added if n in retry]
+        plan.changed = sorted((set(plan.changed) | set(plan.unchanged)) & retry)
+        plan.deleted = []
+
+    if dry_run:
+        print(f"[dry-run] Coleção '{collection}' ('{target}'): {plan.summary()}")
+        return report
+    print(plan.summary().splitlines()[0])
+
+    ensure_collection(embedder.client, target)
+    threshold = begin_bulk_load(embedder.client, target) if new_version else None
+
+    # Modo híbrido: cada lote grava o vetor denso e o esparso (BM25) dos trechos
+    vector_store = embedder.get_qdrant_vector_store(target, "hybrid")
+    sparse_encoder = embedder.get_sparse_encoder(target)
+    report.skipped = len(plan.unchanged)
+
+    if plan.deleted:
+        embedder.client.delete(
+            collection_name=target,
+            points_selector=FilterSelector(filter=_pdf_filter(plan.deleted)),
+        )
+        manifest.forget(plan.deleted)
+        sparse_encoder.forget(plan.deleted)
+        report.deleted = len(plan.deleted)
+
+    if convert_workers is None:
+        convert_workers = os.cpu_count() or 1
+
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        if not batch:
+            return
+        ids = [point_id(c["metadata"]["pdf_name"], c["metadata"]["chunk_type"]) for c in batch]
+        # Cada documento entra inteiro em um lote: os tamanhos dos pontos dele substituem
+        # os da ingestão anterior nas estatísticas do BM25, antes de os vetores serem calculados
+        ids_by_pdf: Dict[str, List[str]] = {}
+        texts_by_pdf: Dict[str, List[str]] = {}
+        for chunk, pid in zip(batch, ids):
+            ids_by_pdf.setdefault(chunk["metadata"]["pdf_name"], []).append(pid)
+            texts_by_pdf.setdefault(chunk["metadata"]["pdf_name"], []).append(chunk["text"])
+        for pdf_name, keep_ids in ids_by_pdf.items():
+            sparse_encoder.record(pdf_name, keep_ids, texts_by_pdf[pdf_name])
+        vector_store.add_texts(
+            texts=[c["text"] for c in batch],
+            metadatas=[c["metadata"] for c in batch],
+            ids=ids,
+        )
+        # Limpa os pontos antigos (uma versão recém-criada não tem nenhum) e atualiza o manifesto
+        if not new_version:
+            _delete_stale_points(embedder.client, target, ids_by_pdf)
+        for pdf_name, keep_ids in ids_by_pdf.items():
+            manifest.record(pdf_name, hashes[pdf_name], len(keep_ids))
+        report.chunks += len(batch)
+        batch.clear()
+
+    extractor = StructuredExtractor(embedder.llm, max_retries)
+    accumulator = BatchAccumulator()
+    use_parser = settings.EXTRACTION_PARSER_ENABLED if use_parser is None else use_parser
+
+    start = time.perf_counter()
+    conversions = ConversionCache() if settings.CONVERSION_CACHE_ENABLED else None
+    cached: Dict[str, str] = {}
+    if conversions is not None and not reconvert:
+        for pdf_name in plan.to_process:
+            text_content = conversions.get(hashes[pdf_name])
+            if text_content is not None:
+                cached[pdf_name] = text_content
+    to_convert = [name for name in plan.to_process if name not in cached]
+
+    convert_pool = ProcessPoolExecutor(max_workers=convert_workers) if convert_workers > 0 and to_convert else None
+    try:
+        with ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+            # future -> ("convert", pdf_name) ou ("extract", documentos do lote)
+            pending: Dict[Future, Tuple[str, Any]] = {}
+            for pdf_name in to_convert:
+                pool = convert_pool or llm_pool
+                pending[pool.submit(_convert_timed, str(pdf_files[pdf_name]))] = ("convert", pdf_name)
+            converting = len(to_convert)
+
+            def submit_extraction(jobs: List[ExtractionJob] | None) -> None:
+                if jobs:
+                    pending[llm_pool.submit(extractor.extract, jobs)] = ("extract", jobs)
+
+            def on_converted(pdf_name: str, text_content: str) -> None:
+                item, problems = try_parse(text_content, pdf_name) if use_parser else (None, [])
+                if item is not None:
+                    report.docs += 1
+                    report.parsed += 1
+                    dead_letter.discard(pdf_name)
+                    batch.extend(to_chunks(item, pdf_name))
+                else:
+                    if problems:
+                        print(f"⚠️ Parser não validou {pdf_name} ({'; '.join(problems)}); extraindo via LLM.")
+                    submit_extraction(accumulator.add(ExtractionJob.from_text(pdf_name, text_content)))
+                if len(batch) >= batch_size:
+                    flush()
+
+            for pdf_name, text_content in cached.items():
+                on_converted(pdf_name, text_content)
+            if converting == 0:
+                submit_extraction(accumulator.flush())
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, source = pending.pop(future)
+                    if stage == "convert":
+                        converting -= 1
+                        try:
+                            _, text_content, seconds = future.result()
+                        except Exception as e:
+                            print(f"⚠️ Erro na conversão de {source}: {e}")
+                            report.docs += 1
+                            report.failed += 1
+                            dead_letter.add(source, f"conversão: {e}", hashes[source])
+                        else:
+                            if conversions is not None:
+                                conversions.put(hashes[source], source, text_content, seconds)
+                            on_converted(source, text_content)
+                        if converting == 0:
+                            submit_extraction(accumulator.flush())
+                        continue
+
+                    results, errors = future.result()
+                    for job in source:
+                        report.docs += 1
+                        if job.pdf_name in errors:
+                            report.failed += 1
+                            dead_letter.add(job.pdf_name, errors[job.pdf_name], hashes[job.pdf_name], max_retries + 1)
+                            continue
+                        dead_letter.discard(job.pdf_name)
+                        batch.extend(results[job.pdf_name])
+                    if len(batch) >= batch_size:
+                        flush()
+    finally:
+        if convert_pool is not None:
+            convert_pool.shutdown(cancel_futures=True)
+    flush()
+    manifest.save()
+    dead_letter.save()
+    sparse_encoder.save()
+    if report.chunks or report.deleted:
+        # Nos metadados da coleção: a chave do cache de respostas de todos os servidores muda
+        set_data_version(embedder.client, target, manifest.digest())
+    report.elapsed = time.perf_counter() - start
+    report.llm_calls = extractor.stats.calls
+    report.conversions = len(to_convert)
+    if conversions is not None:
+        report.conversion_hits = conversions.stats.hits
+        report.conversion_seconds_saved = conversions.stats.seconds_saved
+
+    print(f"✅ {report.summary()}")
+    if extractor.stats.docs:
+        print(extractor.stats.summary())
+    if dead_letter.entries:
+        print(
+            f"⚠️ {len(dead_letter.entries)} documentos em {dead_letter.path}; "
+            "reprocesse só eles com --dead-letter-only."
+        )
 
-    total_chunks = 0
-    for pdf_file in pdf_files:
-        chunks = process_pdf_file(str(pdf_file), embedder)
-        if not chunks:
-            continue
-        texts = [c["text"] for c in chunks]
-        metadatas = [c["metadata"] for c in chunks]
-        vector_store.add_texts(texts=texts, metadatas=metadatas)
-        total_chunks += len(chunks)
+    if new_version:
+        _promote_version(embedder.client, collection, target, threshold, report)
 
-    print(f"✅ {len(pdf_files)} PDFs processados. {total_chunks} chunks inseridos no Qdrant.")
+    # Respostas em cache foram geradas sobre a versão anterior da coleção
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and (report.chunks or report.deleted):
+        answer_cache.invalidate(collection)
+    return report
 
 
 if __name__ == "__main__":
@@ -152,52 +483,33 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("--collection", default="sumulas_jornada")
+    parser.add_argument("--collection", default=settings.COLLECTION_NAME, help="alias das consultas (ou uma versão)")
     parser.add_argument("--pasta_pdfs", default=None)
+    parser.add_argument("--convert-workers", type=int, default=None, help="processos de conversão (0 = sem pool)")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="chamadas simultâneas ao LLM")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks por lote de embedding/upsert")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--full-rebuild", action="store_true", help="reprocessa todos os PDFs, ignorando o manifesto")
+    parser.add_argument("--dry-run", action="store_true", help="só lista o que seria inserido/alterado/removido")
+    parser.add_argument("--dead-letter-only", action="store_true", help="reprocessa só os documentos do dead-letter")
+    parser.add_argument("--llm-only", action="store_true", help="extrai tudo via LLM, sem o parser local")
+    parser.add_argument(
+        "--in-place", action="store_true", help="--full-rebuild na versão ativa, sem criar versão nova nem trocar o alias"
+    )
+    parser.add_argument("--reconvert", action="store_true", help="converte os PDFs de novo, ignorando o cache de conversões")
     args = parser.parse_args()
 
-    main(collection=args.collection, pasta_pdfs=args.pasta_pdfs)
-
-
-# file: app/ingest/embed_qdrant.py
-# unchanged; included for completeness
-from qdrant_client import QdrantClient
-from app.utils.settings import settings
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_qdrant import QdrantVectorStore
-
-
-class EmbeddingSelfQuery:
-    def __init__(self) -> None:
-        self.llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
-        self.client = QdrantClient(
-            host=settings.QDRANT_HOST,
-            port=settings.QDRANT_PORT,
-            timeout=120,
-        )
-        self.model = OpenAIEmbeddings(model="text-embedding-3-large")
-
-    def get_qdrant_vector_store(self, collection_name: str) -> QdrantVectorStore:
-        return QdrantVectorStore(
-            client=self.client,
-            collection_name=collection_name,
-            embedding=self.model,
-            sparse_vector_name="text-sparse",
-            vector_name="text-dense",
-        )
-
-
-# file: .vscode/launch.json  (optional, helps F5 run as module)
-{
-  "version": "0.2.0",
-  "configurations": [
-    {
-      "name": "Run extract (module)",
-      "type": "python",
-      "request": "launch",
-      "module": "app.ingest.extract_text",
-      "justMyCode": true,
-      "args": ["--collection", "sumulas_jornada"]
-    }
-  ]
-}
+    main(
+        collection=args.collection,
+        pasta_pdfs=args.pasta_pdfs,
+        convert_workers=args.convert_workers,
+        llm_concurrency=args.llm_concurrency,
+        batch_size=args.batch_size,
+        max_retries=args.max_retries,
+        full_rebuild=args.full_rebuild,
+        dry_run=args.dry_run,
+        dead_letter_only=args.dead_letter_only,
+        use_parser=False if args.llm_only else None,
+        reconvert=args.reconvert,
+        new_version=False if args.in_place else None,
+    )
@@ -0,0 +1,102 @@
+"""
+Manifesto da ingestão: hash do conteúdo de cada PDF já carregado na coleção.
+
+Permite reingestão incremental e idempotente: PDFs inalterados são pulados, os
+alterados são regravados no lugar (IDs determinísticos por pdf_name + chunk_type) e
+os removidos da pasta têm seus pontos apagados.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from app.utils.settings import settings
+
+# Namespace fixo: o mesmo (pdf_name, chunk_type) gera sempre o mesmo ID de ponto
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2b7e-3d4a-5e8f-9a0b-1c2d3e4f5a6b")
+
+
+def point_id(pdf_name: str, chunk_type: str) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{pdf_name}:{chunk_type}"))
+
+
+def file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(collection: str) -> Path:
+    return Path(settings.CACHE_DIR) / f"ingest_manifest_{collection}.json"
+
+
+@dataclass
+class IngestPlan:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    @property
+    def to_process(self) -> List[str]:
+        return self.added + self.changed
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def summary(self) -> str:
+        lines = [
+            f"{len(self.added)} novos, {len(self.changed)} alterados, "
+            f"{len(self.deleted)} removidos, {len(self.unchanged)} inalterados"
+        ]
+        for sign, names in (("+", self.added), ("~", self.changed), ("-", self.deleted)):
+            lines.extend(f"  {sign} {name}" for name in names)
+        return "\n".join(lines)
+
+
+class IngestManifest:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, object]] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def plan(self, hashes: Dict[str, str]) -> IngestPlan:
+        """Compara os hashes atuais (pdf_name -> sha256) com o manifesto."""
+        plan = IngestPlan()
+        for pdf_name, sha in sorted(hashes.items()):
+            entry = self.entries.get(pdf_name)
+            if entry is None:
+                plan.added.append(pdf_name)
+            elif entry.get("sha256") != sha:
+                plan.changed.append(pdf_name)
+            else:
+                plan.unchanged.append(pdf_name)
+        plan.deleted = sorted(set(self.entries) - set(hashes))
+        return plan
+
+    def record(self, pdf_name: str, sha: str, chunks: int) -> None:
+        self.entries[pdf_name] = {"sha256": sha, "chunks": chunks}
+
+    def forget(self, pdf_names: Iterable[str]) -> None:
+        for pdf_name in pdf_names:
+            self.entries.pop(pdf_name, None)
+
+    def digest(self) -> str:
+        """Hash do conteúdo do manifesto: muda quando algum PDF entra, muda ou sai da coleção."""
+        raw = json.dumps(self.entries, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
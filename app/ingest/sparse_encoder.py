@@ -0,0 +1,179 @@
+"""
+Encoder esparso local (BM25) para o vetor "text-sparse" da coleção.
+
+O vocabulário (token -> índice) e as estatísticas do corpus (nº de documentos e
+tamanho médio) são gravados em JSON na ingestão e relidos nas consultas. O lado do
+documento leva o peso de saturação do BM25 (k1, b); o IDF é aplicado pelo Qdrant
+(`Modifier.IDF` no SparseVectorParams), então a consulta só marca os tokens com peso 1.
+
+As estatísticas vêm do tamanho de cada ponto, guardado por PDF (`record` / `forget`,
+chamados pela ingestão): reprocessar um PDF substitui os tamanhos dos pontos dele e
+apagá-lo os remove, então reingestões incrementais não inflam o nº de documentos.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+from app.utils.settings import settings
+
+_TOKEN_RE = re.compile(r"\d+(?:[./]\d+)*|[a-z]+")
+
+# Palavras que antecedem números com valor de referência ("art. 37", "lei 8.666")
+_REF_PREFIXES = {
+    "art": "art", "artigo": "art", "arts": "art", "lei": "lei", "decreto": "decreto",
+    "sumula": "sumula", "inciso": "inciso", "emenda": "emenda", "resolucao": "resolucao",
+    "consulta": "consulta", "instrucao": "instrucao", "normativa": "instrucao",
+}
+
+_STOPWORDS = {
+    "a", "ao", "aos", "as", "o", "os", "e", "de", "da", "das", "do", "dos", "em", "no", "na",
+    "nos", "nas", "um", "uma", "que", "qual", "quais", "para", "por", "pelo", "pela", "com",
+    "se", "sem", "ou", "sua", "seu", "suas", "seus", "nao", "ser", "sobre", "como", "mais",
+    "este", "esta", "esse", "essa", "n", "pag",
+}
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokens sem acento e em minúsculas. Números perdem os pontos de milhar ("8.666" ->
+    "8666") e, logo após art./lei/decreto/..., geram também o termo composto "art_37".
+    """
+    tokens: List[str] = []
+    previous = ""
+    for raw in _TOKEN_RE.findall(_fold(text)):
+        if raw[0].isdigit():
+            token = raw.replace(".", "")
+            tokens.append(token)
+            prefix = _REF_PREFIXES.get(previous)
+            if prefix:
+                tokens.append(f"{prefix}_{token}")
+        elif raw not in _STOPWORDS:
+            tokens.append(raw)
+        if raw not in ("n", "o", "no"):  # "Lei nº 8.666" -> "lei", "n", "8.666"
+            previous = raw
+    return tokens
+
+
+class BM25SparseEncoder(SparseEmbeddings):
+    def __init__(self, path: str | Path, k1: float = 1.2, b: float = 0.75) -> None:
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        # pdf_name -> {id do ponto: nº de tokens}
+        self.lengths: Dict[str, Dict[str, int]] = {}
+        self.doc_count = 0
+        self.total_length = 0
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        self.vocab = data["vocab"]
+        self.lengths = data.get("lengths", {})
+        if "lengths" in data:
+            self._recount()
+        else:
+            # Arquivo anterior aos tamanhos por ponto: totais acumulados até a próxima reindexação completa
+            self.doc_count = data["doc_count"]
+            self.total_length = data["total_length"]
+        self._mtime = self.path.stat().st_mtime
+
+    def _maybe_reload(self) -> None:
+        # Outro processo (a ingestão) pode ter ampliado o vocabulário desde a carga
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                self._load()
+
+    def save(self) -> None:
+        with self._lock:
+            data = {
+                "vocab": self.vocab,
+                "doc_count": self.doc_count,
+                "total_length": self.total_length,
+                "lengths": self.lengths,
+                "k1": self.k1,
+                "b": self.b,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._mtime = self.path.stat().st_mtime
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.doc_count if self.doc_count else 1.0
+
+    def _recount(self) -> None:
+        self.doc_count = sum(len(points) for points in self.lengths.values())
+        self.total_length = sum(sum(points.values()) for points in self.lengths.values())
+
+    def record(self, pdf_name: str, ids: List[str], texts: List[str]) -> None:
+        """Pontos atuais do PDF (substituem os da ingestão anterior) nas estatísticas do corpus."""
+        points = {pid: len(tokenize(text)) for pid, text in zip(ids, texts)}
+        with self._lock:
+            previous = self.lengths.get(pdf_name, {})
+            self.doc_count += len(points) - len(previous)
+            self.total_length += sum(points.values()) - sum(previous.values())
+            self.lengths[pdf_name] = points
+
+    def forget(self, pdf_names: List[str]) -> None:
+        """Tira das estatísticas os pontos dos PDFs apagados da coleção."""
+        with self._lock:
+            for pdf_name in pdf_names:
+                previous = self.lengths.pop(pdf_name, {})
+                self.doc_count -= len(previous)
+                self.total_length -= sum(previous.values())
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        """
+        Vetores dos trechos; amplia o vocabulário (gravado em `save`). As estatísticas
+        do corpus são as de `record`, chamado antes com os mesmos trechos.
+        """
+        tokenized = [tokenize(t) for t in texts]
+        with self._lock:
+            for tokens in tokenized:
+                for token in tokens:
+                    if token not in self.vocab:
+                        self.vocab[token] = len(self.vocab)
+            avg_length = self.avg_length
+            vectors = []
+            for tokens in tokenized:
+                norm = self.k1 * (1 - self.b + self.b * len(tokens) / avg_length)
+                weights = {
+                    self.vocab[token]: tf * (self.k1 + 1) / (tf + norm)
+                    for token, tf in Counter(tokens).items()
+                }
+                vectors.append(SparseVector(indices=list(weights), values=list(weights.values())))
+        return vectors
+
+    def embed_query(self, text: str) -> SparseVector:
+        self._maybe_reload()
+        indices = sorted({self.vocab[t] for t in tokenize(text) if t in self.vocab})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+
+def sparse_vocab_path(collection: str) -> Path:
+    return Path(settings.SPARSE_VOCAB_DIR) / f"{collection}.json"
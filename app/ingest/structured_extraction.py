@@ -0,0 +1,340 @@
+"""
+Extração estruturada dos metadados e trechos das súmulas, com saída tipada.
+
+O LLM responde no schema LoteExtraido (structured outputs: `with_structured_output`),
+e cada súmula devolvida é validada contra o documento de origem. Súmulas curtas são
+agrupadas em uma mesma requisição até EXTRACTION_BATCH_TOKENS /
+EXTRACTION_BATCH_MAX_DOCS. Só os documentos inválidos (ou ausentes na resposta) são
+repetidos, um por requisição, com backoff; o que continuar inválido vai para o arquivo
+de dead-letter, para uma nova rodada só com eles (`extract_text.py --dead-letter-only`).
+
+Textos acima de EXTRACTION_MAX_DOC_TOKENS são cortados por tokens sem perder as
+seções PRECEDENTES: o excedente sai primeiro do restante do texto.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from pydantic import BaseModel, Field
+
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+CHUNK_TYPES = ("conteudo_principal", "referencias_normativas", "precedentes")
+TRUNCATION_MARK = "\n[... texto truncado]\n"
+_SECTION_RE = re.compile(r"^(?=[ \t\f]*(?:REFER[ÊE]NCIAS? NORMATIVAS?|PRECEDENTES)[^:\n]*:)", re.MULTILINE)
+
+
+# --- Schema -------------------------------------------------------------------
+class Metadados(BaseModel):
+    num_sumula: Optional[str] = Field(description="Número da súmula, só dígitos (ex.: '71').")
+    data_status: Optional[str] = Field(description="Data do status mais recente, no formato DD/MM/AA.")
+    data_status_ano: Optional[int] = Field(description="Ano (AAAA) do status mais recente.")
+    status_atual: Optional[str] = Field(description="Status mais recente: VIGENTE, REVOGADA, MODIFICADA etc.")
+
+
+class Trechos(BaseModel):
+    conteudo_principal: str = Field(description="Texto vigente, até antes de 'REFERÊNCIA(S) NORMATIVA(S)'.")
+    referencias_normativas: str = Field(
+        description="Texto após 'REFERÊNCIA(S) NORMATIVA(S):' até antes de 'PRECEDENTES:' ('' se não houver)."
+    )
+    precedentes: str = Field(description="Texto após 'PRECEDENTES:' até o final ('' se não houver).")
+
+
+class SumulaExtraida(BaseModel):
+    pdf_name: str = Field(description="Nome do arquivo, exatamente como no atributo pdf_name do documento.")
+    metadados: Metadados
+    chunks: Trechos
+
+
+class LoteExtraido(BaseModel):
+    sumulas: List[SumulaExtraida] = Field(description="Uma entrada por documento recebido, na mesma ordem.")
+
+
+EXTRACTION_INSTRUCTIONS = """Você é um especialista jurídico do Tribunal de Contas de Minas Gerais.
+Para cada documento entre <documento> e </documento>, extraia os metadados e os trechos
+da súmula, copiando o texto dos trechos sem resumir. Devolva uma entrada por documento,
+com o pdf_name exatamente igual ao do atributo do documento."""
+
+
+# --- Documentos e orçamento de tokens ------------------------------------------
+@dataclass
+class ExtractionJob:
+    pdf_name: str
+    text: str
+    tokens: int
+    truncated: bool = False
+
+    @classmethod
+    def from_text(cls, pdf_name: str, text: str, max_tokens: Optional[int] = None) -> "ExtractionJob":
+        max_tokens = max_tokens or settings.EXTRACTION_MAX_DOC_TOKENS
+        fitted, truncated = fit_to_token_budget(text, max_tokens)
+        return cls(pdf_name=pdf_name, text=fitted, tokens=count_tokens(fitted), truncated=truncated)
+
+
+def _split_sections(text: str) -> List[str]:
+    return [s for s in _SECTION_RE.split(text) if s]
+
+
+def _is_precedentes(section: str) -> bool:
+    return section.lstrip().startswith("PRECEDENTES")
+
+
+def fit_to_token_budget(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Corta o texto para caber em `max_tokens` preservando as seções PRECEDENTES: os
+    demais trechos são encurtados na ordem do documento; só se as seções de precedentes
+    sozinhas passarem de 3/4 do orçamento elas também são encurtadas (proporcionalmente,
+    mantendo o cabeçalho e o início de cada uma).
+    """
+    if count_tokens(text) <= max_tokens:
+        return text, False
+
+    sections = _split_sections(text)
+    sizes = [count_tokens(s) for s in sections]
+    protected = sum(size for s, size in zip(sections, sizes) if _is_precedentes(s))
+    mark = count_tokens(TRUNCATION_MARK)
+    protected_budget = min(protected, max_tokens * 3 // 4)
+    remaining = max_tokens - protected_budget
+
+    kept: List[str] = []
+    for section, size in zip(sections, sizes):
+        if _is_precedentes(section):
+            share = size if protected <= protected_budget else protected_budget * size // protected
+            kept.append(section if share >= size else truncate_to_tokens(section, share - mark) + TRUNCATION_MARK)
+            continue
+        if size <= remaining:
+            kept.append(section)
+            remaining -= size
+        elif remaining > mark:
+            kept.append(truncate_to_tokens(section, remaining - mark) + TRUNCATION_MARK)
+            remaining = 0
+    return "".join(kept), True
+
+
+class BatchAccumulator:
+    """Junta documentos (na ordem de chegada) enquanto couberem no orçamento da requisição."""
+
+    def __init__(self, max_tokens: Optional[int] = None, max_docs: Optional[int] = None) -> None:
+        self.max_tokens = max_tokens or settings.EXTRACTION_BATCH_TOKENS
+        self.max_docs = max_docs or settings.EXTRACTION_BATCH_MAX_DOCS
+        self.jobs: List[ExtractionJob] = []
+        self.tokens = 0
+
+    def add(self, job: ExtractionJob) -> Optional[List[ExtractionJob]]:
+        """Acrescenta o documento; devolve o lote anterior se ele fechou."""
+        closed = None
+        if self.jobs and (self.tokens + job.tokens > self.max_tokens or len(self.jobs) >= self.max_docs):
+            closed = self.flush()
+        self.jobs.append(job)
+        self.tokens += job.tokens
+        return closed
+
+    def flush(self) -> Optional[List[ExtractionJob]]:
+        jobs, self.jobs, self.tokens = self.jobs, [], 0
+        return jobs or None
+
+
+def plan_batches(jobs: Iterable[ExtractionJob], max_tokens: Optional[int] = None, max_docs: Optional[int] = None) -> List[List[ExtractionJob]]:
+    accumulator = BatchAccumulator(max_tokens, max_docs)
+    batches = [closed for closed in map(accumulator.add, jobs) if closed]
+    last = accumulator.flush()
+    return batches + [last] if last else batches
+
+
+def build_messages(jobs: List[ExtractionJob]) -> List[Tuple[str, str]]:
+    documents = "\n\n".join(f'<documento pdf_name="{job.pdf_name}">\n{job.text}\n</documento>' for job in jobs)
+    return [("system", EXTRACTION_INSTRUCTIONS), ("human", documents)]
+
+
+# --- Validação -----------------------------------------------------------------
+def validate_extraction(item: Optional[SumulaExtraida], text: str) -> List[str]:
+    """Problemas da súmula extraída em relação ao texto de origem ([] se válida)."""
+    if item is None:
+        return ["documento ausente na resposta"]
+    problems = []
+    num = (item.metadados.num_sumula or "").strip()
+    if not num.isdigit():
+        problems.append(f"num_sumula inválido: {item.metadados.num_sumula!r}")
+    if not (item.metadados.status_atual or "").strip():
+        problems.append("status_atual vazio")
+    year = item.metadados.data_status_ano
+    if year is not None and not 1900 <= year <= 2100:
+        problems.append(f"data_status_ano inválido: {year}")
+    if not item.chunks.conteudo_principal.strip():
+        problems.append("conteudo_principal vazio")
+    if "PRECEDENTES" in text and not item.chunks.precedentes.strip():
+        problems.append("precedentes vazio, mas o documento tem a seção")
+    return problems
+
+
+def to_chunks(item: SumulaExtraida, pdf_name: str) -> List[Dict[str, Any]]:
+    """Trechos no formato da ingestão ({text, metadata}); trechos vazios são omitidos."""
+    num = (item.metadados.num_sumula or "").strip()
+    chunks = []
+    for idx, chunk_type in enumerate(CHUNK_TYPES):
+        text = getattr(item.chunks, chunk_type).strip()
+        if not text:
+            continue
+        metadata = {
+            "num_sumula": str(int(num)) if num.isdigit() else num,
+            "data_status": item.metadados.data_status,
+            "data_status_ano": item.metadados.data_status_ano,
+            "status_atual": item.metadados.status_atual,
+            # IDs e manifesto usam o nome real do arquivo, não o que o LLM devolveu
+            "pdf_name": pdf_name,
+            "chunk_type": chunk_type,
+            "chunk_index": idx,
+        }
+        chunks.append({"text": text, "metadata": metadata})
+    return chunks
+
+
+# --- Métricas e dead-letter ------------------------------------------------------
+@dataclass
+class ExtractionStats:
+    docs: int = 0
+    calls: int = 0
+    batched_calls: int = 0
+    retried: int = 0
+    failed: int = 0
+    truncated: int = 0
+
+    @property
+    def calls_per_doc(self) -> float:
+        return self.calls / self.docs if self.docs else 0.0
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failed / self.docs if self.docs else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "calls_per_doc": self.calls_per_doc, "failure_rate": self.failure_rate}
+
+    def summary(self) -> str:
+        return (
+            f"Extração: {self.docs} documentos em {self.calls} chamadas ao LLM ({self.calls_per_doc:.2f}/doc, "
+            f"{self.batched_calls} em lote), {self.retried} repetidos, {self.failed} falhas "
+            f"({self.failure_rate:.1%}), {self.truncated} cortados por tokens"
+        )
+
+
+def dead_letter_path(collection: str) -> Path:
+    return Path(settings.CACHE_DIR) / f"ingest_dead_letter_{collection}.jsonl"
+
+
+class DeadLetter:
+    """Documentos cuja extração falhou: um JSON por linha com o erro e o hash do PDF."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["pdf_name"]] = entry
+        self._lock = threading.Lock()
+
+    def add(self, pdf_name: str, error: str, sha256: Optional[str] = None, attempts: int = 0) -> None:
+        with self._lock:
+            self.entries[pdf_name] = {
+                "pdf_name": pdf_name,
+                "sha256": sha256,
+                "error": error,
+                "attempts": attempts,
+                "failed_at": datetime.now(timezone.utc).isoformat(),
+            }
+
+    def discard(self, pdf_name: str) -> None:
+        with self._lock:
+            self.entries.pop(pdf_name, None)
+
+    def names(self) -> List[str]:
+        return sorted(self.entries)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self.entries:
+                self.path.unlink(missing_ok=True)
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(
+                "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self.entries.values()), encoding="utf-8"
+            )
+            os.replace(tmp, self.path)
+
+
+# --- Extração --------------------------------------------------------------------
+class StructuredExtractor:
+    def __init__(self, llm: BaseChatModel, max_retries: int = 3, backoff: float = 1.0) -> None:
+        self.structured = llm.with_structured_output(LoteExtraido, method="json_schema", include_raw=True)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = ExtractionStats()
+        self._lock = threading.Lock()
+
+    def _attempt(self, jobs: List[ExtractionJob]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.batched_calls += len(jobs) > 1
+        try:
+            output = self.structured.invoke(build_messages(jobs))
+        except Exception as e:
+            return {}, {job.pdf_name: f"{type(e).__name__}: {e}" for job in jobs}
+        parsed: Optional[LoteExtraido] = output.get("parsed")
+        if parsed is None:
+            return {}, {job.pdf_name: f"resposta fora do schema: {output.get('parsing_error')}" for job in jobs}
+
+        by_name = {item.pdf_name: item for item in parsed.sumulas}
+        if len(jobs) == 1 and len(parsed.sumulas) == 1:
+            by_name = {jobs[0].pdf_name: parsed.sumulas[0]}
+        results, errors = {}, {}
+        for job in jobs:
+            problems = validate_extraction(by_name.get(job.pdf_name), job.text)
+            if problems:
+                errors[job.pdf_name] = "; ".join(problems)
+            else:
+                results[job.pdf_name] = to_chunks(by_name[job.pdf_name], job.pdf_name)
+        return results, errors
+
+    def extract(self, jobs: List[ExtractionJob]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+        """
+        Extrai um lote em uma requisição; os inválidos são repetidos individualmente.
+        Retorna (trechos por pdf_name, erro por pdf_name dos que falharam).
+        """
+        results, errors = self._attempt(jobs)
+        retried = set()
+        for attempt in range(self.max_retries):
+            pending = [job for job in jobs if job.pdf_name in errors]
+            if not pending:
+                break
+            time.sleep(self.backoff * 2**attempt * (1 + random.random()))
+            for job in pending:
+                retried.add(job.pdf_name)
+                ok, failed = self._attempt([job])
+                if ok:
+                    results.update(ok)
+                    errors.pop(job.pdf_name)
+                else:
+                    errors.update(failed)
+
+        with self._lock:
+            self.stats.docs += len(jobs)
+            self.stats.retried += len(retried)
+            self.stats.failed += len(errors)
+            self.stats.truncated += sum(job.truncated for job in jobs)
+        for pdf_name, error in errors.items():
+            print(f"⚠️ Extração de {pdf_name} falhou: {error}")
+        return results, errors
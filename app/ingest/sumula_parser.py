@@ -0,0 +1,144 @@
+"""
+Parser determinístico das súmulas (saída do MarkItDown), sem LLM.
+
+Os PDFs seguem o mesmo leiaute:
+
+    SÚMULA 14 (MODIFICADA NO D.O.C. DE 07/04/14 – PÁG. 04)      <- cabeçalho com o histórico
+    <texto vigente>
+    Redação Anterior (Publicada no “MG” de 08/10/87 - ...)      <- redações anteriores (0..n)
+    <texto anterior>
+    REFERÊNCIA(S) NORMATIVA(S):                                  <- opcional, pode repetir
+    PRECEDENTES:                                                 <- opcional, pode repetir
+
+- num_sumula: número do cabeçalho (confere com o do nome do arquivo, "Súmula 070-87.pdf");
+- status_atual: último evento do cabeçalho; PUBLICADA, RATIFICADA, MANTIDA e
+  RESTABELECIDA viram VIGENTE, os demais (MODIFICADA, ALTERADA, REVISADA, REVOGADA,
+  CANCELADA) ficam como estão;
+- data_status / data_status_ano: última data do cabeçalho (DD/MM/AA e AAAA);
+- conteudo_principal: cabeçalho, texto vigente e redações anteriores; referencias_normativas
+  e precedentes: o texto de todas as seções com esses títulos.
+
+O resultado é um SumulaExtraida validado com as mesmas regras da extração via LLM;
+quando a validação falha, a ingestão manda o documento para o LLM.
+"""
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.ingest.structured_extraction import Metadados, SumulaExtraida, Trechos, validate_extraction
+
+_HEADER_RE = re.compile(r"^[ \t\f]*S[ÚU]MULA\s+(\d+)\b", re.MULTILINE)
+_SECTION_RE = re.compile(
+    r"^[ \t\f]*(?:(?P<ref>REFER[ÊE]NCIAS?\s+NORMATIVAS?)|(?P<prec>PRECEDENTES))(?P<qualifier>[^:\n]*):[ \t]*$"
+    r"|^[ \t\f]*(?P<prev>Reda[çc][ãa]o\s+Anterior)\b",
+    re.MULTILINE,
+)
+_EVENT_RE = re.compile(
+    r"\b(PUBLICADA|RATIFICADA|MANTIDA|RESTABELECIDA|MODIFICADA|ALTERADA|REVISADA|REVOGADA|CANCELADA)\b"
+)
+_DATE_RE = re.compile(r"\b(\d{2})/(\d{2})/(\d{4}|\d{2})\b")
+_FILENAME_RE = re.compile(r"S[úu]mula\s+0*(\d+)", re.IGNORECASE)
+
+IN_FORCE_EVENTS = {"PUBLICADA", "RATIFICADA", "MANTIDA", "RESTABELECIDA"}
+
+
+def _clean(text: str) -> str:
+    """Espaços da justificação do PDF colapsados, quebras de página e linhas em branco repetidas removidas."""
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.replace("\f", "\n").splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _full_year(year: str) -> int:
+    if len(year) == 4:
+        return int(year)
+    return (1900 if int(year) > 50 else 2000) + int(year)
+
+
+def _header(text: str, start: int) -> Tuple[str, int]:
+    """Cabeçalho "SÚMULA N (...)": linhas a partir de `start` até a primeira linha em branco."""
+    end = re.compile(r"\n[ \t\f]*\n").search(text, start)
+    stop = end.start() if end else len(text)
+    return text[start:stop], stop
+
+
+def parse_status(header: str) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """(status_atual, data_status DD/MM/AA, data_status_ano) a partir do histórico do cabeçalho."""
+    events = _EVENT_RE.findall(header.upper())
+    dates = _DATE_RE.findall(header)
+    status = None
+    if events:
+        status = "VIGENTE" if events[-1] in IN_FORCE_EVENTS else events[-1]
+    if not dates:
+        return status, None, None
+    day, month, year = dates[-1]
+    return status, f"{day}/{month}/{year[-2:]}", _full_year(year)
+
+
+def split_sections(body: str) -> Dict[str, List[str]]:
+    """Texto depois do cabeçalho separado por tipo de trecho, na ordem do documento."""
+    sections: Dict[str, List[str]] = {"conteudo_principal": [], "referencias_normativas": [], "precedentes": []}
+    kind, start = "conteudo_principal", 0
+    for match in _SECTION_RE.finditer(body):
+        sections[kind].append(body[start:match.start()])
+        if match.group("prev"):
+            # A redação anterior é texto da súmula; a linha do título (com as datas) fica
+            kind, start = "conteudo_principal", match.start()
+            continue
+        kind = "referencias_normativas" if match.group("ref") else "precedentes"
+        # Títulos qualificados ("... QUE FUNDAMENTARAM A SUA REVOGAÇÃO") ficam no trecho
+        start = match.start() if match.group("qualifier").strip() else match.end()
+    sections[kind].append(body[start:])
+    return sections
+
+
+def parse_sumula(text: str, pdf_name: str) -> SumulaExtraida:
+    """Extrai metadados e trechos; levanta ValueError se o texto não tiver o cabeçalho da súmula."""
+    match = _HEADER_RE.search(text)
+    if match is None:
+        raise ValueError("cabeçalho 'SÚMULA N' não encontrado")
+    header, end = _header(text, match.start())
+    status, data_status, year = parse_status(header)
+    sections = split_sections(text[end:])
+
+    def joined(kind: str) -> str:
+        return "\n\n".join(part for part in map(_clean, sections[kind]) if part)
+
+    return SumulaExtraida(
+        pdf_name=pdf_name,
+        metadados=Metadados(
+            num_sumula=match.group(1).lstrip("0") or "0",
+            data_status=data_status,
+            data_status_ano=year,
+            status_atual=status,
+        ),
+        chunks=Trechos(
+            conteudo_principal="\n\n".join(part for part in (_clean(header), joined("conteudo_principal")) if part),
+            referencias_normativas=joined("referencias_normativas"),
+            precedentes=joined("precedentes"),
+        ),
+    )
+
+
+def check_sumula(item: SumulaExtraida, text: str) -> List[str]:
+    """Validação da extração + coerência com o nome do arquivo e com os títulos do texto."""
+    problems = validate_extraction(item, text)
+    expected = _FILENAME_RE.search(Path(item.pdf_name).stem)
+    if expected and item.metadados.num_sumula != expected.group(1):
+        problems.append(f"num_sumula {item.metadados.num_sumula} difere do arquivo ({expected.group(1)})")
+    if item.metadados.data_status is None:
+        problems.append("data_status não encontrada no cabeçalho")
+    if re.search(r"REFER[ÊE]NCIAS?\s+NORMATIVAS?", text) and not item.chunks.referencias_normativas:
+        problems.append("referencias_normativas vazio, mas o documento tem a seção")
+    return problems
+
+
+def try_parse(text: str, pdf_name: str) -> Tuple[Optional[SumulaExtraida], List[str]]:
+    """(súmula, []) se o parser deu conta do documento; (None, problemas) caso contrário."""
+    try:
+        item = parse_sumula(text, pdf_name)
+    except ValueError as e:
+        return None, [str(e)]
+    problems = check_sumula(item, text)
+    return (None, problems) if problems else (item, [])
@@ -0,0 +1,239 @@
+"""
+Layout do vetor denso da coleção: dimensão do embedding e quantização no Qdrant.
+
+Os modelos text-embedding-3 aceitam `dimensions` (256, 512, 1024, ... até 3072) e o
+vetor encurtado equivale aos primeiros N componentes do vetor completo, renormalizados.
+Com quantização, o Qdrant guarda os vetores originais em disco e a versão quantizada
+(int8 escalar ou binária) em RAM; a busca percorre a quantizada e rescora
+`oversampling × k` candidatos com os originais.
+
+O layout é definido na criação da coleção (EMBEDDING_DIMENSIONS, VECTOR_QUANTIZATION).
+Para mudar o de uma coleção existente, sem chamar a API de embeddings:
+    python -m app.ingest.vector_layout migrate --collection sumulas_jornada --dimensions 512 --quantization binary
+    python -m app.ingest.vector_layout show --collection sumulas_jornada
+
+Sobre o alias das consultas (app.ingest.collection_versions), a migração grava uma versão
+nova e troca o alias no fim.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+if __package__ in (None, ""):
+    REPO_ROOT = Path(__file__).resolve().parents[2]
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+from app.utils.settings import settings
+
+FULL_DIMENSIONS = 3072
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+DENSE_VECTOR = "text-dense"
+SPARSE_VECTOR = "text-sparse"
+
+
+@dataclass(frozen=True)
+class VectorLayout:
+    dimensions: int = FULL_DIMENSIONS
+    quantization: str = "none"
+    rescore: bool = True
+    oversampling: float = 2.0
+
+    def __post_init__(self) -> None:
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantização '{self.quantization}' inválida; use uma de {QUANTIZATION_MODES}.")
+        if not 0 < self.dimensions <= FULL_DIMENSIONS:
+            raise ValueError(f"Dimensão {self.dimensions} fora de 1..{FULL_DIMENSIONS}.")
+
+    @classmethod
+    def from_settings(cls) -> "VectorLayout":
+        return cls(
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+            quantization=settings.VECTOR_QUANTIZATION,
+            rescore=settings.QUANTIZATION_RESCORE,
+            oversampling=settings.QUANTIZATION_OVERSAMPLING,
+        )
+
+    @classmethod
+    def of_collection(cls, client: QdrantClient, collection: str) -> "VectorLayout":
+        """Layout de uma coleção existente (dimensão e quantização gravadas no Qdrant)."""
+        config = client.get_collection(collection).config
+        params = config.params.vectors[DENSE_VECTOR]
+        quantization = params.quantization_config or config.quantization_config
+        mode = "none"
+        if isinstance(quantization, models.ScalarQuantization):
+            mode = "scalar"
+        elif isinstance(quantization, models.BinaryQuantization):
+            mode = "binary"
+        return cls(dimensions=params.size, quantization=mode)
+
+    @property
+    def quantized(self) -> bool:
+        return self.quantization != "none"
+
+    def vector_params(self) -> models.VectorParams:
+        # Quantizado: originais em disco (só lidos no rescore), quantizados em RAM
+        return models.VectorParams(size=self.dimensions, distance=models.Distance.COSINE, on_disk=self.quantized)
+
+    def quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        """Parâmetros de busca com rescore; None sem quantização."""
+        if not self.quantized:
+            return None
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        )
+
+    def memory_bytes(self, points: int) -> Dict[str, int]:
+        """Bytes dos vetores densos: em RAM (quantizados ou float32) e em disco."""
+        full = points * self.dimensions * 4
+        if self.quantization == "scalar":
+            return {"ram": points * self.dimensions, "disk": full}
+        if self.quantization == "binary":
+            return {"ram": points * math.ceil(self.dimensions / 8), "disk": full}
+        return {"ram": full, "disk": 0}
+
+    def describe(self) -> str:
+        rescore = f", rescore ×{self.oversampling:g}" if self.quantized and self.rescore else ""
+        return f"{self.dimensions} dimensões, quantização {self.quantization}{rescore}"
+
+
+def truncate_embeddings(vectors: Any, dimensions: int) -> np.ndarray:
+    """Primeiros `dimensions` componentes de cada vetor, renormalizados (como o parâmetro `dimensions`)."""
+    matrix = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _copy_points(client: QdrantClient, source: str, target: str, dimensions: int, batch_size: int) -> int:
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            dense = truncate_embeddings([p.vector[DENSE_VECTOR] for p in points], dimensions)
+            batch = []
+            for point, vector in zip(points, dense):
+                vectors: Dict[str, Any] = {DENSE_VECTOR: vector.tolist()}
+                if SPARSE_VECTOR in point.vector:
+                    vectors[SPARSE_VECTOR] = point.vector[SPARSE_VECTOR]
+                batch.append(models.PointStruct(id=point.id, vector=vectors, payload=point.payload))
+            client.upsert(collection_name=target, points=batch, wait=True)
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def _copy_collection_state(source: str, target: str) -> None:
+    """Vocabulário esparso e manifesto de ingestão acompanham a coleção."""
+    from app.ingest.manifest import manifest_path
+    from app.ingest.sparse_encoder import sparse_vocab_path
+
+    for path_of in (sparse_vocab_path, manifest_path):
+        src, dst = path_of(source), path_of(target)
+        if src.exists() and src != dst:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(src, dst)
+
+
+def migrate_collection(
+    client: QdrantClient,
+    source: str,
+    layout: VectorLayout,
+    target: Optional[str] = None,
+    batch_size: int = 128,
+) -> int:
+    """
+    Reindexa `source` no layout dado, reaproveitando os vetores já gravados (truncados e
+    renormalizados; o layout de destino não pode ter mais dimensões que o de origem).
+    Sem `target` (ou target == source) a troca é "no lugar": os pontos vão para uma versão
+    nova (`{source}_v{N}`) e o alias `source` passa a apontar para ela só depois da cópia
+    conferida; a coleção de origem continua intacta. Uma coleção sem versão com o nome
+    `source` precisa antes de `collection_versions migrate-legacy` (ValueError). Devolve
+    o nº de pontos migrados.
+    """
+    from app.ingest.collection_versions import active_version, gc_versions, next_version, require_versioned, swap_alias
+    from app.ingest.extract_text import ensure_collection
+
+    if target is None or target == source:
+        require_versioned(client, source)
+        target = next_version(client, source)
+        count = migrate_collection(client, active_version(client, source) or source, layout, target, batch_size)
+        swap_alias(client, source, target)
+        gc_versions(client, source)
+        return count
+
+    current = VectorLayout.of_collection(client, source)
+    if layout.dimensions > current.dimensions:
+        raise ValueError(
+            f"'{source}' tem {current.dimensions} dimensões; para {layout.dimensions} é preciso reingerir "
+            "(python app/ingest/extract_text.py --full-rebuild)."
+        )
+    if client.collection_exists(target):
+        client.delete_collection(target)
+    ensure_collection(client, target, layout)
+    count = _copy_points(client, source, target, layout.dimensions, batch_size)
+    expected = client.count(source, exact=True).count
+    copied = client.count(target, exact=True).count
+    if copied != expected:
+        raise RuntimeError(
+            f"Cópia incompleta: '{target}' tem {copied} pontos e '{source}' tem {expected}; "
+            f"'{source}' não foi alterada."
+        )
+    _copy_collection_state(source, target)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Dimensão e quantização do vetor denso das coleções.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="mostra o layout de uma coleção")
+    show.add_argument("--collection", default=settings.COLLECTION_NAME)
+    migrate = sub.add_parser("migrate", help="reindexa uma coleção em outro layout")
+    migrate.add_argument("--collection", default=settings.COLLECTION_NAME)
+    migrate.add_argument("--target", default=None, help="coleção de destino (padrão: versão nova atrás do alias)")
+    migrate.add_argument("--dimensions", type=int, default=settings.EMBEDDING_DIMENSIONS)
+    migrate.add_argument("--quantization", choices=QUANTIZATION_MODES, default=settings.VECTOR_QUANTIZATION)
+    args = parser.parse_args(argv)
+
+    client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT, timeout=settings.QDRANT_TIMEOUT)
+    if args.command == "show":
+        layout = VectorLayout.of_collection(client, args.collection)
+        points = client.count(args.collection, exact=True).count
+        print(json.dumps({"collection": args.collection, "layout": layout.describe(), "points": points,
+                          "bytes": layout.memory_bytes(points)}, ensure_ascii=False, indent=2))
+        return
+
+    layout = VectorLayout(dimensions=args.dimensions, quantization=args.quantization)
+    start = time.perf_counter()
+    count = migrate_collection(client, args.collection, layout, args.target)
+    print(f"✅ {count} pontos de '{args.collection}' migrados para '{args.target or args.collection}' "
+          f"({layout.describe()}) em {time.perf_counter() - start:.1f}s")
+    if layout.dimensions != settings.EMBEDDING_DIMENSIONS:
+        print(f"⚠️ Ajuste EMBEDDING_DIMENSIONS={layout.dimensions} para as consultas usarem a mesma dimensão.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Busca vetorial exata no próprio processo, alternativa ao Qdrant para o corpus pequeno.
+
+O snapshot de uma coleção (exportado do Qdrant com `python -m app.retrieval.local_store
+export`) fica em LOCAL_SNAPSHOT_DIR/<coleção>/:
+- vectors.f32   matriz float32 contígua (linhas normalizadas), mapeada em memória;
+- payloads.json ids, textos e metadados na mesma ordem das linhas;
+- meta.json     dimensão, nº de pontos e data da exportação (gravado por último).
+
+A busca é força bruta: cosseno de todas as linhas (um produto matriz × vetor) e top-k
+com argpartition. Os filtros do self-query viram máscaras booleanas vetorizadas sobre
+colunas de metadados (LocalFilterTranslator, mesmos operadores do QdrantTranslator).
+Só há busca densa: RETRIEVAL_MODE "sparse"/"hybrid" é ignorado neste backend.
+
+Selecionado com VECTOR_BACKEND=local.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.structured_query import Comparator, Comparison, Operation, Operator, StructuredQuery, Visitor
+from langchain_core.vectorstores import VectorStore
+
+from app.utils.settings import settings
+
+# Filtro local: ("and"|"or"|"not", [filtros]) ou (comparador, atributo, valor)
+LocalFilter = Tuple[Any, ...]
+
+
+class LocalFilterTranslator(Visitor):
+    """Traduz o StructuredQuery para o filtro do LocalVectorStore."""
+
+    allowed_operators = (Operator.AND, Operator.OR, Operator.NOT)
+    allowed_comparators = (
+        Comparator.EQ,
+        Comparator.LT,
+        Comparator.LTE,
+        Comparator.GT,
+        Comparator.GTE,
+        Comparator.LIKE,
+    )
+
+    def visit_operation(self, operation: Operation) -> LocalFilter:
+        return (operation.operator.value, [arg.accept(self) for arg in operation.arguments])
+
+    def visit_comparison(self, comparison: Comparison) -> LocalFilter:
+        self._validate_func(comparison.comparator)
+        return (comparison.comparator.value, comparison.attribute, comparison.value)
+
+    def visit_structured_query(self, structured_query: StructuredQuery) -> Tuple[str, dict]:
+        if structured_query.filter is None:
+            return structured_query.query, {}
+        return structured_query.query, {"filter": structured_query.filter.accept(self)}
+
+
+class _Column:
+    """Valores de um atributo dos metadados como texto (eq/like) e como número (faixas)."""
+
+    def __init__(self, values: Sequence[Any]) -> None:
+        self.text = np.array(["" if v is None else str(v) for v in values])
+        self.present = np.array([v is not None for v in values])
+        self.numbers = np.array([_as_float(v) for v in values], dtype=np.float64)
+        self._lower: Optional[np.ndarray] = None
+
+    @property
+    def lower(self) -> np.ndarray:
+        if self._lower is None:
+            self._lower = np.char.lower(self.text)
+        return self._lower
+
+
+def _as_float(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+_RANGES = {
+    "lt": np.less,
+    "lte": np.less_equal,
+    "gt": np.greater,
+    "gte": np.greater_equal,
+}
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, path: str | Path, embedding: Embeddings, collection_name: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self._embedding = embedding
+        self.collection_name = collection_name or self.path.name
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._load()
+
+    # --- Carga -------------------------------------------------------------
+    def _load(self) -> None:
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(
+                f"Snapshot local não encontrado em {self.path}. "
+                f"Exporte-o com `python -m app.retrieval.local_store export --collection {self.collection_name}`."
+            )
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        payloads = json.loads((self.path / "payloads.json").read_text(encoding="utf-8"))
+        self.dim = int(meta["dim"])
+        self.matrix = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r", shape=(meta["count"], self.dim))
+        self.ids = [p["id"] for p in payloads]
+        self.texts = [p["page_content"] for p in payloads]
+        self.metadatas = [p["metadata"] for p in payloads]
+        self._columns: Dict[str, _Column] = {}
+        self._mtime = meta_path.stat().st_mtime
+
+    def _maybe_reload(self) -> None:
+        # Uma nova exportação troca o snapshot em disco (meta.json é gravado por último)
+        try:
+            mtime = (self.path / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # --- Filtros -----------------------------------------------------------
+    def _column(self, attribute: str) -> _Column:
+        column = self._columns.get(attribute)
+        if column is None:
+            column = _Column([md.get(attribute) for md in self.metadatas])
+            self._columns[attribute] = column
+        return column
+
+    def mask(self, filter: Optional[LocalFilter]) -> np.ndarray:
+        """Máscara booleana das linhas que satisfazem o filtro."""
+        if filter is None:
+            return np.ones(len(self.ids), dtype=bool)
+        op = filter[0]
+        if op in ("and", "or", "not"):
+            masks = [self.mask(f) for f in filter[1]]
+            if op == "and":
+                return np.logical_and.reduce(masks) if masks else np.ones(len(self.ids), dtype=bool)
+            combined = np.logical_or.reduce(masks) if masks else np.zeros(len(self.ids), dtype=bool)
+            return combined if op == "or" else ~combined
+
+        _, attribute, value = filter
+        column = self._column(attribute)
+        if op == "eq":
+            # Números comparam por valor (1987 == 1987.0); o resto, como texto
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return column.numbers == float(value)
+            return column.present & (column.text == str(value))
+        if op == "like":
+            return np.char.find(column.lower, str(value).lower()) >= 0
+        number = _as_float(value)
+        if np.isnan(number):
+            return np.zeros(len(self.ids), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            return _RANGES[op](column.numbers, number)
+
+    # --- Busca -------------------------------------------------------------
+    def _document(self, row: int) -> Document:
+        metadata = dict(self.metadatas[row])
+        metadata["_id"] = self.ids[row]
+        metadata["_collection_name"] = self.collection_name
+        return Document(page_content=self.texts[row], metadata=metadata)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[LocalFilter] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        self._maybe_reload()
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(
+                f"Dimensão da consulta ({query.shape[0]}) difere da do snapshot ({self.dim}); "
+                "exporte de novo com o modelo de embeddings atual."
+            )
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        if filter is None:
+            rows = None
+            scores = self.matrix @ query
+        else:
+            rows = np.flatnonzero(self.mask(filter))
+            scores = self.matrix[rows] @ query
+        if scores.shape[0] > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._document(int(i if rows is None else rows[i])), float(scores[i])) for i in top]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[LocalFilter] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[LocalFilter] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = await self._embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[LocalFilter] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[LocalFilter] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def scroll(self, filter: Optional[LocalFilter] = None, limit: Optional[int] = None) -> List[Document]:
+        """Trechos que satisfazem o filtro, na ordem do snapshot (sem busca vetorial)."""
+        self._maybe_reload()
+        rows = np.flatnonzero(self.mask(filter))[:limit]
+        return [self._document(int(i)) for i in rows]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError(
+            "O LocalVectorStore é somente leitura: ingira no Qdrant e exporte um novo snapshot."
+        )
+
+    @classmethod
+    def from_texts(
+        cls: Type["LocalVectorStore"],
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        raise NotImplementedError("Crie o snapshot com export_snapshot a partir de uma coleção do Qdrant.")
+
+
+def snapshot_path(collection: str) -> Path:
+    return Path(settings.LOCAL_SNAPSHOT_DIR) / collection
+
+
+def export_snapshot(client: Any, collection: str, out_dir: Optional[str | Path] = None, vector_name: str = "text-dense") -> Path:
+    """Exporta os vetores densos e os payloads de uma coleção do Qdrant para o snapshot local."""
+    out = Path(out_dir) if out_dir else snapshot_path(collection)
+    out.mkdir(parents=True, exist_ok=True)
+
+    rows: List[np.ndarray] = []
+    payloads: List[Dict[str, Any]] = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=256, offset=offset, with_payload=True, with_vectors=[vector_name]
+        )
+        for point in points:
+            vector = point.vector[vector_name] if isinstance(point.vector, dict) else point.vector
+            rows.append(np.asarray(vector, dtype=np.float32))
+            payloads.append(
+                {
+                    "id": str(point.id),
+                    "page_content": (point.payload or {}).get("page_content", ""),
+                    "metadata": (point.payload or {}).get("metadata") or {},
+                }
+            )
+        if offset is None:
+            break
+    if not rows:
+        raise ValueError(f"Coleção '{collection}' vazia: nada a exportar.")
+
+    matrix = np.vstack(rows)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.ascontiguousarray(matrix / np.where(norms > 0, norms, 1.0), dtype=np.float32)
+    meta = {
+        "collection": collection,
+        "vector_name": vector_name,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+    }
+    for name, data in (
+        ("vectors.f32", matrix.tobytes()),
+        ("payloads.json", json.dumps(payloads, ensure_ascii=False).encode("utf-8")),
+        ("meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8")),
+    ):
+        tmp = out / f"{name}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, out / name)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snapshot local (busca exata em NumPy) de uma coleção do Qdrant.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="exporta a coleção do Qdrant para LOCAL_SNAPSHOT_DIR")
+    export.add_argument("--collection", default=settings.COLLECTION_NAME)
+    export.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    from qdrant_client import QdrantClient
+
+    client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT, timeout=settings.QDRANT_TIMEOUT)
+    start = time.perf_counter()
+    out = export_snapshot(client, args.collection, args.out)
+    meta = json.loads((out / "meta.json").read_text(encoding="utf-8"))
+    print(
+        f"✅ Snapshot de '{args.collection}' em {out}: {meta['count']} pontos × {meta['dim']} dimensões "
+        f"em {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Analisador determinístico (regras) para perguntas comuns sobre súmulas.
+
+Reconhece número da súmula, tipo de trecho, status e ano e monta localmente o mesmo
+StructuredQuery que o query constructor (LLM) geraria para os campos declarados em
+`metadata_field_info`. Quando a confiança é baixa, devolve None e o chamador recorre
+ao LLM.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from langchain_core.structured_query import (
+    Comparator,
+    Comparison,
+    FilterDirective,
+    Operation,
+    Operator,
+    StructuredQuery,
+)
+
+
+@dataclass
+class ParsedQuery:
+    structured_query: StructuredQuery
+    confidence: float
+
+
+class FastPathStats:
+    """Contador de acertos do caminho rápido (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+fast_path_stats = FastPathStats()
+
+
+# --- Padrões (aplicados sobre o texto sem acentos e em minúsculas) --------------
+_NUM_RE = re.compile(r"\bsumulas?\s*(?:n[.ºo°]*\s*)?(\d{1,3})\b")
+# "súmulas 70 e 71", "súmula 70 ou a 71", "súmula 70, da 71"
+_NUM_LIST_RE = re.compile(
+    r"\bsumulas?\s*(?:n[.ºo°]*\s*)?\d{1,3}\s*(?:,|e|ou)\s*(?:(?:a|as|o|os|da|na)\s+)?(?:n[.ºo°]*\s*)?\d{1,3}\b"
+)
+
+_CHUNK_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bprecedentes?\b"), "precedentes"),
+    (re.compile(r"\breferencias?\s+normativas?\b|\bbase\s+legal\b|\bfundamentos?\s+legais?\b"), "referencias_normativas"),
+    (re.compile(r"\b(?:texto|conteudo|enunciado|redacao)(?:\s+(?:principal|integral|completo))?\b"), "conteudo_principal"),
+]
+
+_STATUS_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bvigentes?\b|\bem\s+vigor\b"), "VIGENTE"),
+    (re.compile(r"\brevogad[ao]s?\b"), "REVOGADA"),
+    (re.compile(r"\bcancelad[ao]s?\b"), "CANCELADA"),
+    (re.compile(r"\balterad[ao]s?\b"), "ALTERADA"),
+    (re.compile(r"\bmodificad[ao]s?\b"), "MODIFICADA"),
+    (re.compile(r"\brevisad[ao]s?\b"), "REVISADA"),
+]
+
+_YEAR = r"((?:19|20)\d{2})"
+_YEAR_PATTERNS: List[Tuple[re.Pattern, Tuple[Comparator, ...]]] = [
+    (re.compile(rf"\bentre\s+(?:o\s+ano\s+de\s+)?{_YEAR}\s+e\s+{_YEAR}\b"), (Comparator.GTE, Comparator.LTE)),
+    (re.compile(rf"\b(?:antes\s+de|anteriores?\s+a)\s+{_YEAR}\b"), (Comparator.LT,)),
+    (re.compile(rf"\b(?:depois\s+de|apos|posteriores?\s+a)\s+{_YEAR}\b"), (Comparator.GT,)),
+    (re.compile(rf"\b(?:ate|no\s+maximo\s+em)\s+{_YEAR}\b"), (Comparator.LTE,)),
+    (re.compile(rf"\b(?:a\s+partir\s+de|desde)\s+{_YEAR}\b"), (Comparator.GTE,)),
+    (re.compile(rf"\b(?:em|de|no\s+ano\s+de)\s+{_YEAR}\b"), (Comparator.EQ,)),
+]
+# Ano que pertence a um ato normativo citado logo antes ("Lei 8.666 de 1993",
+# "Constituição de 1988", "art. 37 da CF de 1988"): não é a data da súmula
+_LEGAL_ACT_RE = re.compile(
+    r"\b(?:leis?|lc|decretos?(?:-lei)?|art(?:igo)?s?|constituicao|cf|emendas?|ec|resolucao|portaria|instrucao\s+normativa)"
+    r"\b\.?(?:\s+(?!sumulas?\b)[\w.º°/-]+){0,3}\s+$"
+)
+
+# Construções que o analisador não trata com segurança (negação, comparação entre súmulas)
+_AMBIGUOUS_RE = re.compile(r"\b(?:nao|exceto|sem|menos|diferen\w*|compar\w*|ultim[ao]s?|primeir[ao]s?|mais\s+recentes?)\b")
+
+_STOPWORDS = {
+    "a", "as", "o", "os", "e", "de", "da", "das", "do", "dos", "em", "no", "na", "nos", "nas",
+    "um", "uma", "que", "qual", "quais", "quero", "ver", "me", "mostre", "mostrar", "liste",
+    "listar", "traga", "todos", "todas", "sao", "foi", "foram", "ha", "existe", "existem",
+    "sumula", "sumulas", "tce", "tcemg", "para", "por", "com", "sobre", "ano", "anos", "dela",
+    "dele", "desta", "dessa", "deste", "desse", "pelo", "pela", "atual", "atuais", "status",
+}
+
+# Acima deste número de palavras de conteúdo a pergunta é semântica demais para as regras
+MAX_SEMANTIC_WORDS = 6
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos, preservando o comprimento (posições casam com o original)."""
+    out = []
+    for ch in text.lower():
+        base = unicodedata.normalize("NFKD", ch)
+        base = "".join(c for c in base if not unicodedata.combining(c))
+        out.append(base[:1] or ch)
+    return "".join(out)
+
+
+def _and(comparisons: List[FilterDirective]) -> Optional[FilterDirective]:
+    if not comparisons:
+        return None
+    if len(comparisons) == 1:
+        return comparisons[0]
+    return Operation(operator=Operator.AND, arguments=comparisons)
+
+
+def parse_query(question: str) -> Optional[ParsedQuery]:
+    """
+    Tenta montar o StructuredQuery sem LLM. Retorna None se nenhum padrão for
+    reconhecido; caso contrário, o resultado com a confiança estimada (0 a 1).
+    """
+    folded = fold(question)
+    spans: List[Tuple[int, int]] = []
+    comparisons: List[FilterDirective] = []
+    confidence = 1.0
+
+    if _NUM_LIST_RE.search(folded):
+        # Mais de uma súmula na mesma pergunta: deixa para o LLM montar o OR.
+        confidence = 0.0
+
+    numbers = {str(int(m.group(1))) for m in _NUM_RE.finditer(folded)}
+    for m in _NUM_RE.finditer(folded):
+        spans.append(m.span())
+    if len(numbers) == 1:
+        comparisons.append(Comparison(comparator=Comparator.EQ, attribute="num_sumula", value=numbers.pop()))
+    elif numbers:
+        confidence = 0.0
+
+    chunk_types = set()
+    for pattern, chunk_type in _CHUNK_PATTERNS:
+        for m in pattern.finditer(folded):
+            chunk_types.add(chunk_type)
+            spans.append(m.span())
+    if len(chunk_types) == 1:
+        comparisons.append(Comparison(comparator=Comparator.EQ, attribute="chunk_type", value=chunk_types.pop()))
+    elif chunk_types:
+        confidence = min(confidence, 0.4)
+
+    statuses = set()
+    for pattern, status in _STATUS_PATTERNS:
+        for m in pattern.finditer(folded):
+            statuses.add(status)
+            spans.append(m.span())
+    if len(statuses) == 1:
+        comparisons.append(Comparison(comparator=Comparator.EQ, attribute="status_atual", value=statuses.pop()))
+    elif statuses:
+        confidence = min(confidence, 0.4)
+
+    for pattern, comparators in _YEAR_PATTERNS:
+        m = next((m for m in pattern.finditer(folded) if not _LEGAL_ACT_RE.search(folded[:m.start()])), None)
+        if not m:
+            continue
+        for comparator, year in zip(comparators, m.groups()):
+            comparisons.append(Comparison(comparator=comparator, attribute="data_status_ano", value=int(year)))
+        spans.append(m.span())
+        break
+
+    if not comparisons:
+        return None
+
+    if _AMBIGUOUS_RE.search(folded):
+        confidence = min(confidence, 0.3)
+
+    # O que sobra depois de remover os trechos reconhecidos é a parte semântica
+    mask = [True] * len(question)
+    for start, end in spans:
+        for i in range(start, end):
+            mask[i] = False
+    residual = "".join(ch if keep else " " for ch, keep in zip(question, mask))
+    words = [w for w in re.findall(r"\w+", residual) if fold(w) not in _STOPWORDS]
+    if len(words) > MAX_SEMANTIC_WORDS:
+        confidence = min(confidence, 0.5)
+
+    structured_query = StructuredQuery(query=" ".join(words) or " ", filter=_and(comparisons))
+    return ParsedQuery(structured_query=structured_query, confidence=confidence)
+
+
+def sumula_numbers(text: str) -> List[str]:
+    """Números de súmula citados no texto ("súmula 70", "Súmula nº 113"), na ordem, sem repetição."""
+    return list(dict.fromkeys(str(int(m.group(1))) for m in _NUM_RE.finditer(fold(text))))
+
+
+def is_trivial_query(text: str) -> bool:
+    """
+    True quando o texto semântico não acrescenta nada ao filtro: vazio, só palavras
+    vazias ou só termos já cobertos pelos padrões de tipo de trecho/status
+    (ex.: "precedentes", "súmulas vigentes").
+    """
+    folded = fold(text or "")
+    for pattern, _ in _CHUNK_PATTERNS + _STATUS_PATTERNS:
+        folded = pattern.sub(" ", folded)
+    return all(w in _STOPWORDS for w in re.findall(r"\w+", folded))
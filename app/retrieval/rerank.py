@@ -0,0 +1,125 @@
+"""
+Reranqueamento local dos candidatos da busca (sem cross-encoder nem chamadas externas).
+
+A busca traz RERANK_OVERFETCH × k candidatos; aqui eles são repontuados em NumPy:
+- score da busca normalizado entre os candidatos (min-max; dense, sparse e RRF têm
+  escalas diferentes);
+- sobreposição lexical com a pergunta (tokens do encoder esparso, saturação de TF e
+  IDF calculado sobre os próprios candidatos);
+- bônus para status_atual == 'VIGENTE'.
+
+Depois, corte adaptativo (fica quem tem pelo menos RERANK_MIN_RELATIVE_SCORE do melhor
+score) e MMR sobre os vetores TF-IDF dos trechos para escolher até k trechos variados.
+Buscas só por filtro (sem score) passam direto.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.utils.settings import settings
+
+
+@dataclass
+class RerankReport:
+    candidates: int
+    kept: int
+    cutoff: Optional[float] = None
+    latency_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        cutoff = "sem corte" if self.cutoff is None else f"corte {self.cutoff:.3f}"
+        return f"Rerank: {self.kept}/{self.candidates} trechos ({cutoff}) em {self.latency_ms:.1f}ms"
+
+
+def _term_matrix(question: str, docs: List[Document]) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz TF (trechos × termos) e vetor binário dos termos da pergunta."""
+    # Import tardio: o módulo do encoder traz o langchain_qdrant, dispensável no import do grafo
+    from app.ingest.sparse_encoder import tokenize
+
+    vocab: Dict[str, int] = {}
+    rows = [[vocab.setdefault(t, len(vocab)) for t in tokenize(d.page_content)] for d in docs]
+    query_terms = [vocab[t] for t in tokenize(question) if t in vocab]
+
+    tf = np.zeros((len(docs), max(len(vocab), 1)), dtype=np.float32)
+    for i, row in enumerate(rows):
+        np.add.at(tf[i], row, 1.0)
+    query = np.zeros(tf.shape[1], dtype=np.float32)
+    query[query_terms] = 1.0
+    return tf, query
+
+
+def lexical_scores(tf: np.ndarray, query: np.ndarray, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """BM25 entre os candidatos, normalizado para [0, 1] pelo máximo possível da pergunta."""
+    n = tf.shape[0]
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    lengths = tf.sum(axis=1, keepdims=True)
+    norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    saturated = tf * (k1 + 1) / (tf + norm)
+    weights = idf * query
+    if not weights.any():
+        return np.zeros(n, dtype=np.float32)
+    return (saturated @ weights) / ((k1 + 1) * weights.sum())
+
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    span = values.max() - values.min()
+    return (values - values.min()) / span if span > 0 else np.ones_like(values)
+
+
+def mmr(scores: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Índices escolhidos por maximal marginal relevance (similaridade de cosseno entre linhas)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms > 0, norms, 1.0)
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(scores))]
+    max_sim = similarity[selected[0]].copy()
+    available = np.ones(len(scores), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, len(scores)):
+        marginal = lambda_mult * scores - (1 - lambda_mult) * max_sim
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, similarity[best])
+    return selected
+
+
+def rerank(question: str, docs: List[Document], k: int) -> Tuple[List[Document], RerankReport]:
+    """Até k trechos, em ordem de seleção; o score final fica em metadata["rerank_score"]."""
+    start = time.perf_counter()
+    report = RerankReport(candidates=len(docs), kept=len(docs))
+    if not docs or any(d.metadata.get("score") is None for d in docs):
+        report.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        return docs, report
+
+    tf, query = _term_matrix(question, docs)
+    retrieval = _min_max(np.array([d.metadata["score"] for d in docs], dtype=np.float32))
+    lexical = lexical_scores(tf, query)
+    vigente = np.array([d.metadata.get("status_atual") == "VIGENTE" for d in docs], dtype=np.float32)
+    w = settings.RERANK_LEXICAL_WEIGHT
+    scores = (1 - w) * retrieval + w * lexical + settings.RERANK_VIGENTE_BOOST * vigente
+
+    report.cutoff = round(float(scores.max()) * settings.RERANK_MIN_RELATIVE_SCORE, 4)
+    survivors = np.flatnonzero(scores >= report.cutoff)
+    df = (tf[survivors] > 0).sum(axis=0)
+    tfidf = tf[survivors] * np.log1p(len(survivors) / np.maximum(df, 1))
+    chosen = survivors[mmr(scores[survivors], tfidf, k, settings.RERANK_MMR_LAMBDA)]
+
+    kept = []
+    for i in chosen:
+        docs[i].metadata["rerank_score"] = float(scores[i])
+        kept.append(docs[i])
+    report.kept = len(kept)
+    report.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+    return kept, report
@@ -1,34 +1,522 @@
-from typing import List, Optional
+import asyncio
+import contextlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from langchain.retrievers.self_query.base import SelfQueryRetriever
+from langchain.chains.query_constructor.base import load_query_constructor_runnable
+from langchain.retrievers.self_query.base import QUERY_CONSTRUCTOR_RUN_NAME, SelfQueryRetriever
+from langchain_community.query_constructors.qdrant import QdrantTranslator
+from langchain_core.language_models import BaseLanguageModel
+from langchain_qdrant import QdrantVectorStore, RetrievalMode, SparseVector
+from qdrant_client.http import models
 from langchain_core.documents import Document
-from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.structured_query import StructuredQuery, Visitor
+from app.ingest.collection_versions import aresolve_collection, resolve_collection
+from app.ingest.embed_qdrant import EmbeddingSelfQuery, get_shared_embedder
+from app.ingest.vector_layout import VectorLayout
+from app.retrieval.local_store import LocalFilterTranslator, LocalVectorStore
+from app.retrieval.query_parser import fast_path_stats, is_trivial_query, parse_query
 from app.retrieval.self_query import document_content_description, metadata_field_info
-from dataclasses import dataclass
+from app.utils import telemetry
+from app.utils.settings import settings
+from dataclasses import dataclass, replace
 
 
 @dataclass
 class SelfQueryConfig:
-    collection_name: str = "sumulas_jornada"
+    # Alias das consultas; resolvido para a versão ativa em get_self_query_retriever
+    collection_name: str = settings.COLLECTION_NAME
     k: int = 10
+    # "dense", "sparse" (BM25) ou "hybrid" (fusão RRF dos dois no Qdrant)
+    retrieval_mode: str = settings.RETRIEVAL_MODE
 
 
-def build_self_query_retriever(cfg: SelfQueryConfig) -> SelfQueryRetriever:
+def build_self_query_retriever(
+    cfg: SelfQueryConfig, embedder: Optional[EmbeddingSelfQuery] = None
+) -> SelfQueryRetriever:
     """
-    Cria o SelfQueryRetriever sobre o QdrantVectorStore.
+    Cria o SelfQueryRetriever sobre o vector store do backend configurado
+    (QdrantVectorStore ou LocalVectorStore, com o tradutor de filtros correspondente).
+    O query constructor é o compartilhado (get_query_constructor).
     """
-    embedder = EmbeddingSelfQuery()
-    vectorstore = embedder.get_qdrant_vector_store(cfg.collection_name)
+    embedder = embedder or get_shared_embedder()
+    vectorstore = embedder.get_vector_store(cfg.collection_name, cfg.retrieval_mode)
+    search_kwargs: Dict[str, Any] = {"k": cfg.k}
+    search_params = _search_params(vectorstore)
+    if search_params is not None:
+        search_kwargs["search_params"] = search_params
 
-    retriever = SelfQueryRetriever.from_llm(
-        llm=embedder.llm,
+    translator: Visitor = (
+        LocalFilterTranslator()
+        if isinstance(vectorstore, LocalVectorStore)
+        else QdrantTranslator(metadata_key=vectorstore.metadata_payload_key)
+    )
+    return SelfQueryRetriever(
+        query_constructor=get_query_constructor(embedder.llm, translator),
         vectorstore=vectorstore,
-        document_contents=document_content_description,
-        metadata_field_info=metadata_field_info,
-        enable_limit=True,
-        search_kwargs={"k": cfg.k},
+        structured_query_translator=translator,
+        search_kwargs=search_kwargs,
+    )
+
+
+# Query constructor (prompt + LLM + parser) por LLM e operadores do tradutor: não depende
+# de k nem da coleção, então os retrievers de `analyze` (k) e `retrieve` (k × overfetch) dividem o mesmo
+_constructor_lock = threading.Lock()
+_constructor_cache: Dict[Tuple[int, Tuple[Any, ...]], Tuple[BaseLanguageModel, Runnable]] = {}
+
+
+def get_query_constructor(llm: BaseLanguageModel, translator: Visitor) -> Runnable:
+    """Query constructor em cache para o LLM e os comparadores/operadores aceitos pelo tradutor."""
+    allowed = (tuple(translator.allowed_comparators or ()), tuple(translator.allowed_operators or ()))
+    key = (id(llm), allowed)
+    with _constructor_lock:
+        cached = _constructor_cache.get(key)
+        if cached is None or cached[0] is not llm:
+            constructor = load_query_constructor_runnable(
+                llm,
+                document_content_description,
+                metadata_field_info,
+                enable_limit=True,
+                allowed_comparators=translator.allowed_comparators,
+                allowed_operators=translator.allowed_operators,
+            ).with_config(run_name=QUERY_CONSTRUCTOR_RUN_NAME)
+            cached = _constructor_cache[key] = (llm, constructor)
+        return cached[1]
+
+
+def _search_params(vectorstore: Any) -> Optional[models.SearchParams]:
+    """Rescore da busca densa quando a coleção do Qdrant tem vetores quantizados."""
+    if not isinstance(vectorstore, QdrantVectorStore):
+        return None
+    layout = VectorLayout.of_collection(vectorstore.client, vectorstore.collection_name)
+    if not layout.quantized:
+        return None
+    return VectorLayout(
+        dimensions=layout.dimensions,
+        quantization=layout.quantization,
+        rescore=settings.QUANTIZATION_RESCORE,
+        oversampling=settings.QUANTIZATION_OVERSAMPLING,
+    ).search_params()
+
+
+# Cache de retrievers compilados por (coleção física, k, retrieval_mode)
+_retriever_lock = threading.Lock()
+_retriever_cache: Dict[Tuple[str, int, str], Tuple[EmbeddingSelfQuery, SelfQueryRetriever]] = {}
+
+
+def get_self_query_retriever(cfg: SelfQueryConfig) -> SelfQueryRetriever:
+    """
+    Retorna o SelfQueryRetriever em cache para (collection_name, k, retrieval_mode),
+    compilando-o na primeira chamada. É recompilado se o embedder compartilhado for substituído.
+    No Qdrant, o alias da coleção é resolvido para a versão ativa (cache de
+    COLLECTION_ALIAS_TTL): após a troca do alias, as consultas passam para a versão nova.
+    """
+    embedder = get_shared_embedder()
+    if settings.VECTOR_BACKEND != "local":
+        cfg = replace(cfg, collection_name=resolve_collection(embedder.client, cfg.collection_name))
+    return _cached_retriever(cfg, embedder)
+
+
+async def aget_self_query_retriever(cfg: SelfQueryConfig) -> SelfQueryRetriever:
+    """get_self_query_retriever com o alias resolvido pelo AsyncQdrantClient (caminho assíncrono)."""
+    embedder = get_shared_embedder()
+    if settings.VECTOR_BACKEND != "local":
+        cfg = replace(cfg, collection_name=await aresolve_collection(embedder.async_client, cfg.collection_name))
+    return _cached_retriever(cfg, embedder)
+
+
+def _cached_retriever(cfg: SelfQueryConfig, embedder: EmbeddingSelfQuery) -> SelfQueryRetriever:
+    key = (cfg.collection_name, cfg.k, cfg.retrieval_mode)
+    with _retriever_lock:
+        cached = _retriever_cache.get(key)
+        if cached is None or cached[0] is not embedder:
+            cached = (embedder, build_self_query_retriever(cfg, embedder))
+            _retriever_cache[key] = cached
+        return cached[1]
+
+
+def clear_retriever_cache() -> None:
+    with _retriever_lock:
+        _retriever_cache.clear()
+    with _constructor_lock:
+        _constructor_cache.clear()
+
+
+def construct_query(
+    question: str,
+    cfg: SelfQueryConfig,
+    config: Optional[RunnableConfig] = None,
+) -> StructuredQuery:
+    """
+    Devolve o StructuredQuery da pergunta: pelo analisador por regras quando ele tem
+    confiança suficiente, senão pelo query constructor (LLM), chamado uma única vez.
+    """
+    with telemetry.span("query_construction") as span:
+        structured_query = _fast_path(question, span)
+        if structured_query is not None:
+            return structured_query
+        retriever = get_self_query_retriever(cfg)
+        return retriever.query_constructor.invoke({"query": question}, config=config)
+
+
+async def aconstruct_query(
+    question: str,
+    cfg: SelfQueryConfig,
+    config: Optional[RunnableConfig] = None,
+    llm_slots: Optional[asyncio.Semaphore] = None,
+) -> StructuredQuery:
+    """
+    Versão assíncrona de construct_query (o LLM é chamado pelo cliente assíncrono).
+    `llm_slots` limita as chamadas simultâneas ao LLM (lotes); o caminho por regras não espera vaga.
+    """
+    with telemetry.span("query_construction") as span:
+        structured_query = _fast_path(question, span)
+        if structured_query is not None:
+            return structured_query
+        retriever = await aget_self_query_retriever(cfg)
+        async with llm_slots or contextlib.nullcontext():
+            return await retriever.query_constructor.ainvoke({"query": question}, config=config)
+
+
+def _fast_path(question: str, span: telemetry.SpanRecord) -> Optional[StructuredQuery]:
+    """StructuredQuery do analisador por regras, se confiável; registra qual caminho foi usado."""
+    parsed = parse_query(question) if settings.FAST_PATH_ENABLED else None
+    hit = parsed is not None and parsed.confidence >= settings.FAST_PATH_MIN_CONFIDENCE
+    if settings.FAST_PATH_ENABLED:
+        fast_path_stats.record(hit)
+    path = "rules" if hit else "llm"
+    span.set(path=path)
+    telemetry.count("rag_query_construction_total", path=path)
+    return parsed.structured_query if hit else None
+
+
+def is_filter_only(structured_query: StructuredQuery) -> bool:
+    """Consulta que é só filtro de metadados (parte semântica vazia ou trivial)."""
+    return structured_query.filter is not None and is_trivial_query(structured_query.query)
+
+
+def _chunk_order(doc: Document) -> Tuple[int, str, int]:
+    num = str(doc.metadata.get("num_sumula") or "")
+    return (int(num) if num.isdigit() else 10**6, num, doc.metadata.get("chunk_index") or 0)
+
+
+def _documents_from_points(vectorstore: QdrantVectorStore, points: Iterable[Any]) -> List[Document]:
+    return [
+        QdrantVectorStore._document_from_point(
+            point,
+            vectorstore.collection_name,
+            vectorstore.content_payload_key,
+            vectorstore.metadata_payload_key,
+        )
+        for point in points
+    ]
+
+
+def lookup_by_filter(
+    structured_query: StructuredQuery,
+    cfg: SelfQueryConfig,
+    limit: Optional[int] = None,
+) -> List[Document]:
+    """
+    Busca só por metadados: scroll no Qdrant com o filtro traduzido, sem embedding nem
+    busca vetorial. Usa os índices de payload criados na ingestão e devolve os trechos
+    em ordem de súmula e chunk_index.
+    """
+    retriever = get_self_query_retriever(cfg)
+    vectorstore: QdrantVectorStore = retriever.vectorstore
+    _, search_kwargs = retriever.structured_query_translator.visit_structured_query(structured_query)
+    limit = limit or structured_query.limit or settings.FILTER_LOOKUP_LIMIT
+    if isinstance(vectorstore, LocalVectorStore):
+        return sorted(vectorstore.scroll(search_kwargs.get("filter"), limit), key=_chunk_order)
+
+    docs: List[Document] = []
+    offset = None
+    while len(docs) < limit:
+        points, offset = vectorstore.client.scroll(
+            collection_name=vectorstore.collection_name,
+            scroll_filter=search_kwargs.get("filter"),
+            limit=limit - len(docs),
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        docs.extend(_documents_from_points(vectorstore, points))
+        if offset is None:
+            break
+
+    return sorted(docs, key=_chunk_order)
+
+
+async def alookup_by_filter(
+    structured_query: StructuredQuery,
+    cfg: SelfQueryConfig,
+    limit: Optional[int] = None,
+) -> List[Document]:
+    """lookup_by_filter pelo AsyncQdrantClient do embedder compartilhado."""
+    retriever = await aget_self_query_retriever(cfg)
+    vectorstore: QdrantVectorStore = retriever.vectorstore
+    if isinstance(vectorstore, LocalVectorStore):
+        # Sem E/S de rede: a máscara sobre o snapshot é imediata
+        return lookup_by_filter(structured_query, cfg, limit)
+    client = get_shared_embedder().async_client
+    _, search_kwargs = retriever.structured_query_translator.visit_structured_query(structured_query)
+    limit = limit or structured_query.limit or settings.FILTER_LOOKUP_LIMIT
+
+    docs: List[Document] = []
+    offset = None
+    while len(docs) < limit:
+        points, offset = await client.scroll(
+            collection_name=vectorstore.collection_name,
+            scroll_filter=search_kwargs.get("filter"),
+            limit=limit - len(docs),
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        docs.extend(_documents_from_points(vectorstore, points))
+        if offset is None:
+            break
+
+    return sorted(docs, key=_chunk_order)
+
+
+def _query_points_request(
+    vectorstore: QdrantVectorStore,
+    dense: Optional[List[float]],
+    sparse: Optional[SparseVector],
+    k: int,
+    query_filter: Optional[models.Filter],
+    search_params: Optional[models.SearchParams] = None,
+) -> Dict[str, Any]:
+    """Argumentos de query_points no modo do vector store (mesma montagem do QdrantVectorStore)."""
+    request: Dict[str, Any] = {
+        "collection_name": vectorstore.collection_name,
+        "query_filter": query_filter,
+        "limit": k,
+        "with_payload": True,
+        "with_vectors": False,
+    }
+    sparse_query = sparse and models.SparseVector(indices=sparse.indices, values=sparse.values)
+    if vectorstore.retrieval_mode == RetrievalMode.DENSE:
+        request.update(query=dense, using=vectorstore.vector_name, search_params=search_params)
+    elif vectorstore.retrieval_mode == RetrievalMode.SPARSE:
+        request.update(query=sparse_query, using=vectorstore.sparse_vector_name)
+    else:
+        request.update(
+            prefetch=[
+                models.Prefetch(
+                    using=vectorstore.vector_name, query=dense, filter=query_filter, limit=k, params=search_params
+                ),
+                models.Prefetch(using=vectorstore.sparse_vector_name, query=sparse_query, filter=query_filter, limit=k),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+        )
+    return request
+
+
+def search_structured(
+    question: str,
+    structured_query: StructuredQuery,
+    cfg: SelfQueryConfig,
+) -> List[Document]:
+    """
+    Traduz o StructuredQuery com o tradutor do Qdrant e executa a busca vetorial
+    diretamente, sem passar de novo pelo query constructor. Embedding da consulta e
+    busca são chamados em separado (spans "embedding" e "vector_search").
+    Consultas só de metadados vão para lookup_by_filter (sem embedding).
+    O score de similaridade fica em metadata["score"].
+    """
+    if is_filter_only(structured_query):
+        with telemetry.span("filter_lookup"):
+            return lookup_by_filter(structured_query, cfg)
+
+    retriever = get_self_query_retriever(cfg)
+    vectorstore: QdrantVectorStore = retriever.vectorstore
+    new_query, search_kwargs = retriever._prepare_query(question, structured_query)
+    if isinstance(vectorstore, LocalVectorStore):
+        with telemetry.span("embedding"):
+            vector = vectorstore.embeddings.embed_query(new_query)
+        with telemetry.span("vector_search", backend="local"):
+            results = vectorstore.similarity_search_with_score_by_vector(vector, **search_kwargs)
+        for doc, score in results:
+            doc.metadata["score"] = score
+        return [doc for doc, _ in results]
+    mode = vectorstore.retrieval_mode
+    with telemetry.span("embedding"):
+        dense = vectorstore.embeddings.embed_query(new_query) if mode != RetrievalMode.SPARSE else None
+        sparse = vectorstore.sparse_embeddings.embed_query(new_query) if mode != RetrievalMode.DENSE else None
+    request = _query_points_request(
+        vectorstore,
+        dense,
+        sparse,
+        search_kwargs.get("k", cfg.k),
+        search_kwargs.get("filter"),
+        search_kwargs.get("search_params"),
     )
-    return retriever
+    with telemetry.span("vector_search", backend="qdrant"):
+        response = vectorstore.client.query_points(**request)
+    docs = _documents_from_points(vectorstore, response.points)
+    for doc, point in zip(docs, response.points):
+        doc.metadata["score"] = point.score
+    return docs
+
+
+async def asearch_structured(
+    question: str,
+    structured_query: StructuredQuery,
+    cfg: SelfQueryConfig,
+) -> List[Document]:
+    """
+    search_structured sem bloquear o event loop: embedding da consulta e busca no
+    Qdrant pelos clientes assíncronos (o encoder esparso é local).
+    """
+    if is_filter_only(structured_query):
+        with telemetry.span("filter_lookup"):
+            return await alookup_by_filter(structured_query, cfg)
+
+    retriever = await aget_self_query_retriever(cfg)
+    vectorstore: QdrantVectorStore = retriever.vectorstore
+    new_query, search_kwargs = retriever._prepare_query(question, structured_query)
+    if isinstance(vectorstore, LocalVectorStore):
+        with telemetry.span("embedding"):
+            vector = await vectorstore.embeddings.aembed_query(new_query)
+        with telemetry.span("vector_search", backend="local"):
+            results = vectorstore.similarity_search_with_score_by_vector(vector, **search_kwargs)
+        for doc, score in results:
+            doc.metadata["score"] = score
+        return [doc for doc, _ in results]
+    mode = vectorstore.retrieval_mode
+    with telemetry.span("embedding"):
+        dense = await vectorstore.embeddings.aembed_query(new_query) if mode != RetrievalMode.SPARSE else None
+        sparse = vectorstore.sparse_embeddings.embed_query(new_query) if mode != RetrievalMode.DENSE else None
+    request = _query_points_request(
+        vectorstore,
+        dense,
+        sparse,
+        search_kwargs.get("k", cfg.k),
+        search_kwargs.get("filter"),
+        search_kwargs.get("search_params"),
+    )
+    with telemetry.span("vector_search", backend="qdrant"):
+        response = await get_shared_embedder().async_client.query_points(**request)
+    docs = _documents_from_points(vectorstore, response.points)
+    for doc, point in zip(docs, response.points):
+        doc.metadata["score"] = point.score
+    return docs
+
+
+def _filter_key(query_filter: Any) -> str:
+    """Chave estável de um filtro traduzido (Qdrant ou snapshot local), para agrupar consultas."""
+    if query_filter is None:
+        return ""
+    return query_filter.model_dump_json() if isinstance(query_filter, models.Filter) else repr(query_filter)
+
+
+def _query_request(request: Dict[str, Any]) -> models.QueryRequest:
+    """Argumentos de _query_points_request como uma requisição de query_batch_points."""
+    return models.QueryRequest(
+        query=request["query"],
+        using=request.get("using"),
+        prefetch=request.get("prefetch"),
+        filter=request["query_filter"],
+        params=request.get("search_params"),
+        limit=request["limit"],
+        with_payload=request["with_payload"],
+        with_vector=request["with_vectors"],
+    )
+
+
+async def _asearch_vectors(
+    vectorstore: QdrantVectorStore,
+    searches: List[Tuple[str, Dict[str, Any]]],
+    cfg: SelfQueryConfig,
+) -> List[List[Document]]:
+    """Buscas vetoriais (consulta reescrita, search_kwargs) com os embeddings em uma chamada."""
+    texts = [new_query for new_query, _ in searches]
+    if isinstance(vectorstore, LocalVectorStore):
+        with telemetry.span("embedding", texts=len(texts)):
+            vectors = await vectorstore.embeddings.aembed_documents(texts)
+        with telemetry.span("vector_search", backend="local", queries=len(texts)):
+            results = [
+                vectorstore.similarity_search_with_score_by_vector(vector, **search_kwargs)
+                for vector, (_, search_kwargs) in zip(vectors, searches)
+            ]
+        for hits in results:
+            for doc, score in hits:
+                doc.metadata["score"] = score
+        return [[doc for doc, _ in hits] for hits in results]
+
+    mode = vectorstore.retrieval_mode
+    with telemetry.span("embedding", texts=len(texts)):
+        dense = await vectorstore.embeddings.aembed_documents(texts) if mode != RetrievalMode.SPARSE else [None] * len(texts)
+        sparse = [vectorstore.sparse_embeddings.embed_query(t) for t in texts] if mode != RetrievalMode.DENSE else [None] * len(texts)
+
+    # Uma requisição de lote por filtro distinto, todas em paralelo
+    requests: List[models.QueryRequest] = []
+    groups: Dict[str, List[int]] = {}
+    for i, (d, s, (_, search_kwargs)) in enumerate(zip(dense, sparse, searches)):
+        query_filter = search_kwargs.get("filter")
+        request = _query_points_request(
+            vectorstore, d, s, search_kwargs.get("k", cfg.k), query_filter, search_kwargs.get("search_params")
+        )
+        requests.append(_query_request(request))
+        groups.setdefault(_filter_key(query_filter), []).append(i)
+    client = get_shared_embedder().async_client
+    with telemetry.span("vector_search", backend="qdrant", queries=len(requests), batches=len(groups)):
+        responses = await asyncio.gather(
+            *(
+                client.query_batch_points(vectorstore.collection_name, requests=[requests[i] for i in rows])
+                for rows in groups.values()
+            )
+        )
+
+    results: List[List[Document]] = [[] for _ in requests]
+    for rows, batch in zip(groups.values(), responses):
+        for i, response in zip(rows, batch):
+            docs = _documents_from_points(vectorstore, response.points)
+            for doc, point in zip(docs, response.points):
+                doc.metadata["score"] = point.score
+            results[i] = docs
+    return results
+
+
+async def asearch_structured_batch(
+    items: List[Tuple[str, StructuredQuery]],
+    cfg: SelfQueryConfig,
+) -> List[List[Document]]:
+    """
+    asearch_structured para várias perguntas de uma vez (lotes de app.graph.batch).
+    Consultas só de metadados com o mesmo filtro viram um único scroll; as demais têm os
+    embeddings calculados em uma chamada ao modelo e vão ao Qdrant por query_batch_points,
+    uma requisição de lote por filtro distinto. Buscas idênticas (texto, filtro, k) saem
+    uma vez. Devolve os trechos na ordem de `items`, cada lista com as próprias cópias.
+    """
+    retriever = await aget_self_query_retriever(cfg)
+    vectorstore: QdrantVectorStore = retriever.vectorstore
+    lookups: Dict[tuple, StructuredQuery] = {}
+    searches: Dict[tuple, Tuple[str, Dict[str, Any]]] = {}
+    keys: List[tuple] = []
+    for question, structured_query in items:
+        if is_filter_only(structured_query):
+            _, search_kwargs = retriever.structured_query_translator.visit_structured_query(structured_query)
+            key = ("lookup", _filter_key(search_kwargs.get("filter")), structured_query.limit)
+            lookups.setdefault(key, structured_query)
+        else:
+            new_query, search_kwargs = retriever._prepare_query(question, structured_query)
+            key = ("search", new_query, _filter_key(search_kwargs.get("filter")), search_kwargs.get("k", cfg.k))
+            searches.setdefault(key, (new_query, search_kwargs))
+        keys.append(key)
+
+    found: Dict[tuple, List[Document]] = {}
+    if lookups:
+        with telemetry.span("filter_lookup", queries=len(lookups)):
+            docs = await asyncio.gather(*(alookup_by_filter(sq, cfg) for sq in lookups.values()))
+        found.update(zip(lookups, docs))
+    if searches:
+        found.update(zip(searches, await _asearch_vectors(vectorstore, list(searches.values()), cfg)))
+    # Cópias: o rerank grava o score novo nos metadados de cada pergunta
+    return [[Document(page_content=d.page_content, metadata=dict(d.metadata), id=d.id) for d in found[key]] for key in keys]
 
 
 def search(
@@ -39,6 +527,5 @@ def search(
     Consulta usando self-query: o LLM infere termos SEMÂNTICOS e também FILTROS de metadado.
     """
     cfg = cfg or SelfQueryConfig()
-    retriever = build_self_query_retriever(cfg)
-    # .invoke() retorna List[Document]
-    return retriever.invoke(query)
+    structured_query = construct_query(query, cfg)
+    return search_structured(query, structured_query, cfg)
@@ -0,0 +1,291 @@
+"""
+Cache de respostas do RAG, com chave na pergunta normalizada + filtro resolvido.
+
+Backends: em memória (processo), SQLite em disco ou Redis (compatível). Cada entrada
+expira por TTL e o backend limita o número de entradas (LRU). A invalidação após uma
+nova ingestão é feita por "geração" da coleção: `invalidate(collection)` incrementa
+o contador e as chaves antigas deixam de ser encontradas.
+
+O contador vive no backend, então não chega a um servidor com o backend em memória
+(ou SQLite, em outra máquina) quando a ingestão roda em outro processo. Por isso a chave
+inclui também a versão dos dados guardada no próprio Qdrant, que todos os servidores
+leem: a coleção física por trás do alias e a versão gravada nos metadados dela pela
+última ingestão (ver collection_versions.data_version; atraso de até
+COLLECTION_ALIAS_TTL segundos). Com VECTOR_BACKEND=local, é o snapshot servido pela
+própria máquina.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+from app.utils.settings import settings
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+
+class MemoryCacheBackend:
+    """Cache em memória do processo com TTL e LRU."""
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[str, Optional[float]]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}  # fora do LRU: não podem ser descartados
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key])
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class SQLiteCacheBackend:
+    """Cache em disco (SQLite), compartilhado entre processos da mesma máquina."""
+
+    def __init__(self, path: str, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache WHERE key NOT LIKE 'gen:%'"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, '1', NULL, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key, time.time()),
+            )
+            return int(self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()[0])
+
+
+class RedisCacheBackend:
+    """Cache em Redis (ou servidor compatível). A política LRU fica a cargo do servidor (maxmemory-policy)."""
+
+    def __init__(self, url: str, prefix: str = "rag:") -> None:
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "ANSWER_CACHE_BACKEND=redis requer o pacote `redis` (pip install redis)."
+            ) from e
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(self.prefix + key))
+
+
+def normalize_question(question: str) -> str:
+    text = question.casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+# Arquivo -> (mtime, hash): só é relido quando muda
+_file_hashes: Dict[Path, Tuple[int, str]] = {}
+_file_lock = threading.Lock()
+
+
+def _file_hash(path: Path) -> str:
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return "-"
+    with _file_lock:
+        cached = _file_hashes.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    with _file_lock:
+        _file_hashes[path] = (mtime, digest)
+    return digest
+
+
+def collection_data_version(collection: str) -> str:
+    """
+    Versão dos dados de `collection` igual em todos os servidores: a coleção física para
+    a qual o alias aponta (muda a cada reindexação completa) e a versão que a ingestão
+    gravou nos metadados dela (muda a cada ingestão incremental que altera documentos).
+    No backend local, o meta.json do snapshot (muda a cada exportação).
+    """
+    if settings.VECTOR_BACKEND == "local":
+        from app.retrieval.local_store import snapshot_path
+
+        return f"{collection}@{_file_hash(snapshot_path(collection) / 'meta.json')}"
+
+    from app.ingest.collection_versions import data_version
+    from app.ingest.embed_qdrant import get_shared_embedder
+
+    return data_version(get_shared_embedder().client, collection)
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: Optional[float] = None,
+        data_version: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, collection: str) -> str:
+        generation = self.backend.get(f"gen:{collection}") or "0"
+        if self.data_version is not None:
+            generation = f"{generation}:{self.data_version(collection)}"
+        return generation
+
+    def make_key(self, question: str, structured_filter: Any, collection: str, k: int) -> str:
+        """Chave = pergunta normalizada + filtro resolvido + coleção (na geração e versão atuais) + k."""
+        raw = json.dumps(
+            [normalize_question(question), str(structured_filter), collection, k],
+            ensure_ascii=False,
+        )
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"answer:{collection}:{self._generation(collection)}:{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.backend.get(key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.backend.set(key, json.dumps(entry, ensure_ascii=False), ttl=self.ttl)
+
+    # Caminho assíncrono: o backend (SQLite/Redis) e a versão dos dados (alias e metadados
+    # no Qdrant) são consultados em uma thread, fora do event loop
+    async def amake_key(self, question: str, structured_filter: Any, collection: str, k: int) -> str:
+        return await asyncio.to_thread(self.make_key, question, structured_filter, collection, k)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, entry: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.set, key, entry)
+
+    def invalidate(self, collection: str) -> None:
+        """Invalida todas as respostas da coleção (chamado após a ingestão)."""
+        self.backend.incr(f"gen:{collection}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache_lock = threading.Lock()
+_answer_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Cache configurado em settings.ANSWER_CACHE_BACKEND (None quando desativado)."""
+    global _answer_cache
+    backend_name = settings.ANSWER_CACHE_BACKEND
+    if backend_name == "none":
+        return None
+    if _answer_cache is None:
+        with _cache_lock:
+            if _answer_cache is None:
+                if backend_name == "sqlite":
+                    backend = SQLiteCacheBackend(settings.ANSWER_CACHE_PATH, settings.ANSWER_CACHE_MAX_ENTRIES)
+                elif backend_name == "redis":
+                    backend = RedisCacheBackend(settings.REDIS_URL)
+                else:
+                    backend = MemoryCacheBackend(settings.ANSWER_CACHE_MAX_ENTRIES)
+                _answer_cache = AnswerCache(
+                    backend, ttl=settings.ANSWER_CACHE_TTL, data_version=collection_data_version
+                )
+    return _answer_cache
+
+
+def set_answer_cache(cache: Optional[AnswerCache]) -> None:
+    global _answer_cache
+    with _cache_lock:
+        _answer_cache = cache
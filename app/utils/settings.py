@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from platform import system
 from dotenv import load_dotenv, find_dotenv
 
@@ -9,8 +10,126 @@ class Settings:
     ENV_FILE = find_dotenv()
     SYSTEM = system()
 
+    # Diretório dos caches locais (respostas, embeddings), relativo à raiz do repositório
+    CACHE_DIR = os.getenv("CACHE_DIR", str(Path(__file__).resolve().parents[2] / ".cache"))
+
+    # Modelo de geração (também usado para contar tokens do contexto)
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1-mini")
+
+    # Backend das consultas: "qdrant" (servidor) ou "local" (snapshot em NumPy, busca exata)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+    LOCAL_SNAPSHOT_DIR = os.getenv("LOCAL_SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots"))
+
+    # Nome da coleção das consultas: um alias do Qdrant para a versão ativa `{nome}_v{N}`
+    # (app.ingest.collection_versions); a reindexação completa grava uma versão nova e troca
+    # o alias, mantendo as COLLECTION_KEEP_VERSIONS mais recentes para rollback
+    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "sumulas_jornada")
+    COLLECTION_KEEP_VERSIONS = int(os.getenv("COLLECTION_KEEP_VERSIONS", "2"))
+    # Segundos em que a resolução alias -> versão fica em cache nas consultas
+    COLLECTION_ALIAS_TTL = float(os.getenv("COLLECTION_ALIAS_TTL", "30"))
+    # Espera máxima pela indexação de uma versão nova antes da troca do alias
+    COLLECTION_OPTIMIZE_TIMEOUT = float(os.getenv("COLLECTION_OPTIMIZE_TIMEOUT", "600"))
+
     QDRANT_HOST = "localhost"
     QDRANT_PORT = "6333"
+    QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "120"))
+
+    # Pool HTTP compartilhado pelos clientes Qdrant/OpenAI do processo
+    HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+    HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+    # Analisador por regras antes do query constructor (LLM)
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+    # Máximo de pontos devolvidos por uma consulta só de metadados (scroll, sem embedding)
+    FILTER_LOOKUP_LIMIT = int(os.getenv("FILTER_LOOKUP_LIMIT", "60"))
+
+    # Cache de respostas: "memory", "sqlite", "redis" ou "none"
+    ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(CACHE_DIR, "answer_cache.sqlite"))
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Extração na ingestão: parser local das seções do PDF, com o LLM só quando a
+    # validação do parser falha (false: sempre o LLM)
+    EXTRACTION_PARSER_ENABLED = os.getenv("EXTRACTION_PARSER_ENABLED", "true").lower() == "true"
+    # Extração estruturada via LLM: tokens por documento (o excedente é cortado sem
+    # perder os PRECEDENTES) e súmulas curtas agrupadas por requisição
+    EXTRACTION_MAX_DOC_TOKENS = int(os.getenv("EXTRACTION_MAX_DOC_TOKENS", "6000"))
+    EXTRACTION_BATCH_TOKENS = int(os.getenv("EXTRACTION_BATCH_TOKENS", "8000"))
+    EXTRACTION_BATCH_MAX_DOCS = int(os.getenv("EXTRACTION_BATCH_MAX_DOCS", "8"))
+
+    # Embeddings densos: modelo e dimensão (text-embedding-3 aceita 256, 512, 1024, ... 3072)
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "3072"))
+    # Quantização do vetor denso na criação da coleção: "none", "scalar" (int8) ou "binary",
+    # com rescore dos oversampling × k candidatos pelos vetores originais
+    VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+    QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"
+    QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+
+    # Cache persistente de embeddings (ingestão e consultas)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(CACHE_DIR, "embeddings"))
+    # Consultas ficam fora do arquivo persistente: LRU em memória com este limite de vetores
+    EMBEDDING_QUERY_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_QUERY_CACHE_MAX_ENTRIES", "2000"))
+    # Cache das conversões PDF -> texto (MarkItDown), por hash do PDF e versão do conversor
+    CONVERSION_CACHE_ENABLED = os.getenv("CONVERSION_CACHE_ENABLED", "true").lower() == "true"
+    CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", os.path.join(CACHE_DIR, "conversions"))
+
+    # Busca: "dense", "sparse" (BM25 local) ou "hybrid" (fusão RRF no Qdrant)
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense").lower()
+    # Vocabulário do encoder esparso, gravado na ingestão e lido nas consultas
+    SPARSE_VOCAB_DIR = os.getenv("SPARSE_VOCAB_DIR", os.path.join(CACHE_DIR, "sparse"))
+
+    # Reranqueamento local após a busca (nó `rerank` do grafo): busca RERANK_OVERFETCH × k
+    # candidatos e mantém até k, com corte relativo ao melhor score e diversificação MMR
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+    RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))
+    RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.5"))
+    RERANK_VIGENTE_BOOST = float(os.getenv("RERANK_VIGENTE_BOOST", "0.1"))
+    RERANK_MIN_RELATIVE_SCORE = float(os.getenv("RERANK_MIN_RELATIVE_SCORE", "0.5"))
+    RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+
+    # Orçamento de tokens do contexto enviado ao LLM na geração (trechos + cabeçalhos)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    # Conversas com session_id (app.graph.memory): checkpointer do grafo em "sqlite" (local),
+    # "memory" (processo) ou "none" (perguntas sempre avulsas); sessões paradas expiram após o TTL
+    CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "sqlite").lower()
+    CONVERSATION_PATH = os.getenv("CONVERSATION_PATH", os.path.join(CACHE_DIR, "conversations.sqlite"))
+    CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "86400"))
+    # Histórico no prompt: últimos turnos (pergunta + resposta) dentro do orçamento de tokens
+    CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "4"))
+    CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "800"))
+    # Seguimento sobre a mesma súmula reaproveita os trechos do turno anterior (sem nova busca)
+    CONVERSATION_REUSE_DOCS = os.getenv("CONVERSATION_REUSE_DOCS", "true").lower() == "true"
+
+    # Perguntas em lote (app.graph.batch): perguntas por lote de busca e chamadas simultâneas ao LLM
+    BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+    # Instrumentação (app.utils.telemetry): métricas sempre em memória (GET /metrics);
+    # spans exportados por "none", "console" (JSON no stdout) ou "otlp" (OpenTelemetry)
+    TELEMETRY_EXPORTER = os.getenv("TELEMETRY_EXPORTER", "none").lower()
+    TELEMETRY_SERVICE_NAME = os.getenv("TELEMETRY_SERVICE_NAME", "rag-sumulas")
+    # Callback do Langfuse: "auto" (liga se LANGFUSE_PUBLIC_KEY/SECRET_KEY existirem), "true" ou "false"
+    LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "auto").lower()
+
+    # Serviço HTTP (SSE) e o endereço usado pelo app.py para consumi-lo
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    # Por worker: gerações simultâneas, requisições aguardando vaga e tempo máximo de espera
+    SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "32"))
+    SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "128"))
+    SERVER_QUEUE_TIMEOUT = float(os.getenv("SERVER_QUEUE_TIMEOUT", "10"))
+    # Aquecimento na partida (grafo, clientes, retriever): "background", "blocking" ou "off"
+    SERVER_WARM_UP = os.getenv("SERVER_WARM_UP", "background").lower()
+    RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "http://localhost:8000")
 
 
 settings = Settings()
@@ -0,0 +1,442 @@
+"""
+Instrumentação do RAG em processo: tempos por nó do grafo e por etapa, contadores de
+tokens e de cache, exportados no formato texto do Prometheus e como spans no formato
+do OpenTelemetry.
+
+- `span("embedding", **atributos)`: mede a etapa (histograma rag_stage_seconds{stage}),
+  encadeia pai/filho por contextvars (trace_id/span_id como no OpenTelemetry) e entrega
+  o span terminado ao exportador. O span raiz guarda os spans filhos da requisição
+  (`Trace.timings()` alimenta o evento details);
+- `count(...)` / `observe(...)`: contadores e histogramas com labels;
+- `render_prometheus()`: todas as métricas do processo (GET /metrics do serviço).
+
+Cada consulta é o span raiz "request"; os nós são "node.<nome>" e as etapas
+"query_construction", "embedding", "vector_search" / "filter_lookup", "prompt_build" e
+"generation" (com ttft_ms e os tokens da resposta).
+
+Exportadores de spans (TELEMETRY_EXPORTER):
+- "none": só as métricas em memória;
+- "console": uma linha JSON por span (campos do OTLP/JSON) no stdout, funciona offline;
+- "otlp": SDK do OpenTelemetry enviando para OTEL_EXPORTER_OTLP_ENDPOINT (requer
+  `opentelemetry-sdk` e `opentelemetry-exporter-otlp-proto-http`).
+
+O handler do Langfuse é opcional e criado só no primeiro uso (get_langfuse_handler).
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from app.utils.settings import settings
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "rag_stage_seconds": "Duração de cada nó do grafo (node.*) e de cada etapa do RAG.",
+    "rag_stage_errors_total": "Etapas encerradas com exceção.",
+    "rag_time_to_first_token_seconds": "Tempo entre o início da geração e o primeiro token.",
+    "rag_tokens_total": "Tokens por tipo (context, prompt, completion; estimados com app.utils.tokens).",
+    "rag_answer_cache_total": "Consultas ao cache de respostas por resultado.",
+    "rag_embedding_cache_total": "Textos procurados no cache de embeddings por resultado.",
+    "rag_query_construction_total": "StructuredQuery gerados pelas regras ou pelo LLM.",
+    "rag_documents_total": "Trechos devolvidos pela busca e mantidos no contexto.",
+    "rag_conversation_turns_total": "Turnos de conversa por tratamento (first, new_topic, rules, condense) e reaproveitamento dos trechos.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+@dataclass
+class _Histogram:
+    buckets: Tuple[float, ...]
+    counts: List[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        total, out = 0, []
+        for n in self.counts:
+            total += n
+            out.append(total)
+        return out
+
+
+class MetricsRegistry:
+    """Contadores e histogramas com labels, thread-safe, renderizados no formato do Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(self.buckets)
+            series[key].observe(value)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{"counters": {nome: {labels: valor}}, "histograms": {nome: {labels: {count, sum}}}}."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: {_format_labels(k) or "{}": v for k, v in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {_format_labels(k) or "{}": {"count": h.count, "sum": round(h.sum, 6)} for k, h in series.items()}
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines += _header(name, "counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name in sorted(self._histograms):
+                lines += _header(name, "histogram")
+                for key, hist in sorted(self._histograms[name].items()):
+                    for bound, total in zip(hist.buckets, hist.cumulative()):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {total}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(hist.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, kind: str) -> List[str]:
+    help_text = METRIC_HELP.get(name)
+    return ([f"# HELP {name} {help_text}"] if help_text else []) + [f"# TYPE {name} {kind}"]
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+metrics = MetricsRegistry()
+
+
+def count(name: str, value: float = 1.0, **labels: Any) -> None:
+    if value:
+        metrics.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    metrics.observe(name, value, **labels)
+
+
+def render_prometheus() -> str:
+    return metrics.render()
+
+
+# --- Spans --------------------------------------------------------------------
+class Trace:
+    """Spans terminados de uma requisição (compartilhado pelos spans filhos do raiz)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.spans: List["SpanRecord"] = []
+
+    def add(self, record: "SpanRecord") -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def timings(self) -> Dict[str, float]:
+        """Milissegundos por nome de span (somados quando o nome se repete), na ordem de término."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for record in self.spans:
+                out[record.name] = out.get(record.name, 0.0) + record.duration * 1000
+        return {name: round(ms, 2) for name, ms in out.items()}
+
+    def attributes(self) -> Dict[str, Any]:
+        """Atributos de todos os spans terminados (o último vence)."""
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for record in self.spans:
+                out.update(record.attributes)
+        return out
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    trace: Trace
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "OK"
+
+    @property
+    def duration(self) -> float:
+        return max(self.end_ns - self.start_ns, 0) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Span nos campos do OTLP/JSON (atributos achatados)."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+
+
+_current_span: ContextVar[Optional[SpanRecord]] = ContextVar("rag_current_span", default=None)
+
+
+def current_span() -> Optional[SpanRecord]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[SpanRecord]:
+    """
+    Mede a etapa `name` como filha do span corrente (ou raiz de um novo trace). Os
+    atributos podem ser completados dentro do bloco com `record.set(...)`.
+    """
+    parent = _current_span.get()
+    record = SpanRecord(
+        name=name,
+        trace_id=parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+        span_id=f"{random.getrandbits(64):016x}",
+        parent_id=parent.span_id if parent else None,
+        trace=parent.trace if parent else Trace(),
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    exporter = get_exporter()
+    token = _current_span.set(record)
+    start = time.perf_counter_ns()
+    try:
+        with exporter.live(record):
+            yield record
+    except (GeneratorExit, asyncio.CancelledError):
+        # Consumidor abandonou a consulta: não é falha da etapa
+        record.set(cancelled=True)
+        raise
+    except BaseException as e:
+        record.status = "ERROR"
+        record.attributes.setdefault("error.type", type(e).__name__)
+        count("rag_stage_errors_total", stage=name)
+        raise
+    finally:
+        record.end_ns = record.start_ns + time.perf_counter_ns() - start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Encerrado em outro contexto (gerador fechado por outra task/thread)
+            _current_span.set(parent)
+        observe("rag_stage_seconds", record.duration, stage=name)
+        record.trace.add(record)
+        exporter.export(record)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorador de span para funções síncronas e assíncronas (nós do grafo)."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return awrapper
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# --- Exportadores ---------------------------------------------------------------
+class SpanExporter:
+    """Exportador nulo ("none"): os spans só alimentam as métricas e o Trace da requisição."""
+
+    def live(self, record: SpanRecord) -> ContextManager[Any]:
+        return nullcontext()
+
+    def export(self, record: SpanRecord) -> None:
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """Uma linha JSON por span terminado."""
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, record: SpanRecord) -> None:
+        line = json.dumps(record.as_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            print(line, file=self.stream or sys.stdout, flush=True)
+
+
+class OtlpSpanExporter(SpanExporter):
+    """
+    Spans do SDK do OpenTelemetry em paralelo aos registros locais, enviados em lote pelo
+    exportador OTLP/HTTP. Usa um TracerProvider próprio (não substitui o global, que o
+    Langfuse também usa); os ids do registro local passam a ser os do span do SDK.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None) -> None:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError as e:
+            raise ImportError(
+                "TELEMETRY_EXPORTER=otlp requer `opentelemetry-sdk` e `opentelemetry-exporter-otlp-proto-http` "
+                "(pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http)."
+            ) from e
+        self.provider = TracerProvider(resource=Resource.create({"service.name": settings.TELEMETRY_SERVICE_NAME}))
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self.tracer = self.provider.get_tracer("app.rag")
+
+    @contextmanager
+    def live(self, record: SpanRecord) -> Iterator[Any]:
+        with self.tracer.start_as_current_span(record.name) as live:
+            context = live.get_span_context()
+            record.trace_id, record.span_id = format(context.trace_id, "032x"), format(context.span_id, "016x")
+            try:
+                yield live
+            finally:
+                live.set_attributes(
+                    {k: v for k, v in record.attributes.items() if isinstance(v, (str, bool, int, float))}
+                )
+
+    def shutdown(self) -> None:
+        self.provider.shutdown()
+
+
+_exporter_lock = threading.Lock()
+_exporter: Optional[SpanExporter] = None
+
+
+def get_exporter() -> SpanExporter:
+    """Exportador configurado em settings.TELEMETRY_EXPORTER, criado na primeira chamada."""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                name = settings.TELEMETRY_EXPORTER
+                if name == "console":
+                    _exporter = ConsoleSpanExporter()
+                elif name == "otlp":
+                    _exporter = OtlpSpanExporter()
+                else:
+                    _exporter = SpanExporter()
+    return _exporter
+
+
+def set_exporter(exporter: Optional[SpanExporter]) -> None:
+    global _exporter
+    with _exporter_lock:
+        _exporter = exporter
+
+
+# --- Langfuse -------------------------------------------------------------------
+_langfuse_lock = threading.Lock()
+_langfuse_handler: Any = None
+_langfuse_checked = False
+
+
+def langfuse_enabled() -> bool:
+    """LANGFUSE_ENABLED=true/false; "auto" liga quando as chaves do Langfuse estão no ambiente."""
+    if settings.LANGFUSE_ENABLED == "auto":
+        return bool(os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY"))
+    return settings.LANGFUSE_ENABLED == "true"
+
+
+def get_langfuse_handler() -> Any:
+    """CallbackHandler do Langfuse criado no primeiro uso, ou None (desligado ou pacote ausente)."""
+    global _langfuse_handler, _langfuse_checked
+    if not _langfuse_checked:
+        with _langfuse_lock:
+            if not _langfuse_checked:
+                if langfuse_enabled():
+                    try:
+                        from langfuse.langchain import CallbackHandler
+
+                        _langfuse_handler = CallbackHandler()
+                    except ImportError:
+                        print("⚠️ LANGFUSE_ENABLED, mas o pacote `langfuse` não está instalado (pip install langfuse).")
+                _langfuse_checked = True
+    return _langfuse_handler
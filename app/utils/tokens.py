@@ -0,0 +1,52 @@
+"""
+Contagem e corte de texto por tokens (tiktoken, encoding do modelo de geração).
+
+Sem o arquivo do encoding (máquina sem rede e sem cache do tiktoken) cai para uma
+estimativa de ~4 caracteres por token e avisa uma vez.
+"""
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Any, Optional
+
+from app.utils.settings import settings
+
+CHARS_PER_TOKEN = 4
+
+
+def get_encoding(model: Optional[str] = None) -> Any:
+    """Encoding do tiktoken para o modelo (padrão LLM_MODEL), ou None se não puder ser carregado."""
+    return _encoding(model or settings.LLM_MODEL)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> Any:
+    import tiktoken
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"⚠️ tiktoken indisponível ({type(e).__name__}); contagem de tokens estimada por caracteres.")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Prefixo de `text` com no máximo `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,143 @@
+"""
+Teste de carga do streaming: N perguntas simultâneas pelo caminho síncrono
+(run_streaming_rag, uma thread por requisição) e pelo assíncrono (arun_streaming_rag,
+todas em um único event loop), com LLM falso de streaming (latência até o primeiro
+token e entre tokens), embeddings falsos e Qdrant em memória.
+
+Reporta tempo total, TTFT (p50/p95), tokens/s agregados e o pico de threads do
+processo. O cache de respostas (SQLite por padrão, em um diretório temporário) é
+consultado e gravado a cada requisição e invalidado antes de cada rodada, para que as
+duas comecem vazias. Ao final, abandona uma consulta assíncrona após o primeiro token
+e confere que a geração parou.
+
+Uso: python -m benchmarks.bench_async_streaming [--concurrency 50] [--first-token-ms 300] [--token-ms 20]
+                                                [--answer-cache sqlite|memory|none]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app.graph.rag_graph import COLLECTION_NAME, arun_streaming_rag, run_streaming_rag
+from app.ingest.embed_qdrant import set_shared_embedder
+from app.retrieval.retriever import clear_retriever_cache
+from app.utils.answer_cache import get_answer_cache, set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import FakeStreamingChatModel, make_streaming_embedder
+
+# Perguntas resolvidas pelo analisador por regras, com parte semântica (busca vetorial)
+QUESTIONS = [f"súmulas vigentes sobre o tema {n}" for n in range(11)]
+
+
+class _Run:
+    def __init__(self) -> None:
+        self.ttft: List[float] = []
+        self.tokens = 0
+        self.max_threads = threading.active_count()
+
+    def observe(self, start: float, first: bool) -> None:
+        if first:
+            self.ttft.append(time.perf_counter() - start)
+        self.tokens += 1
+        self.max_threads = max(self.max_threads, threading.active_count())
+
+    def report(self, label: str, elapsed: float) -> None:
+        ttft = sorted(self.ttft)
+        p95 = ttft[min(len(ttft) - 1, int(0.95 * len(ttft)))]
+        print(
+            f"{label:<10} total={elapsed:6.2f}s  TTFT p50={statistics.median(ttft) * 1000:7.1f}ms "
+            f"p95={p95 * 1000:7.1f}ms  {self.tokens / elapsed:8.1f} tokens/s  threads(pico)={self.max_threads}"
+        )
+
+
+def _sync_request(question: str, run: _Run) -> None:
+    start = time.perf_counter()
+    first = True
+    for event in run_streaming_rag(question):
+        if event["type"] == "token":
+            run.observe(start, first)
+            first = False
+
+
+async def _async_request(question: str, run: _Run) -> None:
+    start = time.perf_counter()
+    first = True
+    async for event in arun_streaming_rag(question):
+        if event["type"] == "token":
+            run.observe(start, first)
+            first = False
+
+
+async def _abandon(llm: FakeStreamingChatModel) -> Dict[str, int]:
+    """Consome só o primeiro token e fecha o gerador, como um cliente que desistiu."""
+    before = llm.tokens_emitted
+    events = arun_streaming_rag(QUESTIONS[0])
+    async for event in events:
+        if event["type"] == "token":
+            break
+    await events.aclose()
+    await asyncio.sleep(0.5)  # tempo para tokens "atrasados", se a geração não tiver parado
+    return {"emitidos": llm.tokens_emitted - before, "resposta_completa": len(llm._tokens())}
+
+
+def _clear_answers() -> None:
+    cache = get_answer_cache()
+    if cache is not None:
+        cache.invalidate(COLLECTION_NAME)
+
+
+async def _async_main(concurrency: int, llm: FakeStreamingChatModel) -> None:
+    _clear_answers()
+    run = _Run()
+    start = time.perf_counter()
+    await asyncio.gather(*(_async_request(QUESTIONS[i % len(QUESTIONS)], run) for i in range(concurrency)))
+    run.report("async", time.perf_counter() - start)
+
+    _clear_answers()
+    result = await _abandon(llm)
+    print(f"Consulta abandonada após o 1º token: {result['emitidos']} de {result['resposta_completa']} tokens gerados")
+
+
+def main(concurrency: int, first_token_ms: float, token_ms: float, answer_cache: str) -> None:
+    cache_dir = tempfile.TemporaryDirectory()
+    settings.ANSWER_CACHE_BACKEND = answer_cache
+    settings.ANSWER_CACHE_PATH = f"{cache_dir.name}/answer_cache.sqlite"
+    set_answer_cache(None)
+
+    loop = asyncio.new_event_loop()
+    embedder = loop.run_until_complete(make_streaming_embedder(first_token_ms, token_ms))
+    llm = embedder.llm
+    set_shared_embedder(embedder)
+    clear_retriever_cache()
+
+    print(
+        f"{concurrency} requisições simultâneas; LLM: 1º token {first_token_ms:.0f}ms, {token_ms:.0f}ms/token; "
+        f"cache de respostas: {answer_cache}"
+    )
+    run = _Run()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: _sync_request(QUESTIONS[i % len(QUESTIONS)], run), range(concurrency)))
+    run.report("sync", time.perf_counter() - start)
+
+    loop.run_until_complete(_async_main(concurrency, llm))
+    loop.close()
+    cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--answer-cache", choices=["sqlite", "memory", "none"], default="sqlite")
+    args = parser.parse_args()
+    main(args.concurrency, args.first_token_ms, args.token_ms, args.answer_cache)
@@ -0,0 +1,171 @@
+"""
+Perguntas em lote (app.graph.batch) sobre o corpus de referência, com modelos falsos.
+
+Compara o lote com as mesmas perguntas feitas uma a uma pelo grafo (arun_streaming_rag,
+com o mesmo limite de chamadas simultâneas ao LLM): chamadas de embedding, requisições
+ao Qdrant (query_points / query_batch_points / scroll), chamadas ao LLM e tempo total.
+Depois interrompe uma execução no meio e retoma pelo arquivo de saída, conferindo que
+cada pergunta terminou respondida e que a retomada não refez as já gravadas.
+Sai com código 1 se o lote não economizar embeddings e requisições ou se a retomada falhar.
+
+Uso: python -m benchmarks.bench_batch [--questions 96] [--batch-size 32] [--concurrency 8] [--first-token-ms 300]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.graph.batch import arun_batch
+from app.graph.rag_graph import arun_streaming_rag
+from app.ingest.embed_qdrant import get_shared_embedder
+from benchmarks.fixtures import FakeLatency, build_fixture_corpus, install_query_path
+
+QUESTIONS_PATH = Path(__file__).parent / "data" / "recall_questions.jsonl"
+QDRANT_METHODS = ("query_points", "query_batch_points", "scroll")
+
+
+def _count_qdrant_calls(client: Any) -> Counter:
+    """Conta as requisições do cliente assíncrono por método (envolve os métodos da instância)."""
+    calls: Counter = Counter()
+    for name in QDRANT_METHODS:
+        method = getattr(client, name)
+
+        async def counted(*args: Any, _name: str = name, _method: Any = method, **kwargs: Any) -> Any:
+            calls[_name] += 1
+            return await _method(*args, **kwargs)
+
+        setattr(client, name, counted)
+    return calls
+
+
+def _write_questions(path: Path, n: int) -> List[str]:
+    base = [json.loads(line)["question"] for line in QUESTIONS_PATH.read_text(encoding="utf-8").splitlines() if line.strip()]
+    questions = [base[i % len(base)] for i in range(n)]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "question"])
+        writer.writerows([f"q{i}", q] for i, q in enumerate(questions))
+    return questions
+
+
+def _read_output(path: Path) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+async def _one_by_one(questions: List[str], concurrency: int) -> None:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def ask(question: str) -> None:
+        async with slots:
+            async for _ in arun_streaming_rag(question):
+                pass
+
+    await asyncio.gather(*(ask(q) for q in questions))
+
+
+async def _measure(label: str, run: Any, llm: Any, model: Any, calls: Counter) -> Dict[str, float]:
+    before = (model.calls, model.texts, llm.calls + llm.query_calls, dict(calls))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run()
+    result = {
+        "elapsed_s": time.perf_counter() - start,
+        "embedding_calls": model.calls - before[0],
+        "embedded_texts": model.texts - before[1],
+        "llm_calls": llm.calls + llm.query_calls - before[2],
+        **{name: calls[name] - before[3].get(name, 0) for name in QDRANT_METHODS},
+    }
+    print(
+        f"{label:<12} {result['elapsed_s']:7.2f}s  embeddings {result['embedding_calls']:>4} "
+        f"({result['embedded_texts']} textos)  query_points {result['query_points']:>4}  "
+        f"query_batch_points {result['query_batch_points']:>3}  scroll {result['scroll']:>3}  LLM {result['llm_calls']:>4}"
+    )
+    return result
+
+
+async def _resume_check(source: Path, output: Path, n: int, batch_size: int, concurrency: int, llm: Any) -> bool:
+    """Interrompe o lote com parte das respostas gravadas e retoma pelo mesmo arquivo."""
+    task = asyncio.create_task(arun_batch(source, output, batch_size=batch_size, concurrency=concurrency))
+    with contextlib.redirect_stdout(io.StringIO()):
+        while not task.done() and (not output.exists() or len(_read_output(output)) < n // 3):
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    interrupted = len(_read_output(output))
+
+    generations = llm.calls
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = await arun_batch(source, output, batch_size=batch_size, concurrency=concurrency)
+    records = _read_output(output)
+    answered = {r["id"] for r in records if not r.get("error")}
+    repeated = [i for i, c in Counter(r["id"] for r in records).items() if c > 1]
+    print(
+        f"\nRetomada: {interrupted} gravadas antes da interrupção, {report.skipped} puladas, "
+        f"{llm.calls - generations} gerações na retomada; {len(answered)}/{n} respondidas, {len(repeated)} ids repetidos"
+    )
+    ok = len(answered) == n and not repeated and report.skipped == interrupted and llm.calls - generations == n - interrupted
+    if not ok:
+        print("⚠️ A retomada não completou as perguntas exatamente uma vez")
+    return ok
+
+
+async def _run(n: int, batch_size: int, concurrency: int, latency: FakeLatency) -> int:
+    corpus = build_fixture_corpus()
+    llm = await install_query_path(corpus, latency)
+    # Cada pergunta com a própria consulta (a resposta fixa do query constructor falso
+    # faria todas as buscas do lote idênticas)
+    llm.query_echo = True
+    calls = _count_qdrant_calls(get_shared_embedder().async_client)
+    workdir = Path(corpus.state_dir)
+    source = workdir / "perguntas.csv"
+    questions = _write_questions(source, n)
+    # Primeira consulta monta clientes e retriever: fora da amostra
+    with contextlib.redirect_stdout(io.StringIO()):
+        async for _ in arun_streaming_rag(questions[0]):
+            pass
+
+    print(f"{n} perguntas, lotes de {batch_size}, {concurrency} chamadas simultâneas ao LLM\n")
+    single = await _measure("uma a uma", lambda: _one_by_one(questions, concurrency), llm, corpus.model, calls)
+    batch = await _measure(
+        "lote",
+        lambda: arun_batch(source, workdir / "respostas.jsonl", batch_size=batch_size, concurrency=concurrency),
+        llm,
+        corpus.model,
+        calls,
+    )
+    requests = {key: sum(result[m] for m in QDRANT_METHODS) for key, result in (("single", single), ("batch", batch))}
+    print(
+        f"\nEconomia: {single['embedding_calls'] - batch['embedding_calls']} chamadas de embedding, "
+        f"{requests['single'] - requests['batch']} requisições ao Qdrant, "
+        f"{single['elapsed_s'] / (batch['elapsed_s'] or 1e-9):.1f}× no tempo total"
+    )
+
+    resumed = await _resume_check(source, workdir / "retomada.jsonl", n, batch_size, concurrency, llm)
+    saved = batch["embedding_calls"] < single["embedding_calls"] and requests["batch"] < requests["single"]
+    if not saved:
+        print("⚠️ O lote não reduziu embeddings e requisições ao Qdrant")
+    return 0 if saved and resumed else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=96)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=0)
+    parser.add_argument("--query-ms", type=float, default=400)
+    parser.add_argument("--embedding-ms", type=float, default=50)
+    args = parser.parse_args()
+    latency = FakeLatency(args.first_token_ms, args.token_ms, args.query_ms, args.embedding_ms)
+    sys.exit(asyncio.run(_run(args.questions, args.batch_size, args.concurrency, latency)))
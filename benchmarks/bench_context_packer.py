@@ -0,0 +1,94 @@
+"""
+Redução dos tokens de prompt com o empacotador de contexto (app.graph.context).
+
+Ingere as súmulas reais em um Qdrant em memória (como bench_recall), busca cada
+pergunta de `benchmarks/data/recall_questions.jsonl` e compara os tokens do contexto
+com todos os trechos concatenados (comportamento anterior) com os do contexto
+empacotado no orçamento. Reporta média/p95 por pergunta, trechos duplicados,
+descartados e cortados, e o recall por súmula que sobra no contexto.
+
+Sem acesso ao encoding do tiktoken a contagem é a estimativa por caracteres
+(indicado na saída).
+
+Uso: python -m benchmarks.bench_context_packer [--k 10] [--budgets 2500 1500 1000] [--mode sparse]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from app.graph.context import pack_context
+from app.graph.rag_graph import _format_docs
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens, get_encoding
+from benchmarks.bench_recall import COLLECTION, ingest_sumulas, load_questions
+
+
+def _percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main(k: int, budgets: List[int], mode: str, embeddings: str) -> None:
+    questions = load_questions()
+    embedder = ingest_sumulas(embeddings)
+    store = embedder.get_qdrant_vector_store(COLLECTION, mode)
+
+    results = []
+    for item in questions:
+        docs = []
+        for doc, score in store.similarity_search_with_score(item["question"], k=k):
+            doc.metadata["score"] = score
+            docs.append(doc)
+        results.append((item, docs))
+
+    counter = "tiktoken" if get_encoding() is not None else "estimativa (~4 caracteres/token)"
+    print(f"\n{len(questions)} perguntas, modo {mode}, k={k}, contagem de tokens: {counter}")
+    for budget in budgets:
+        _report_budget(results, budget)
+
+
+def _report_budget(results: List[Tuple[Dict, List[Document]]], budget: int) -> None:
+    before: List[int] = []
+    after: List[int] = []
+    duplicates = dropped = trimmed = 0
+    recall_before = recall_after = 0.0
+    for item, docs in results:
+        _, kept, report = pack_context(docs, budget)
+        before.append(count_tokens(_format_docs(docs)))
+        after.append(report.tokens_kept)
+        duplicates += report.duplicates
+        dropped += len(report.dropped)
+        trimmed += len(report.trimmed)
+
+        relevant = set(item["relevant"])
+        recall_before += len(relevant & {d.metadata.get("num_sumula") for d in docs}) / len(relevant)
+        recall_after += len(relevant & {d.metadata.get("num_sumula") for d in kept}) / len(relevant)
+
+    n = len(results)
+    print(f"\nOrçamento {budget} tokens")
+    print(f"{'':<14}{'média':>8}{'p95':>8}{'máx':>8}")
+    for label, values in (("concatenado", before), ("empacotado", after)):
+        print(f"{label:<14}{statistics.mean(values):8.0f}{_percentile(values, 95):8.0f}{max(values):8.0f}")
+    reduction = 1 - sum(after) / sum(before)
+    print(f"Redução de tokens de prompt: {reduction:.1%}")
+    print(f"Trechos: {duplicates} duplicados, {dropped} descartados, {trimmed} cortados (total em {n} perguntas)")
+    print(f"Recall por súmula no contexto: {recall_before / n:.3f} -> {recall_after / n:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--budgets", type=int, nargs="+", default=sorted({2500, settings.CONTEXT_TOKEN_BUDGET, 1000}, reverse=True))
+    parser.add_argument("--mode", choices=["dense", "sparse", "hybrid"], default="sparse")
+    parser.add_argument(
+        "--embeddings",
+        choices=["openai", "fake"],
+        default="openai" if os.getenv("OPENAI_API_KEY") else "fake",
+    )
+    args = parser.parse_args()
+    main(args.k, args.budgets, args.mode, args.embeddings)
@@ -0,0 +1,116 @@
+"""
+Memória de conversa (app.graph.memory) sobre o corpus de referência, com modelos falsos.
+
+Cada conversa roda em uma sessão (checkpointer SQLite em diretório temporário) e cada
+seguimento é repetido como pergunta avulsa, como era tratado antes da memória (busca
+completa pela pergunta literal). Compara buscas, embeddings, chamadas ao LLM fora da
+geração (query constructor e reescrita da pergunta) e latência. Sai com código 1 se
+nenhum seguimento reaproveitou os trechos do turno anterior ou se algum que
+reaproveitou ainda fez busca ou embedding.
+
+Uso: python -m benchmarks.bench_conversation [--first-token-ms 300] [--query-ms 400] [--embedding-ms 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.graph.memory import set_checkpointer
+from app.graph.rag_graph import arun_streaming_rag
+from app.utils.settings import settings
+from benchmarks.fakes import CountingEmbeddings, FakeStreamingChatModel
+from benchmarks.fixtures import FakeLatency, build_fixture_corpus, install_query_path
+
+CONVERSATIONS = [
+    ["O que diz a súmula 12?", "e os precedentes dela?", "e a referência normativa dela?"],
+    ["A súmula 25 está vigente?", "quais os precedentes dessa súmula?", "e o texto dela?"],
+    ["Súmula 40", "Quais os precedentes da súmula 40?", "Súmulas vigentes sobre licitação"],
+    ["Município pode pagar aluguel de prédio para Delegacia de Polícia?", "e os precedentes dela?"],
+]
+
+
+async def _turn(question: str, session_id: Optional[str], llm: FakeStreamingChatModel, model: CountingEmbeddings) -> Dict[str, Any]:
+    embeddings, llm_calls = model.calls, llm.query_calls + llm.condense_calls
+    details: Dict[str, Any] = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        async for event in arun_streaming_rag(question, session_id=session_id):
+            if event["type"] == "details":
+                details = event["data"]
+    return {
+        "question": question,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "retrieval": details.get("timings", {}).get("node.retrieve") is not None,
+        "embeddings": model.calls - embeddings,
+        "llm_calls": llm.query_calls + llm.condense_calls - llm_calls,
+        "conversation": details.get("conversation", {}),
+    }
+
+
+def _totals(turns: List[Dict[str, Any]]) -> Dict[str, float]:
+    return {
+        "retrievals": sum(t["retrieval"] for t in turns),
+        "embeddings": sum(t["embeddings"] for t in turns),
+        "llm_calls": sum(t["llm_calls"] for t in turns),
+        "latency_ms": sum(t["latency_ms"] for t in turns),
+    }
+
+
+async def _run(latency: FakeLatency) -> int:
+    corpus = build_fixture_corpus()
+    settings.CONVERSATION_BACKEND = "sqlite"
+    settings.CONVERSATION_PATH = f"{corpus.state_dir}/conversations.sqlite"
+    set_checkpointer(None)
+    llm = await install_query_path(corpus, latency)
+    # Primeira consulta monta clientes e retriever: fora da amostra
+    await _turn(CONVERSATIONS[0][0], None, llm, corpus.model)
+
+    session_turns, fresh_turns = [], []
+    print(f"{'turno':<70} {'busca':>6} {'emb.':>5} {'LLM':>4} {'ms':>7}   avulsa: busca emb. LLM ms")
+    for conversation in CONVERSATIONS:
+        session_id = uuid.uuid4().hex
+        for i, question in enumerate(conversation):
+            turn = await _turn(question, session_id, llm, corpus.model)
+            if not i:
+                print(f"{question[:70]:<70} {turn['retrieval']:>6} {turn['embeddings']:>5} {turn['llm_calls']:>4} {turn['latency_ms']:7.0f}")
+                continue
+            fresh = await _turn(question, None, llm, corpus.model)
+            session_turns.append(turn)
+            fresh_turns.append(fresh)
+            conv = turn["conversation"]
+            label = f"  {question} [{conv['kind']}{', reuso ' + str(conv['reused_docs']) if conv['reused_docs'] else ''}]"
+            print(
+                f"{label[:70]:<70} {turn['retrieval']:>6} {turn['embeddings']:>5} {turn['llm_calls']:>4} {turn['latency_ms']:7.0f}"
+                f"   {fresh['retrieval']:>6} {fresh['embeddings']:>4} {fresh['llm_calls']:>3} {fresh['latency_ms']:5.0f}"
+            )
+
+    session, fresh = _totals(session_turns), _totals(fresh_turns)
+    print(f"\nSeguimentos ({len(session_turns)}): com sessão × avulsos")
+    for key in ("retrievals", "embeddings", "llm_calls"):
+        print(f"  {key:<12} {session[key]:>5.0f} × {fresh[key]:<5.0f} (economia: {fresh[key] - session[key]:.0f})")
+    print(f"  {'latency_ms':<12} {session['latency_ms']:>5.0f} × {fresh['latency_ms']:<5.0f}")
+
+    reused = [t for t in session_turns if t["conversation"].get("reused_docs")]
+    leaked = [t["question"] for t in reused if t["retrieval"] or t["embeddings"]]
+    if not reused:
+        print("⚠️ Nenhum seguimento reaproveitou os trechos do turno anterior")
+    if leaked:
+        print(f"⚠️ Seguimentos com reaproveitamento que ainda buscaram: {leaked}")
+    return 1 if not reused or leaked else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=0)
+    parser.add_argument("--query-ms", type=float, default=400)
+    parser.add_argument("--embedding-ms", type=float, default=50)
+    args = parser.parse_args()
+    latency = FakeLatency(args.first_token_ms, args.token_ms, args.query_ms, args.embedding_ms)
+    sys.exit(asyncio.run(_run(latency)))
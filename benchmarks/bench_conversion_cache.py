@@ -0,0 +1,61 @@
+"""
+Ingestão dos PDFs de `sumulas/` duas vezes (full rebuild) com um cache de conversões
+novo: a primeira execução converte tudo e grava o cache, a segunda não deve converter
+nenhum PDF. Mostra o tempo economizado, o tamanho do cache comprimido e, com
+`--reconvert`, uma terceira execução que ignora o cache.
+
+Todo o estado (conversões, manifesto, vocabulário esparso) fica em um diretório temporário.
+
+Uso: python -m benchmarks.bench_conversion_cache [--pasta_pdfs sumulas] [--reconvert]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+
+from app.ingest import extract_text
+from app.ingest.conversion_cache import ConversionCache
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+from benchmarks.fixtures import use_cache_dir
+
+
+def main(pasta_pdfs: str | None = None, reconvert: bool = False) -> int:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        use_cache_dir(cache_dir)
+        client = make_memory_client("sumulas_bench")
+        runs = [("fria", False), ("quente", False)] + ([("--reconvert", True)] if reconvert else [])
+
+        reports = []
+        for label, force in runs:
+            embedder = EmbeddingSelfQuery(
+                llm=FakeExtractionLLM(), client=client, model=make_fake_embeddings(), cache_embeddings=False
+            )
+            report = extract_text.main(
+                collection="sumulas_bench", pasta_pdfs=pasta_pdfs, embedder=embedder, full_rebuild=True,
+                reconvert=force,
+            )
+            reports.append((label, report))
+
+        summary = ConversionCache().summary()
+        print()
+        for label, report in reports:
+            print(
+                f"execução {label:<12} {report.conversions:>3} conversões, {report.conversion_hits:>3} do cache, "
+                f"~{report.conversion_seconds_saved:5.1f}s economizados, total {report.elapsed:5.1f}s"
+            )
+        print(
+            f"cache: {summary['entries']} textos, {summary['chars']} caracteres em "
+            f"{summary['stored_bytes']} bytes comprimidos"
+        )
+
+    return 0 if reports[1][1].conversions == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pasta_pdfs", default=None)
+    parser.add_argument("--reconvert", action="store_true", help="inclui uma execução que ignora o cache")
+    args = parser.parse_args()
+    sys.exit(main(pasta_pdfs=args.pasta_pdfs, reconvert=args.reconvert))
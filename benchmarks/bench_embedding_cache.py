@@ -0,0 +1,54 @@
+"""
+Ingestão dos PDFs de `sumulas/` duas vezes com um embedder falso que conta chamadas,
+passando pelo cache persistente de embeddings: a segunda execução deve fazer zero
+chamadas de embedding.
+
+Todo o estado (cache de embeddings, conversões, manifesto) fica em um diretório temporário.
+
+Uso: python -m benchmarks.bench_embedding_cache [--pasta_pdfs sumulas]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+from benchmarks.fixtures import use_cache_dir
+
+
+def main(pasta_pdfs: str | None = None) -> int:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        use_cache_dir(cache_dir)
+        counting = make_fake_embeddings()
+        client = make_memory_client("sumulas_bench")
+
+        results = []
+        for run in (1, 2):
+            before = counting.calls, counting.texts
+            embedder = EmbeddingSelfQuery(
+                llm=FakeExtractionLLM(), client=client, model=counting, cache_embeddings=True
+            )
+            start = time.perf_counter()
+            extract_text.main(
+                collection="sumulas_bench", pasta_pdfs=pasta_pdfs, embedder=embedder, full_rebuild=True
+            )
+            elapsed = time.perf_counter() - start
+            calls, texts = counting.calls - before[0], counting.texts - before[1]
+            results.append(calls)
+            print(
+                f"execução {run}: {calls} chamadas de embedding ({texts} textos), "
+                f"cache={embedder.embeddings.stats()}, {elapsed:.1f}s"
+            )
+
+    return 0 if results[1] == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pasta_pdfs", default=None)
+    args = parser.parse_args()
+    sys.exit(main(pasta_pdfs=args.pasta_pdfs))
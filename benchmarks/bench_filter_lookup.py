@@ -0,0 +1,74 @@
+"""
+Compara a busca só por metadados (scroll com filtro) com o caminho vetorial anterior
+(embedding da consulta + busca ANN com k=5) em um Qdrant local em memória.
+
+Uso: python -m benchmarks.bench_filter_lookup [--n 200] [--embed-latency-ms 0]
+`--embed-latency-ms` simula o tempo de uma chamada real de embedding.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from app.ingest.embed_qdrant import set_shared_embedder
+from app.retrieval.query_parser import parse_query
+from app.retrieval.retriever import (
+    SelfQueryConfig,
+    clear_retriever_cache,
+    get_self_query_retriever,
+    lookup_by_filter,
+)
+from benchmarks.fakes import make_fake_embedder, make_fake_embeddings, populate_synthetic_corpus
+
+QUESTIONS = [
+    "todos os precedentes da súmula 12",
+    "referências normativas da súmula 40",
+    "súmulas revogadas antes de 2000",
+    "texto da súmula 7",
+]
+
+
+def main(n: int = 200, embed_latency_ms: float = 0.0) -> None:
+    cfg = SelfQueryConfig(collection_name="sumulas_jornada", k=5)
+    embedder = make_fake_embedder(cfg.collection_name, model=make_fake_embeddings(latency_ms=embed_latency_ms))
+    populate_synthetic_corpus(embedder, cfg.collection_name)
+    set_shared_embedder(embedder)
+    clear_retriever_cache()
+    retriever = get_self_query_retriever(cfg)
+
+    print(f"{'pergunta':<40} {'vetorial (ms)':>14} {'docs':>5} {'lookup (ms)':>12} {'docs':>5}")
+    for question in QUESTIONS:
+        structured_query = parse_query(question).structured_query
+
+        def vector_path():
+            new_query, kwargs = retriever._prepare_query(question, structured_query)
+            return retriever.vectorstore.similarity_search_with_score(new_query, **kwargs)
+
+        def lookup_path():
+            return lookup_by_filter(structured_query, cfg)
+
+        results = {}
+        for label, fn in (("vector", vector_path), ("lookup", lookup_path)):
+            samples = []
+            for _ in range(n):
+                start = time.perf_counter()
+                docs = fn()
+                samples.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(samples), len(docs))
+
+        print(
+            f"{question:<40} {results['vector'][0]:>14.3f} {results['vector'][1]:>5} "
+            f"{results['lookup'][0]:>12.3f} {results['lookup'][1]:>5}"
+        )
+
+    embeddings = embedder.model
+    print(f"\nChamadas de embedding: {embeddings.calls} (todas do caminho vetorial; lookup não embeda)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    main(n=args.n, embed_latency_ms=args.embed_latency_ms)
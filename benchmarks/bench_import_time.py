@@ -0,0 +1,82 @@
+"""
+Tempo de import dos módulos de entrada (`python -X importtime`), cada um em um processo
+novo, melhor de N execuções: total do módulo e os pacotes que mais pesam (tempo próprio
+somado por pacote raiz), para acompanhar o que o import do grafo e do serviço arrasta.
+
+Uso: python -m benchmarks.bench_import_time [--runs 3] [--top 12] [--modules app.graph.rag_graph ...]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULES = ("app.graph.rag_graph", "app.api.server", "app.api.client", "app.retrieval.retriever")
+
+
+@dataclass
+class ImportProfile:
+    module: str
+    total_ms: float
+    # Tempo próprio (ms) somado por pacote raiz ("langchain_core", "qdrant_client", ...)
+    packages: Dict[str, float] = field(default_factory=dict)
+
+    def top(self, n: int) -> List[tuple]:
+        return sorted(self.packages.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def parse_importtime(stderr: str, module: str) -> ImportProfile:
+    """Lê a saída do -X importtime: `import time: self [us] | cumulative | pacote`."""
+    packages: Dict[str, float] = defaultdict(float)
+    total_us: Optional[int] = None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == module:
+            total_us = int(cumulative_us)
+    if total_us is None:
+        raise RuntimeError(f"{module} não aparece na saída do -X importtime")
+    return ImportProfile(module=module, total_ms=total_us / 1000, packages=dict(packages))
+
+
+def profile_import(module: str, runs: int = 3) -> ImportProfile:
+    """Melhor de `runs` processos novos (o primeiro também aquece o cache de bytecode)."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+    best: Optional[ImportProfile] = None
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} falhou:\n{out.stderr[-2000:]}")
+        current = parse_importtime(out.stderr, module)
+        if best is None or current.total_ms < best.total_ms:
+            best = current
+    return best
+
+
+def main(modules: List[str], runs: int, top: int) -> None:
+    for module in modules:
+        result = profile_import(module, runs)
+        print(f"\n{module}: {result.total_ms:.0f}ms (melhor de {runs})")
+        for package, ms in result.top(top):
+            print(f"  {package:<28} {ms:8.1f}ms  {100 * ms / result.total_ms:5.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+    main(args.modules, args.runs, args.top)
@@ -0,0 +1,51 @@
+"""
+Vazão da ingestão ponta a ponta com LLM falso (latência simulada) e Qdrant em memória:
+execução sequencial (1 processo de conversão, 1 chamada ao LLM por vez, lote = 1 PDF)
+contra o pipeline paralelo. A extração vai toda para o LLM (sem o parser local), senão
+nenhuma das execuções faria chamadas e a concorrência do LLM não teria efeito, e os PDFs
+são convertidos de novo (`reconvert`), senão o cache de conversões deixaria
+`convert_workers` sem efeito.
+
+Uso: python -m benchmarks.bench_ingest_pipeline [--llm-latency-ms 500] [--llm-concurrency 8]
+"""
+from __future__ import annotations
+
+import argparse
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+
+
+def _run(label: str, llm_latency_ms: float, **kwargs) -> None:
+    embedder = EmbeddingSelfQuery(
+        llm=FakeExtractionLLM(latency_ms=llm_latency_ms),
+        client=make_memory_client("sumulas_bench"),
+        model=make_fake_embeddings(),
+        cache_embeddings=False,
+    )
+    print(f"--- {label}: {kwargs}")
+    extract_text.main(
+        collection="sumulas_bench", embedder=embedder, full_rebuild=True, use_parser=False, reconvert=True, **kwargs
+    )
+
+
+def main(llm_latency_ms: float, convert_workers: int | None, llm_concurrency: int, batch_size: int) -> None:
+    _run("sequencial", llm_latency_ms, convert_workers=0, llm_concurrency=1, batch_size=1)
+    _run(
+        "paralelo",
+        llm_latency_ms,
+        convert_workers=convert_workers,
+        llm_concurrency=llm_concurrency,
+        batch_size=batch_size,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--convert-workers", type=int, default=None)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    main(args.llm_latency_ms, args.convert_workers, args.llm_concurrency, args.batch_size)
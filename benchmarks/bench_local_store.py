@@ -0,0 +1,134 @@
+"""
+Busca exata local (app.retrieval.local_store) × Qdrant: tempo de partida e latência.
+
+Sem `--url`, popula um Qdrant em memória com o corpus sintético (n súmulas × 3 trechos)
+e exporta o snapshot para um diretório temporário; com `--url`, exporta e mede a
+coleção de um servidor Qdrant já ingerido (o caso de produção, com HTTP).
+
+Mede:
+- partida: criar o cliente/vector store e responder à primeira consulta;
+- latência p50/p95 de consultas com vetores pré-calculados (sem o custo do embedding),
+  sem filtro e com os filtros que o self-query emite;
+- concordância do top-k entre os dois backends.
+
+Uso: python -m benchmarks.bench_local_store [--n 60] [--queries 200] [--k 10]
+     python -m benchmarks.bench_local_store --url http://localhost:6333 --collection sumulas_jornada
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_community.query_constructors.qdrant import QdrantTranslator
+from langchain_core.structured_query import Comparator, Comparison, Operation, Operator, StructuredQuery
+from qdrant_client import QdrantClient
+
+from app.retrieval.local_store import LocalFilterTranslator, LocalVectorStore, export_snapshot
+from benchmarks.fakes import make_fake_embedder, make_fake_embeddings, populate_synthetic_corpus
+
+FILTERS: Dict[str, Optional[Any]] = {
+    "sem filtro": None,
+    "eq status": Comparison(comparator=Comparator.EQ, attribute="status_atual", value="VIGENTE"),
+    "and ano/tipo": Operation(
+        operator=Operator.AND,
+        arguments=[
+            Comparison(comparator=Comparator.GTE, attribute="data_status_ano", value=1995),
+            Comparison(comparator=Comparator.LT, attribute="data_status_ano", value=2010),
+            Comparison(comparator=Comparator.EQ, attribute="chunk_type", value="precedentes"),
+        ],
+    ),
+    "or súmulas": Operation(
+        operator=Operator.OR,
+        arguments=[Comparison(comparator=Comparator.EQ, attribute="num_sumula", value=str(n)) for n in (3, 17, 42)],
+    ),
+}
+
+
+def _percentiles(values: List[float]) -> str:
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+    return f"p50={statistics.median(values) * 1000:7.3f}ms p95={p95 * 1000:7.3f}ms"
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(url: Optional[str], collection: str, n: int, queries: int, k: int) -> None:
+    embeddings = make_fake_embeddings()
+    if url is None:
+        embedder = make_fake_embedder(collection)
+        populate_synthetic_corpus(embedder, collection, n)
+        client = embedder.client
+        print(f"Qdrant em memória, {n * 3} trechos sintéticos")
+    else:
+        client = QdrantClient(url=url)
+        print(f"Qdrant em {url}, coleção {collection}")
+
+    snapshot_dir = tempfile.mkdtemp(prefix="snapshot_")
+    start = time.perf_counter()
+    export_snapshot(client, collection, snapshot_dir)
+    print(f"Exportação do snapshot: {time.perf_counter() - start:.2f}s")
+
+    dim = client.get_collection(collection).config.params.vectors["text-dense"].size
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((queries, dim)).astype(np.float32).tolist()
+
+    # Partida: do zero até a primeira resposta
+    start = time.perf_counter()
+    local = LocalVectorStore(snapshot_dir, embeddings, collection)
+    local.similarity_search_with_score_by_vector(vectors[0], k)
+    local_startup = time.perf_counter() - start
+    start = time.perf_counter()
+    qdrant = QdrantClient(url=url) if url else client
+    qdrant.query_points(collection_name=collection, query=vectors[0], using="text-dense", limit=k)
+    qdrant_startup = time.perf_counter() - start
+    print(f"Partida: local {local_startup * 1000:.1f}ms, Qdrant {qdrant_startup * 1000:.1f}ms"
+          + ("" if url else " (cliente em memória já criado)"))
+
+    qdrant_translator = QdrantTranslator(metadata_key="metadata")
+    local_translator = LocalFilterTranslator()
+    for label, directive in FILTERS.items():
+        sq = StructuredQuery(query="", filter=directive, limit=None)
+        qdrant_filter = qdrant_translator.visit_structured_query(sq)[1].get("filter")
+        local_filter = local_translator.visit_structured_query(sq)[1].get("filter")
+
+        agree = 0
+        for vector in vectors[:20]:
+            local_ids = [d.metadata["_id"] for d, _ in local.similarity_search_with_score_by_vector(vector, k, local_filter)]
+            points = qdrant.query_points(
+                collection_name=collection, query=vector, using="text-dense", query_filter=qdrant_filter, limit=k
+            ).points
+            agree += local_ids == [str(p.id) for p in points]
+
+        it = iter(vectors * 2)
+        local_times = _timed(lambda: local.similarity_search_with_score_by_vector(next(it), k, local_filter), queries)
+        it = iter(vectors * 2)
+        qdrant_times = _timed(
+            lambda: qdrant.query_points(
+                collection_name=collection, query=next(it), using="text-dense", query_filter=qdrant_filter, limit=k
+            ),
+            queries,
+        )
+        print(f"{label:<13} local {_percentiles(local_times)} | Qdrant {_percentiles(qdrant_times)} | "
+              f"top-{k} igual em {agree}/20")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="servidor Qdrant com a coleção já ingerida")
+    parser.add_argument("--collection", default="sumulas_jornada")
+    parser.add_argument("--n", type=int, default=60, help="súmulas sintéticas (sem --url)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    main(args.url, args.collection, args.n, args.queries, args.k)
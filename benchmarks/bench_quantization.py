@@ -0,0 +1,159 @@
+"""
+Dimensão reduzida e quantização do vetor denso × linha de base (3072 float32).
+
+Ingere as súmulas reais (como bench_recall) e, para cada layout (dimensão × quantização),
+reporta a memória dos vetores densos (RAM e disco), a latência por consulta, o recall@k
+em relação ao top-k da linha de base e o recall por súmula nas perguntas de
+`benchmarks/data/recall_questions.jsonl`.
+
+Sem `--url` a busca é emulada em NumPy, como o Qdrant a faz: int8 escalar (quantil
+0.99) ou sinal binário (distância de Hamming), seguidos do rescore de oversampling × k
+candidatos com os vetores originais (o Qdrant local ignora quantização). Com `--url`,
+cada layout é migrado (app.ingest.vector_layout) para uma coleção temporária no
+servidor, que deve ter a coleção completa já ingerida, e consultado com os
+search_params de rescore.
+
+Os vetores encurtados são os completos truncados e renormalizados, o que equivale ao
+parâmetro `dimensions` do text-embedding-3; com `--embeddings fake` (vetores
+aleatórios) só a comparação das quantizações é significativa.
+
+Uso: python -m benchmarks.bench_quantization [--k 10] [--dimensions 3072 1024 512 256]
+     python -m benchmarks.bench_quantization --url http://localhost:6333 --collection sumulas_jornada
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from app.ingest.vector_layout import FULL_DIMENSIONS, QUANTIZATION_MODES, VectorLayout, migrate_collection, truncate_embeddings
+from benchmarks.bench_recall import COLLECTION, ingest_sumulas, load_questions
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class _Emulated:
+    """Índice de um layout emulado em NumPy."""
+
+    def __init__(self, matrix: np.ndarray, layout: VectorLayout) -> None:
+        self.layout = layout
+        self.vectors = truncate_embeddings(matrix, layout.dimensions)
+        if layout.quantization == "scalar":
+            self.low, high = np.quantile(self.vectors, [0.005, 0.995])
+            self.scale = (high - self.low) / 255
+            self.codes = np.clip(np.round((self.vectors - self.low) / self.scale), 0, 255).astype(np.uint8)
+        elif layout.quantization == "binary":
+            self.bits = np.packbits(self.vectors > 0, axis=1)
+
+    def _approximate(self, query: np.ndarray) -> np.ndarray:
+        if self.layout.quantization == "scalar":
+            return (self.codes.astype(np.float32) @ query) * self.scale + self.low * query.sum()
+        if self.layout.quantization == "binary":
+            hamming = _POPCOUNT[np.bitwise_xor(self.bits, np.packbits(query > 0))].sum(axis=1)
+            return -hamming.astype(np.float32)
+        return self.vectors @ query
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        query = truncate_embeddings(query, self.layout.dimensions)
+        scores = self._approximate(query)
+        limit = k
+        if self.layout.quantized and self.layout.rescore:
+            limit = min(len(scores), int(k * self.layout.oversampling))
+        top = np.argsort(-scores, kind="stable")[:limit]
+        if self.layout.quantized and self.layout.rescore:
+            exact = self.vectors[top] @ query
+            top = top[np.argsort(-exact, kind="stable")]
+        return top[:k].tolist()
+
+
+def _corpus(client: QdrantClient, collection: str) -> Tuple[List[str], List[str], np.ndarray]:
+    ids, nums, vectors = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection, limit=256, offset=offset, with_payload=True, with_vectors=["text-dense"])
+        for p in points:
+            ids.append(str(p.id))
+            nums.append((p.payload.get("metadata") or {}).get("num_sumula"))
+            vectors.append(p.vector["text-dense"])
+        if offset is None:
+            return ids, nums, np.asarray(vectors, dtype=np.float32)
+
+
+def _row(layout: VectorLayout, points: int, times: List[float], overlap: float, recall: float) -> str:
+    memory = layout.memory_bytes(points)
+    return (
+        f"{layout.dimensions:>5} {layout.quantization:<7}{memory['ram'] / 1024:>10.1f}{memory['disk'] / 1024:>10.1f}"
+        f"{statistics.median(times) * 1000:>10.3f}{overlap:>10.3f}{recall:>10.3f}"
+    )
+
+
+def main(url: Optional[str], collection: str, dimensions: List[int], k: int, embeddings: str) -> None:
+    questions = load_questions()
+    if url is None:
+        embedder = ingest_sumulas(embeddings)
+        client, collection = embedder.client, COLLECTION
+        query_model = embedder.embeddings
+    else:
+        from app.ingest.embed_qdrant import EmbeddingSelfQuery
+
+        client = QdrantClient(url=url)
+        query_model = EmbeddingSelfQuery(client=client).embeddings
+
+    ids, nums, matrix = _corpus(client, collection)
+    queries = np.asarray(query_model.embed_documents([q["question"] for q in questions]), dtype=np.float32)
+    if matrix.shape[1] != FULL_DIMENSIONS:
+        print(f"⚠️ Linha de base com {matrix.shape[1]} dimensões (esperado {FULL_DIMENSIONS}).")
+    baseline = _Emulated(matrix, VectorLayout(dimensions=matrix.shape[1]))
+    expected = [set(baseline.search(q, k)) for q in queries]
+
+    print(f"\n{len(ids)} trechos, {len(questions)} perguntas, k={k}, busca {'Qdrant em ' + url if url else 'emulada em NumPy'}")
+    print(f"{'dim':>5} {'quant':<7}{'RAM KiB':>10}{'disco KiB':>10}{'p50 ms':>10}{'R@k base':>10}{'R súmula':>10}")
+    for dims in dimensions:
+        for mode in QUANTIZATION_MODES:
+            layout = VectorLayout(dimensions=dims, quantization=mode)
+            if url is None:
+                index = _Emulated(matrix, layout)
+                search = lambda q, index=index: index.search(q, k)
+            else:
+                target = f"{collection}__bench_{dims}_{mode}"
+                migrate_collection(client, collection, layout, target)
+                params = layout.search_params()
+
+                def search(q: np.ndarray, target: str = target, params=params) -> List[int]:
+                    points = client.query_points(
+                        target, query=truncate_embeddings(q, dims).tolist(), using="text-dense",
+                        limit=k, search_params=params,
+                    ).points
+                    return [ids.index(str(p.id)) for p in points]
+
+            times, overlap, recall = [], 0.0, 0.0
+            for query, item, base in zip(queries, questions, expected):
+                start = time.perf_counter()
+                found = search(query)
+                times.append(time.perf_counter() - start)
+                overlap += len(base & set(found)) / len(base)
+                relevant = set(item["relevant"])
+                recall += len(relevant & {nums[i] for i in found}) / len(relevant)
+            print(_row(layout, len(ids), times, overlap / len(questions), recall / len(questions)))
+            if url is not None:
+                client.delete_collection(target)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="servidor Qdrant com a coleção completa (3072) já ingerida")
+    parser.add_argument("--collection", default="sumulas_jornada")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[3072, 1024, 512, 256])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--embeddings",
+        choices=["openai", "fake"],
+        default="openai" if os.getenv("OPENAI_API_KEY") else "fake",
+    )
+    args = parser.parse_args()
+    main(args.url, args.collection, args.dimensions, args.k, args.embeddings)
@@ -0,0 +1,96 @@
+"""
+Quantas vezes o LLM e o query constructor são montados ao longo de várias consultas.
+
+Troca a fábrica do LLM (ChatOpenAI em app.ingest.embed_qdrant) por um LLM falso que
+conta as instâncias criadas, desliga o fast path (toda pergunta passa pelo query
+constructor) e faz as perguntas pelo grafo. Os nós analyze (k) e retrieve
+(k × RERANK_OVERFETCH) usam retrievers diferentes, mas devem dividir o mesmo
+query constructor: o LLM é criado uma vez, o query constructor montado uma vez e
+chamado uma vez por pergunta. Sai com código 1 se alguma contagem divergir.
+
+Uso: python -m benchmarks.bench_query_constructor [--questions 6]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Any, List
+from unittest import mock
+
+from app.graph.rag_graph import arun_streaming_rag
+from app.ingest import embed_qdrant
+from app.ingest.embed_qdrant import EmbeddingSelfQuery, set_shared_embedder
+from app.retrieval import retriever
+from app.retrieval.retriever import clear_retriever_cache
+from app.utils.answer_cache import set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import FakeStreamingChatModel, make_async_mirror
+from benchmarks.fixtures import QUERY_RESPONSE, build_fixture_corpus
+
+QUESTIONS_PATH = Path(__file__).parent / "data" / "recall_questions.jsonl"
+
+
+def _questions(n: int) -> List[str]:
+    lines = QUESTIONS_PATH.read_text(encoding="utf-8").splitlines()
+    return [json.loads(line)["question"] for line in lines if line.strip()][:n]
+
+
+async def _run(n: int) -> int:
+    corpus = build_fixture_corpus()
+    settings.FAST_PATH_ENABLED = False
+    settings.ANSWER_CACHE_BACKEND = "none"
+    set_answer_cache(None)
+
+    llms: List[FakeStreamingChatModel] = []
+    constructors = 0
+    build_constructor = retriever.load_query_constructor_runnable
+
+    def fake_chat_openai(*args: Any, **kwargs: Any) -> FakeStreamingChatModel:
+        llm = FakeStreamingChatModel(query_response=QUERY_RESPONSE)
+        llms.append(llm)
+        return llm
+
+    def counted_constructor(*args: Any, **kwargs: Any) -> Any:
+        nonlocal constructors
+        constructors += 1
+        return build_constructor(*args, **kwargs)
+
+    questions = _questions(n)
+    with mock.patch.object(embed_qdrant, "ChatOpenAI", fake_chat_openai), mock.patch.object(
+        retriever, "load_query_constructor_runnable", counted_constructor
+    ):
+        set_shared_embedder(
+            EmbeddingSelfQuery(
+                client=corpus.client,
+                model=corpus.model,
+                cache_embeddings=False,
+                async_client=await make_async_mirror(corpus.client, corpus.collection),
+            )
+        )
+        clear_retriever_cache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for question in questions:
+                async for _ in arun_streaming_rag(question):
+                    pass
+
+    query_calls = sum(llm.query_calls for llm in llms)
+    print(
+        f"{len(questions)} perguntas: {len(llms)} LLMs criados, {constructors} query constructors montados, "
+        f"{query_calls} chamadas ao query constructor"
+    )
+    ok = len(llms) == 1 and constructors == 1 and query_calls == len(questions)
+    if not ok:
+        print("⚠️ Esperado 1 LLM, 1 query constructor e uma chamada por pergunta")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=6)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(args.questions)))
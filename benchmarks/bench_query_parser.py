@@ -0,0 +1,86 @@
+"""
+Confere o analisador por regras (app.retrieval.query_parser) contra um corpus rotulado
+com os filtros que o query constructor (LLM) deve gerar, e mede o tempo por pergunta.
+
+Rótulo `filter: null` significa que a pergunta deve cair no LLM (sem acerto no
+caminho rápido). Com `--llm`, compara também com o query constructor real (requer
+OPENAI_API_KEY e Qdrant).
+
+Uso: python -m benchmarks.bench_query_parser [--llm]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain.chains.query_constructor.parser import get_parser
+from langchain_core.structured_query import Comparison, Operation
+
+from app.retrieval.query_parser import fast_path_stats, parse_query
+from app.utils.settings import settings
+
+CORPUS = Path(__file__).resolve().parent / "data" / "query_parser_corpus.jsonl"
+
+
+def canonical(node: Any) -> Optional[str]:
+    """Representação independente da ordem dos argumentos de and/or."""
+    if node is None:
+        return None
+    if isinstance(node, Comparison):
+        return f"{node.comparator.value}({node.attribute!r}, {node.value!r})"
+    if isinstance(node, Operation):
+        args = sorted(canonical(a) for a in node.arguments)
+        return f"{node.operator.value}({', '.join(args)})"
+    return repr(node)
+
+
+def main(use_llm: bool = False) -> int:
+    dsl = get_parser()
+    rows = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    if use_llm:
+        from app.retrieval.retriever import SelfQueryConfig, get_self_query_retriever
+
+        constructor = get_self_query_retriever(SelfQueryConfig()).query_constructor
+
+    fast_path_stats.reset()
+    failures = 0
+    elapsed = 0.0
+    for row in rows:
+        expected = canonical(dsl.parse(row["filter"])) if row["filter"] else None
+
+        start = time.perf_counter()
+        parsed = parse_query(row["question"])
+        elapsed += time.perf_counter() - start
+        hit = parsed is not None and parsed.confidence >= settings.FAST_PATH_MIN_CONFIDENCE
+        fast_path_stats.record(hit)
+        got = canonical(parsed.structured_query.filter) if hit else None
+
+        ok = got == expected
+        line = f"{'OK ' if ok else 'ERR'} {row['question']!r}: regras={got}"
+        if use_llm:
+            llm_filter = canonical(constructor.invoke({"query": row["question"]}).filter)
+            line += f" | llm={llm_filter}"
+        if not ok:
+            failures += 1
+            line += f" | esperado={expected}"
+        print(line)
+
+    stats = fast_path_stats.as_dict()
+    print(
+        f"\n{len(rows)} perguntas, {failures} divergências, "
+        f"taxa de acerto do caminho rápido={stats['hit_rate']:.0%}, "
+        f"{elapsed / len(rows) * 1e6:.1f} µs/pergunta"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="compara também com o query constructor real")
+    args = parser.parse_args()
+    sys.exit(main(use_llm=args.llm))
@@ -0,0 +1,92 @@
+"""
+Recall@k da busca densa, esparsa (BM25 local) e híbrida (RRF) sobre as súmulas reais.
+
+Os PDFs de `sumulas/` são ingeridos em um Qdrant em memória (LLM de extração falso,
+que separa os trechos pelos cabeçalhos) e cada pergunta de
+`benchmarks/data/recall_questions.jsonl` é buscada sem filtro nos três modos. O recall
+é medido por súmula: fração das súmulas relevantes presentes entre as k primeiras.
+
+Com `--embeddings openai` (padrão quando há OPENAI_API_KEY) os vetores densos vêm do
+modelo real, com o cache em disco de embeddings; com `--embeddings fake` o denso é
+aleatório e serve apenas de linha de base para o esparso. Todo o estado da ingestão
+(conversões, embeddings, vocabulário esparso, manifesto) fica em um diretório temporário.
+
+Uso: python -m benchmarks.bench_recall [--embeddings fake] [--k 1 3 5 10]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+from benchmarks.fixtures import use_cache_dir
+
+COLLECTION = "sumulas_recall"
+QUESTIONS_PATH = Path(__file__).parent / "data" / "recall_questions.jsonl"
+MODES = ("dense", "sparse", "hybrid")
+
+
+def _ranked_sumulas(embedder: EmbeddingSelfQuery, mode: str, question: str, k: int) -> List[str]:
+    store = embedder.get_qdrant_vector_store(COLLECTION, mode)
+    ranked: List[str] = []
+    for doc in store.similarity_search(question, k=k * 3):
+        num = doc.metadata.get("num_sumula")
+        if num not in ranked:
+            ranked.append(num)
+    return ranked
+
+
+def load_questions() -> List[Dict]:
+    return [json.loads(line) for line in QUESTIONS_PATH.read_text(encoding="utf-8").splitlines() if line]
+
+
+def ingest_sumulas(embeddings: str) -> EmbeddingSelfQuery:
+    """Ingere os PDFs reais em um Qdrant em memória (coleção COLLECTION); ver use_cache_dir."""
+    embedder = EmbeddingSelfQuery(
+        llm=FakeExtractionLLM(),
+        client=make_memory_client(COLLECTION),
+        model=make_fake_embeddings() if embeddings == "fake" else None,
+        cache_embeddings=embeddings != "fake",
+    )
+    extract_text.main(collection=COLLECTION, embedder=embedder, convert_workers=0, full_rebuild=True)
+    return embedder
+
+
+def main(embeddings: str, ks: List[int]) -> Dict[str, Dict[int, float]]:
+    questions = load_questions()
+    results: Dict[str, Dict[int, float]] = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        use_cache_dir(cache_dir)
+        embedder = ingest_sumulas(embeddings)
+        for mode in MODES:
+            totals = {k: 0.0 for k in ks}
+            for item in questions:
+                ranked = _ranked_sumulas(embedder, mode, item["question"], max(ks))
+                relevant = set(item["relevant"])
+                for k in ks:
+                    totals[k] += len(relevant & set(ranked[:k])) / len(relevant)
+            results[mode] = {k: totals[k] / len(questions) for k in ks}
+
+    print(f"\n{len(questions)} perguntas, embeddings densos: {embeddings}")
+    print("modo     " + "".join(f"  R@{k:<4}" for k in ks))
+    for mode, recalls in results.items():
+        print(f"{mode:<9}" + "".join(f"  {recalls[k]:.3f}" for k in ks))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--embeddings",
+        choices=["openai", "fake"],
+        default="openai" if os.getenv("OPENAI_API_KEY") else "fake",
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    args = parser.parse_args()
+    main(args.embeddings, args.k)
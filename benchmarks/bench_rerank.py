@@ -0,0 +1,96 @@
+"""
+Avaliação offline do reranqueamento local (app.retrieval.rerank).
+
+Ingere as súmulas reais em um Qdrant em memória (como bench_recall) e, para cada
+pergunta de `benchmarks/data/recall_questions.jsonl`, compara:
+- base: os k primeiros trechos da busca (comportamento sem rerank);
+- rerank: RERANK_OVERFETCH × k candidatos repontuados, cortados e diversificados.
+
+Reporta precisão por trecho (fração dos trechos entregues que pertencem a uma súmula
+relevante), recall por súmula, nº médio de trechos, tokens do contexto enviado ao LLM
+(todos os trechos concatenados, antes do orçamento do `pack`) e a latência do rerank.
+
+Uso: python -m benchmarks.bench_rerank [--k 5] [--mode sparse] [--embeddings fake]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from app.graph.rag_graph import _format_docs
+from app.retrieval.rerank import rerank
+from app.utils.settings import settings
+from app.utils.tokens import count_tokens, get_encoding
+from benchmarks.bench_recall import COLLECTION, ingest_sumulas, load_questions
+from benchmarks.fixtures import use_cache_dir
+
+
+class _Totals:
+    def __init__(self) -> None:
+        self.precision: List[float] = []
+        self.recall: List[float] = []
+        self.chunks: List[int] = []
+        self.tokens: List[int] = []
+
+    def add(self, docs: List[Document], relevant: set) -> None:
+        nums = [d.metadata.get("num_sumula") for d in docs]
+        self.precision.append(sum(n in relevant for n in nums) / len(nums) if nums else 0.0)
+        self.recall.append(len(relevant & set(nums)) / len(relevant))
+        self.chunks.append(len(docs))
+        self.tokens.append(count_tokens(_format_docs(docs)))
+
+    def row(self, label: str) -> str:
+        return (
+            f"{label:<8}{statistics.mean(self.precision):>10.3f}{statistics.mean(self.recall):>10.3f}"
+            f"{statistics.mean(self.chunks):>10.1f}{statistics.mean(self.tokens):>10.0f}"
+        )
+
+
+def main(k: int, mode: str, embeddings: str) -> Dict[str, float]:
+    questions = load_questions()
+    fetch_k = k * settings.RERANK_OVERFETCH
+    base, reranked = _Totals(), _Totals()
+    latencies: List[float] = []
+    # Estado da ingestão (conversões, vocabulário esparso...) fora do .cache/ do repositório
+    with tempfile.TemporaryDirectory() as cache_dir:
+        use_cache_dir(cache_dir)
+        store = ingest_sumulas(embeddings).get_qdrant_vector_store(COLLECTION, mode)
+        for item in questions:
+            candidates = []
+            for doc, score in store.similarity_search_with_score(item["question"], k=fetch_k):
+                doc.metadata["score"] = score
+                candidates.append(doc)
+            relevant = set(item["relevant"])
+            base.add(candidates[:k], relevant)
+            kept, report = rerank(item["question"], candidates, k)
+            reranked.add(kept, relevant)
+            latencies.append(report.latency_ms)
+
+    counter = "tiktoken" if get_encoding() is not None else "estimativa (~4 caracteres/token)"
+    print(f"\n{len(questions)} perguntas, modo {mode}, k={k}, candidatos={fetch_k}, tokens: {counter}")
+    print(f"{'':<8}{'precisão':>10}{'recall':>10}{'trechos':>10}{'tokens':>10}")
+    print(base.row("base"))
+    print(reranked.row("rerank"))
+    shrink = 1 - sum(reranked.tokens) / sum(base.tokens)
+    latencies.sort()
+    print(f"Contexto {shrink:.1%} menor; latência do rerank p50={statistics.median(latencies):.2f}ms "
+          f"máx={latencies[-1]:.2f}ms")
+    return {"precision_base": statistics.mean(base.precision), "precision_rerank": statistics.mean(reranked.precision)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--mode", choices=["dense", "sparse", "hybrid"], default="sparse")
+    parser.add_argument(
+        "--embeddings",
+        choices=["openai", "fake"],
+        default="openai" if os.getenv("OPENAI_API_KEY") else "fake",
+    )
+    args = parser.parse_args()
+    main(args.k, args.mode, args.embeddings)
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark do custo de preparação por requisição (antes x depois do registro
+compartilhado de recursos).
+
+Antes: cada pergunta criava um EmbeddingSelfQuery para o retriever e outro para a
+geração, além de recompilar o SelfQueryRetriever.
+Depois: o embedder do processo e o retriever em cache por (collection_name, k).
+
+Com o Qdrant em memória e modelos falsos o número medido é só o custo local de
+construção; em produção cada QdrantVectorStore novo ainda abre conexões HTTP/TLS e
+faz uma chamada de embedding ("dummy_text") para validar a dimensão da coleção.
+
+Uso: python -m benchmarks.bench_resource_setup [--n 200]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+from app.ingest.embed_qdrant import EmbeddingSelfQuery, get_shared_embedder, set_shared_embedder
+from app.retrieval.retriever import (
+    SelfQueryConfig,
+    build_self_query_retriever,
+    clear_retriever_cache,
+    get_self_query_retriever,
+)
+from benchmarks.fakes import make_fake_embeddings, make_fake_llm, make_memory_client
+
+
+def _timeit(fn: Callable[[], None], n: int) -> List[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<10} média={statistics.mean(samples):8.3f} ms  p50={statistics.median(samples):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main(n: int = 200) -> None:
+    cfg = SelfQueryConfig(collection_name="sumulas_jornada", k=5)
+    client = make_memory_client(cfg.collection_name)
+
+    def new_embedder() -> EmbeddingSelfQuery:
+        return EmbeddingSelfQuery(llm=make_fake_llm(), client=client, model=make_fake_embeddings())
+
+    def before() -> None:
+        build_self_query_retriever(cfg, new_embedder())  # nó retrieve
+        new_embedder().llm  # nó generate
+
+    set_shared_embedder(new_embedder())
+    clear_retriever_cache()
+
+    def after() -> None:
+        get_self_query_retriever(cfg)
+        get_shared_embedder().llm
+
+    print(f"Preparação por requisição ({n} iterações):")
+    _report("antes", _timeit(before, n))
+    _report("depois", _timeit(after, n))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    args = parser.parse_args()
+    main(n=args.n)
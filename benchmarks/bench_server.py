@@ -0,0 +1,148 @@
+"""
+Teste de carga do serviço SSE (app.api.server) com modelos falsos.
+
+Para cada nível de concorrência, dispara N perguntas simultâneas e mede o TTFT
+(tempo até o primeiro evento `token`, p50/p95/p99), os tokens/s agregados e as
+respostas 503 (fila cheia). Por padrão chama a aplicação ASGI no próprio processo
+(sem rede), com LLM falso de streaming e Qdrant em memória; com `--url` mede um
+servidor já em execução (ex.: `python -m app.api.server`).
+
+Uso: python -m benchmarks.bench_server [--levels 1 8 32 64] [--first-token-ms 300] [--token-ms 20]
+     python -m benchmarks.bench_server --url http://localhost:8000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.api.server import ConcurrencyLimiter, RAGServer
+from app.api.sse import aparse_sse
+from app.ingest.embed_qdrant import set_shared_embedder
+from app.retrieval.retriever import clear_retriever_cache
+from app.utils.answer_cache import set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import make_streaming_embedder
+
+QUESTIONS = [f"súmulas vigentes sobre o tema {n}" for n in range(11)]
+
+
+class _Level:
+    def __init__(self) -> None:
+        self.ttft: List[float] = []
+        self.tokens = 0
+        self.rejected = 0
+
+    def report(self, concurrency: int, elapsed: float) -> None:
+        ttft = sorted(self.ttft)
+        if not ttft:
+            print(f"N={concurrency:<4} nenhuma resposta ({self.rejected} recusadas)")
+            return
+        p50, p95, p99 = (_percentile(ttft, p) * 1000 for p in (50, 95, 99))
+        print(
+            f"N={concurrency:<4} TTFT p50={p50:7.1f}ms p95={p95:7.1f}ms p99={p99:7.1f}ms  "
+            f"{self.tokens / elapsed:8.1f} tokens/s  503={self.rejected}  total={elapsed:5.2f}s"
+        )
+
+
+def _percentile(values: List[float], p: float) -> float:
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _asgi_request(app: RAGServer, question: str, level: _Level) -> None:
+    """Uma requisição POST /ask direto na aplicação ASGI, contando os eventos recebidos."""
+    start = time.perf_counter()
+    finished = asyncio.Event()
+    body = json.dumps({"question": question}).encode("utf-8")
+    request_sent = False
+    first_token = True
+    status: Optional[int] = None
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, first_token
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            return
+        tokens = message.get("body", b"").count(b"event: token")
+        if tokens and status == 200:
+            if first_token:
+                level.ttft.append(time.perf_counter() - start)
+                first_token = False
+            level.tokens += tokens
+        if not message.get("more_body"):
+            finished.set()
+
+    scope = {"type": "http", "method": "POST", "path": "/ask", "query_string": b"", "headers": []}
+    await app(scope, receive, send)
+    finished.set()
+    if status == 503:
+        level.rejected += 1
+
+
+async def _http_request(client: httpx.AsyncClient, url: str, question: str, level: _Level) -> None:
+    start = time.perf_counter()
+    async with client.stream("POST", f"{url.rstrip('/')}/ask", json={"question": question}) as response:
+        if response.status_code == 503:
+            level.rejected += 1
+            return
+        first = True
+        async for event in aparse_sse(response.aiter_lines()):
+            if event["type"] == "token":
+                if first:
+                    level.ttft.append(time.perf_counter() - start)
+                    first = False
+                level.tokens += 1
+
+
+async def _run(levels: List[int], url: Optional[str], first_token_ms: float, token_ms: float) -> None:
+    app = None
+    if url is None:
+        settings.ANSWER_CACHE_BACKEND = "none"
+        set_answer_cache(None)
+        set_shared_embedder(await make_streaming_embedder(first_token_ms, token_ms))
+        clear_retriever_cache()
+        app = RAGServer(
+            limiter=ConcurrencyLimiter(
+                settings.SERVER_MAX_CONCURRENCY, settings.SERVER_MAX_QUEUE, settings.SERVER_QUEUE_TIMEOUT
+            ),
+            warm_up="off",
+        )
+        print(
+            f"ASGI em processo; LLM: 1º token {first_token_ms:.0f}ms, {token_ms:.0f}ms/token; "
+            f"limite {settings.SERVER_MAX_CONCURRENCY} simultâneas, fila {settings.SERVER_MAX_QUEUE}"
+        )
+    else:
+        print(f"Servidor em {url}")
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None), limits=httpx.Limits(max_connections=max(levels))) as client:
+        for concurrency in levels:
+            level = _Level()
+            start = time.perf_counter()
+            questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(concurrency)]
+            if app is not None:
+                await asyncio.gather(*(_asgi_request(app, q, level) for q in questions))
+            else:
+                await asyncio.gather(*(_http_request(client, url, q, level) for q in questions))
+            level.report(concurrency, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--url", default=None, help="mede um servidor em execução em vez da aplicação em processo")
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(_run(args.levels, args.url, args.first_token_ms, args.token_ms))
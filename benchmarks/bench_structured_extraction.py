@@ -0,0 +1,111 @@
+"""
+Chamadas ao LLM por documento e taxa de falha da extração estruturada
+(app.ingest.structured_extraction), com os PDFs reais de `sumulas/` e LLM falso.
+
+Compara uma requisição por súmula (lote = 1) com o agrupamento por orçamento de
+tokens, com alguns documentos que voltam inválidos nas primeiras `--flaky-attempts`
+respostas (só eles devem ser repetidos; os que esgotam as tentativas vão para o
+dead-letter). Depois confere, com um orçamento por documento bem menor que as súmulas,
+que o corte por tokens não perde as seções PRECEDENTES de nenhum PDF.
+
+Uso: python -m benchmarks.bench_structured_extraction [--flaky 6] [--flaky-attempts 1] [--doc-budget 300]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.ingest.extract_text import convert_pdf
+from app.ingest.structured_extraction import (
+    DeadLetter,
+    ExtractionJob,
+    StructuredExtractor,
+    fit_to_token_budget,
+    plan_batches,
+)
+from app.utils.settings import settings
+from app.utils.tokens import get_encoding
+from benchmarks.fakes import FakeExtractionLLM
+
+PDF_DIR = Path(__file__).resolve().parents[1] / "sumulas"
+
+
+def _run(label: str, texts: Dict[str, str], flaky: List[str], attempts: int, max_retries: int, **batching) -> None:
+    llm = FakeExtractionLLM(latency_ms=0, flaky={name: attempts for name in flaky})
+    extractor = StructuredExtractor(llm, max_retries=max_retries, backoff=0.0)
+    jobs = [ExtractionJob.from_text(name, text) for name, text in texts.items()]
+    dead_letter = DeadLetter(Path(tempfile.mkdtemp()) / "dead_letter.jsonl")
+
+    start = time.perf_counter()
+    chunks = 0
+    for batch in plan_batches(jobs, **batching):
+        results, errors = extractor.extract(batch)
+        chunks += sum(len(c) for c in results.values())
+        for name, error in errors.items():
+            dead_letter.add(name, error)
+    elapsed = time.perf_counter() - start
+
+    stats = extractor.stats
+    print(
+        f"{label:<22} chamadas={stats.calls:>3} ({stats.calls_per_doc:.2f}/doc) "
+        f"repetidos={stats.retried} falhas={stats.failed} ({stats.failure_rate:.1%}) "
+        f"dead-letter={len(dead_letter.entries)} chunks={chunks} em {elapsed * 1000:.0f}ms"
+    )
+
+
+def _check_precedentes(texts: Dict[str, str], budget: int) -> None:
+    truncated = whole = trimmed = lost = 0
+    for name, text in texts.items():
+        fitted, was_truncated = fit_to_token_budget(text, budget)
+        truncated += was_truncated
+        if "PRECEDENTES" not in text:
+            continue
+        # A última lista de precedentes (a atual) deve sobreviver ao corte; só é
+        # encurtada se sozinha passar de 3/4 do orçamento
+        tail = text[text.rindex("PRECEDENTES"):].strip()
+        if tail in fitted:
+            whole += 1
+        elif tail.splitlines()[0] in fitted:
+            trimmed += 1
+        else:
+            lost += 1
+            print(f"⚠️ {name}: PRECEDENTES perdidos no corte")
+    print(
+        f"Orçamento de {budget} tokens/doc: {truncated}/{len(texts)} documentos cortados; PRECEDENTES "
+        f"inteiros em {whole}, encurtados (maiores que 3/4 do orçamento) em {trimmed}, perdidos em {lost}"
+    )
+
+
+def main(flaky: int, attempts: int, doc_budget: int) -> None:
+    pdfs = sorted(PDF_DIR.glob("*.pdf"))
+    start = time.perf_counter()
+    texts = dict(convert_pdf(str(p)) for p in pdfs)
+    counter = "tiktoken" if get_encoding() is not None else "estimativa (~4 caracteres/token)"
+    print(f"{len(texts)} PDFs convertidos em {time.perf_counter() - start:.1f}s; contagem de tokens: {counter}\n")
+
+    flaky_names = sorted(texts)[:flaky]
+    print(f"{len(flaky_names)} documentos inválidos nas {attempts} primeiras respostas:")
+    for max_retries in (attempts, attempts - 1):
+        print(f"--- max_retries={max_retries}")
+        _run("lote = 1", texts, flaky_names, attempts, max_retries, max_docs=1)
+        _run(
+            f"lote ≤ {settings.EXTRACTION_BATCH_MAX_DOCS} docs",
+            texts,
+            flaky_names,
+            attempts,
+            max_retries,
+        )
+    print()
+    _check_precedentes(texts, doc_budget)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flaky", type=int, default=6, help="nº de documentos com respostas inválidas")
+    parser.add_argument("--flaky-attempts", type=int, default=1, help="respostas inválidas por documento")
+    parser.add_argument("--doc-budget", type=int, default=300, help="orçamento de tokens por documento")
+    args = parser.parse_args()
+    main(args.flaky, args.flaky_attempts, args.doc_budget)
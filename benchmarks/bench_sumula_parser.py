@@ -0,0 +1,127 @@
+"""
+Parser local das súmulas (app.ingest.sumula_parser) sobre os 60 PDFs de `sumulas/`.
+
+1. Conferência: todo PDF precisa passar na validação do parser, com num_sumula igual ao
+   do nome do arquivo, status conhecido, a última lista de PRECEDENTES inteira no
+   trecho de precedentes e todas as linhas do texto (fora o timbre da biblioteca) em
+   algum trecho. Sai com código 1 se algum falhar.
+2. Tempo: ingestão ponta a ponta com Qdrant em memória e embeddings falsos, com o
+   parser (nenhuma chamada ao LLM, nada de rede) e só com o LLM falso com latência
+   simulada por chamada (--llm-latency-ms): em lotes e concorrente (padrão atual) e
+   um documento por vez (como antes da extração em lote).
+
+Uso: python -m benchmarks.bench_sumula_parser [--llm-latency-ms 1000] [--skip-ingest]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from app.ingest.sumula_parser import _clean, parse_sumula, try_parse
+from app.utils.settings import settings
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+
+PDF_DIR = Path(__file__).resolve().parents[1] / "sumulas"
+KNOWN_STATUS = {"VIGENTE", "MODIFICADA", "ALTERADA", "REVISADA", "REVOGADA", "CANCELADA"}
+LETTERHEAD = ("Escola de Contas e Capacitação", "Biblioteca Conselheiro")
+
+
+def _check(name: str, text: str) -> List[str]:
+    item, problems = try_parse(text, name)
+    if item is None:
+        return problems
+    if item.metadados.status_atual not in KNOWN_STATUS:
+        problems.append(f"status desconhecido: {item.metadados.status_atual}")
+    chunks = item.chunks
+    if "PRECEDENTES" in text:
+        # Última lista de precedentes, até a redação anterior que às vezes vem depois dela
+        tail = re.split(r"Reda[çc][ãa]o\s+Anterior", text[text.rindex("PRECEDENTES"):])[0]
+        last = _clean(tail).split("\n", 1)[-1].strip()
+        if last not in chunks.precedentes:
+            problems.append("última lista de PRECEDENTES incompleta")
+    everything = "\n".join((chunks.conteudo_principal, chunks.referencias_normativas, chunks.precedentes))
+    for line in _clean(text).splitlines():
+        if line and not line.startswith(LETTERHEAD) and not re.fullmatch(r"(REFER|PRECEDENTES).*:", line) \
+                and line not in everything:
+            problems.append(f"linha fora dos trechos: {line[:60]!r}")
+            break
+    return problems
+
+
+def check_corpus(texts: Dict[str, str]) -> int:
+    start = time.perf_counter()
+    items = [parse_sumula(text, name) for name, text in texts.items()]
+    elapsed = time.perf_counter() - start
+
+    failures = {name: problems for name, text in texts.items() if (problems := _check(name, text))}
+    for name, problems in failures.items():
+        print(f"⚠️ {name}: {'; '.join(problems)}")
+    statuses = Counter(item.metadados.status_atual for item in items)
+    sections = Counter(
+        kind for item in items for kind, value in item.chunks.model_dump().items() if value
+    )
+    print(
+        f"Parser: {len(texts) - len(failures)}/{len(texts)} PDFs válidos em {elapsed * 1000:.1f}ms "
+        f"({elapsed * 1000 / max(len(texts), 1):.2f}ms/doc)"
+    )
+    print(f"  status: {dict(statuses.most_common())}")
+    print(f"  trechos: {dict(sections)}")
+    return 1 if failures else 0
+
+
+def _ingest(label: str, llm_latency_ms: float, use_parser: bool, one_by_one: bool = False) -> Tuple[float, int]:
+    llm = FakeExtractionLLM(latency_ms=llm_latency_ms)
+    embedder = EmbeddingSelfQuery(
+        llm=llm, client=make_memory_client("sumulas_bench"), model=make_fake_embeddings(), cache_embeddings=False
+    )
+    print(f"--- {label}")
+    batch_docs = settings.EXTRACTION_BATCH_MAX_DOCS
+    if one_by_one:
+        settings.EXTRACTION_BATCH_MAX_DOCS = 1
+    try:
+        report = extract_text.main(
+            collection="sumulas_bench",
+            embedder=embedder,
+            full_rebuild=True,
+            use_parser=use_parser,
+            llm_concurrency=1 if one_by_one else 8,
+        )
+    finally:
+        settings.EXTRACTION_BATCH_MAX_DOCS = batch_docs
+    return report.elapsed, llm.calls
+
+
+def main(llm_latency_ms: float, skip_ingest: bool) -> int:
+    pdfs = sorted(PDF_DIR.glob("*.pdf"))
+    start = time.perf_counter()
+    texts = dict(extract_text.convert_pdf(str(p)) for p in pdfs)
+    print(f"{len(texts)} PDFs convertidos em {time.perf_counter() - start:.1f}s\n")
+    status = check_corpus(texts)
+    if skip_ingest:
+        return status
+
+    print()
+    runs = [
+        ("parser local (sem rede)", _ingest("parser", llm_latency_ms, use_parser=True)),
+        ("LLM, lotes + 8 concorrentes", _ingest("LLM em lotes", llm_latency_ms, use_parser=False)),
+        ("LLM, 1 documento por vez", _ingest("LLM 1 a 1", llm_latency_ms, use_parser=False, one_by_one=True)),
+    ]
+    print(f"\nIngestão de {len(texts)} PDFs (LLM falso com {llm_latency_ms:.0f}ms por chamada):")
+    for label, (elapsed, calls) in runs:
+        print(f"  {label:<30} {elapsed:6.1f}s  {calls:3d} chamadas ao LLM")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--skip-ingest", action="store_true", help="só a conferência do parser")
+    args = parser.parse_args()
+    sys.exit(main(args.llm_latency_ms, args.skip_ingest))
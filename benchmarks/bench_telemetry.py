@@ -0,0 +1,96 @@
+"""
+Instrumentação do RAG (app.utils.telemetry) com LLM falso de streaming, embeddings
+falsos e Qdrant em memória.
+
+1. N consultas pelo caminho assíncrono: tempos por nó e por etapa (p50/p95) lidos do
+   evento details final, TTFT e tokens; sai com código 1 se faltar alguma etapa.
+2. Custo de um span vazio com o exportador nulo (o que cada etapa paga a mais).
+3. Com --prometheus, imprime o texto de GET /metrics.
+
+Uso: python -m benchmarks.bench_telemetry [--requests 20] [--first-token-ms 300] [--token-ms 20] [--prometheus]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from app.graph.rag_graph import arun_streaming_rag
+from app.ingest.embed_qdrant import set_shared_embedder
+from app.retrieval.retriever import clear_retriever_cache
+from app.utils import telemetry
+from app.utils.answer_cache import set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import make_streaming_embedder
+
+QUESTIONS = [f"súmulas vigentes sobre o tema {n}" for n in range(11)]
+EXPECTED = [
+    "node.analyze", "query_construction", "node.retrieve", "embedding", "vector_search",
+    "node.pack", "prompt_build", "generation", "node.generate", "time_to_first_token",
+]
+
+
+async def _request(question: str) -> Dict[str, float]:
+    details: Dict = {}
+    async for event in arun_streaming_rag(question):
+        if event["type"] == "details":
+            details = event["data"]
+    return {**details.get("timings", {}), **{f"tokens.{k}": v for k, v in details.get("tokens", {}).items()}}
+
+
+def _span_overhead(n: int = 20000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        with telemetry.span("overhead"):
+            pass
+    return (time.perf_counter() - start) / n
+
+
+def main(requests: int, first_token_ms: float, token_ms: float, prometheus: bool) -> int:
+    settings.ANSWER_CACHE_BACKEND = "none"
+    set_answer_cache(None)
+    telemetry.set_exporter(telemetry.SpanExporter())
+    overhead = _span_overhead()
+
+    loop = asyncio.new_event_loop()
+    set_shared_embedder(loop.run_until_complete(make_streaming_embedder(first_token_ms, token_ms)))
+    clear_retriever_cache()
+    # Primeira consulta monta clientes e retriever: fora da amostra
+    with contextlib.redirect_stdout(io.StringIO()):
+        loop.run_until_complete(_request(QUESTIONS[0]))
+        telemetry.metrics.reset()
+        runs: List[Dict[str, float]] = [loop.run_until_complete(_request(QUESTIONS[i % len(QUESTIONS)])) for i in range(requests)]
+    loop.close()
+
+    print(f"{requests} consultas; LLM: 1º token {first_token_ms:.0f}ms, {token_ms:.0f}ms/token\n")
+    print(f"{'etapa':<22} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    names = list(dict.fromkeys(name for run in runs for name in run))
+    for name in names:
+        values = sorted(run[name] for run in runs if run.get(name) is not None)
+        p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+        print(f"{name:<22} {statistics.median(values):10.2f} {p95:10.2f}")
+
+    print(f"\nCusto de um span (exportador nulo): {overhead * 1e6:.1f}µs")
+
+    if prometheus:
+        print("\n" + telemetry.render_prometheus())
+
+    missing = [name for name in EXPECTED if any(run.get(name) is None for run in runs)]
+    if missing:
+        print(f"⚠️ Etapas sem medição: {', '.join(missing)}")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--prometheus", action="store_true", help="imprime as métricas no formato do Prometheus")
+    args = parser.parse_args()
+    sys.exit(main(args.requests, args.first_token_ms, args.token_ms, args.prometheus))
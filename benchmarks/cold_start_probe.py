@@ -0,0 +1,59 @@
+"""
+Sonda de partida a frio, executada em um processo novo por `benchmarks.suite`: mede o
+import do grafo e as duas primeiras consultas sobre o corpus de referência e imprime
+uma linha JSON. A montagem do corpus fica fora das medidas.
+
+Uso: python -m benchmarks.cold_start_probe '{"first_token_ms": 300, ...}'
+"""
+from __future__ import annotations
+
+import time
+
+_start = time.perf_counter()
+
+import asyncio  # noqa: E402
+import contextlib  # noqa: E402
+import io  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+
+import app.graph.rag_graph  # noqa: E402,F401
+
+_imported = time.perf_counter()
+
+from benchmarks.fixtures import FakeLatency, build_fixture_corpus, install_query_path  # noqa: E402
+
+
+async def _ask(question: str) -> float:
+    from app.graph.rag_graph import arun_streaming_rag
+
+    start = time.perf_counter()
+    async for _ in arun_streaming_rag(question):
+        pass
+    return time.perf_counter() - start
+
+
+async def _probe(latency: FakeLatency, question: str) -> dict:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        corpus = build_fixture_corpus()
+        fixture = time.perf_counter() - start
+        await install_query_path(corpus, latency)
+        first = await _ask(question)
+        second = await _ask(question)
+    return {
+        "import_ms": (_imported - _start) * 1000,
+        "fixture_s": fixture,
+        "first_query_ms": first * 1000,
+        "second_query_ms": second * 1000,
+    }
+
+
+def main(argv: list) -> None:
+    config = json.loads(argv[0]) if argv else {}
+    question = config.pop("question", "Município pode pagar aluguel de prédio para Delegacia de Polícia?")
+    print(json.dumps(asyncio.run(_probe(FakeLatency(**config), question))))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,349 @@
+"""
+Modelos falsos e Qdrant em memória para rodar benchmarks sem rede.
+Uso: `from benchmarks.fakes import make_fake_embedder`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel, FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import CreateAlias, CreateAliasOperation, PointStruct
+
+from app.ingest.collection_versions import active_version, version_name
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from app.ingest.extract_text import ensure_collection
+from app.ingest.vector_layout import VectorLayout
+
+EMBEDDING_SIZE = 3072
+
+# Resposta no formato esperado pelo StructuredQueryOutputParser do self-query
+DEFAULT_QUERY_RESPONSE = "```json\n" + json.dumps(
+    {"query": "precedentes", "filter": 'eq("num_sumula", "70")', "limit": None}
+) + "\n```"
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embedding determinístico que conta chamadas/textos e simula latência por chamada."""
+
+    calls: int = 0
+    texts: int = 0
+    latency_ms: float = 0.0
+
+    def _tick(self, n: int) -> None:
+        self.calls += 1
+        self.texts += n
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._tick(len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._tick(1)
+        return super().embed_query(text)
+
+    async def _atick(self, n: int) -> None:
+        self.calls += 1
+        self.texts += n
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self._atick(len(texts))
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self._atick(1)
+        return super().embed_query(text)
+
+
+class FakeExtractionLLM(BaseChatModel):
+    """
+    Substitui o LLM da ingestão: lê os blocos <documento> do prompt da extração
+    estruturada e devolve o JSON do schema, separando os trechos pelos cabeçalhos do PDF.
+    `flaky` ({pdf_name: n}) faz as n primeiras respostas para o documento virem inválidas.
+    """
+
+    calls: int = 0
+    latency_ms: float = 0.0
+    flaky: Dict[str, int] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-extraction"
+
+    def _extract(self, pdf_name: str, text: str) -> Dict[str, Any]:
+        if "REFERÊNCIAS NORMATIVAS:" in text:
+            head, _, rest = text.partition("REFERÊNCIAS NORMATIVAS:")
+            refs, _, precedentes = rest.partition("PRECEDENTES:")
+        else:
+            head, _, precedentes = text.partition("PRECEDENTES:")
+            refs = ""
+        num = re.search(r"S[ÚU]MULA\s+(\d+)", head)
+        years = re.findall(r"\d{2}/\d{2}/(\d{2,4})", head)
+        year = years[-1] if years else None
+        if year and len(year) == 2:
+            year = ("19" if int(year) > 50 else "20") + year
+        if self.flaky.get(pdf_name, 0) > 0:
+            self.flaky[pdf_name] -= 1
+            num = None
+        return {
+            "pdf_name": pdf_name,
+            "metadados": {
+                "num_sumula": num.group(1) if num else None,
+                "data_status": None,
+                "data_status_ano": int(year) if year else None,
+                "status_atual": "VIGENTE",
+            },
+            "chunks": {
+                "conteudo_principal": head.strip(),
+                "referencias_normativas": refs.strip(),
+                "precedentes": precedentes.strip(),
+            },
+        }
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        documents = re.findall(r'<documento pdf_name="(.*?)">\n(.*?)\n</documento>', messages[-1].content, re.S)
+        data = {"sumulas": [self._extract(pdf_name, text) for pdf_name, text in documents]}
+        message = AIMessage(content=json.dumps(data, ensure_ascii=False))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        # Mesmo contrato do json_schema dos modelos OpenAI: {"raw", "parsed", "parsing_error"}
+        def parse(message: AIMessage) -> Any:
+            try:
+                parsed, error = schema.model_validate_json(message.content), None
+            except ValueError as e:
+                parsed, error = None, e
+            if include_raw:
+                return {"raw": message, "parsed": parsed, "parsing_error": error}
+            if error is not None:
+                raise error
+            return parsed
+
+        return self | RunnableLambda(parse)
+
+
+DEFAULT_ANSWER = (
+    "Segundo a Súmula 3, vigente, a despesa é regular desde que haja dotação orçamentária "
+    "própria e convênio formalizado. (Status da Súmula: VIGENTE, Número da Súmula: 3)"
+)
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    LLM de resposta fixa que gera palavra a palavra, com latência até o primeiro token e
+    entre tokens (time.sleep no caminho síncrono, asyncio.sleep no assíncrono).
+    `tokens_emitted` permite verificar se uma geração abandonada parou de fato.
+    Prompts do query constructor recebem `query_response` de uma vez, após `query_latency_ms`;
+    os de reescrita de pergunta (conversas), `condense_response` (padrão: a própria pergunta,
+    com a última súmula citada pelo usuário no histórico, como o LLM resolveria "dela").
+    Com `query_echo`, a parte semântica da resposta do query constructor é a própria
+    pergunta (o filtro continua o de `query_response`), como perguntas distintas dariam.
+    """
+
+    answer: str = DEFAULT_ANSWER
+    first_token_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    query_response: str = DEFAULT_QUERY_RESPONSE
+    query_latency_ms: float = 0.0
+    query_echo: bool = False
+    calls: int = 0
+    query_calls: int = 0
+    condense_response: Optional[str] = None
+    condense_calls: int = 0
+    tokens_emitted: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.answer)
+
+    def _chunk(self, token: str) -> ChatGenerationChunk:
+        self.tokens_emitted += 1
+        return ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def _is_query(self, messages: List[BaseMessage]) -> bool:
+        if any("Structured Request Schema" in str(m.content) for m in messages):
+            self.query_calls += 1
+            return True
+        return False
+
+    def _query_answer(self, messages: List[BaseMessage]) -> str:
+        if not self.query_echo:
+            return self.query_response
+        question = re.findall(r"User Query:\s*(.*?)\s*Structured Request:", str(messages[-1].content), re.S)[-1]
+        data = json.loads(self.query_response.strip().strip("`").removeprefix("json"))
+        return "```json\n" + json.dumps({**data, "query": question}, ensure_ascii=False) + "\n```"
+
+    def _condensed(self, messages: List[BaseMessage]) -> Optional[str]:
+        if not any("pergunta autônoma" in str(m.content) for m in messages if m.type == "system"):
+            return None
+        self.condense_calls += 1
+        if self.condense_response:
+            return self.condense_response
+        question = str(messages[-1].content)
+        cited = [n for m in messages[1:-1] if m.type == "human" for n in re.findall(r"[Ss]úmula\s+(\d+)", str(m.content))]
+        return f"{question} (Súmula {cited[-1]})" if cited else question
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in self._stream(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self._is_query(messages):
+            time.sleep(self.query_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=self._query_answer(messages)))
+            return
+        if (condensed := self._condensed(messages)) is not None:
+            time.sleep(self.query_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=condensed))
+            return
+        self.calls += 1
+        time.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_latency_ms / 1000)
+            yield self._chunk(token)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = "".join([chunk.message.content async for chunk in self._astream(messages)])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self._is_query(messages):
+            await asyncio.sleep(self.query_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=self._query_answer(messages)))
+            return
+        if (condensed := self._condensed(messages)) is not None:
+            await asyncio.sleep(self.query_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=condensed))
+            return
+        self.calls += 1
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_latency_ms / 1000)
+            yield self._chunk(token)
+
+
+def make_fake_llm(responses: Optional[List[str]] = None) -> FakeListChatModel:
+    return FakeListChatModel(responses=responses or [DEFAULT_QUERY_RESPONSE])
+
+
+def make_fake_embeddings(size: int = EMBEDDING_SIZE, latency_ms: float = 0.0) -> CountingEmbeddings:
+    return CountingEmbeddings(size=size, latency_ms=latency_ms)
+
+
+def make_memory_client(collection: str = "sumulas_jornada", size: int = EMBEDDING_SIZE) -> QdrantClient:
+    """
+    Cria um Qdrant em memória com a mesma configuração de vetores da ingestão: a versão
+    `{collection}_v1` atrás do alias `collection`, como depois da primeira ingestão.
+    """
+    client = QdrantClient(":memory:")
+    physical = version_name(collection, 1)
+    ensure_collection(client, physical, VectorLayout(dimensions=size))
+    client.update_collection_aliases(
+        change_aliases_operations=[CreateAliasOperation(create_alias=CreateAlias(collection_name=physical, alias_name=collection))]
+    )
+    return client
+
+
+async def make_async_mirror(client: QdrantClient, collection: str = "sumulas_jornada") -> AsyncQdrantClient:
+    """
+    Copia a coleção de um Qdrant em memória para um AsyncQdrantClient(":memory:")
+    (cada cliente local tem o próprio armazenamento). Se `collection` é um alias, copia a
+    versão ativa com o mesmo nome e recria o alias.
+    """
+    physical = active_version(client, collection) or collection
+    params = client.get_collection(physical).config.params
+    mirror = AsyncQdrantClient(":memory:")
+    await mirror.create_collection(
+        collection_name=physical,
+        vectors_config=params.vectors,
+        sparse_vectors_config=params.sparse_vectors,
+    )
+    points, _ = client.scroll(collection_name=physical, limit=100_000, with_payload=True, with_vectors=True)
+    await mirror.upsert(
+        collection_name=physical,
+        points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+    )
+    if physical != collection:
+        await mirror.update_collection_aliases(
+            change_aliases_operations=[
+                CreateAliasOperation(create_alias=CreateAlias(collection_name=physical, alias_name=collection))
+            ]
+        )
+    return mirror
+
+
+def make_fake_embedder(
+    collection: str = "sumulas_jornada",
+    client: Optional[QdrantClient] = None,
+    responses: Optional[List[str]] = None,
+    model: Optional[CountingEmbeddings] = None,
+    cache_embeddings: bool = False,
+) -> EmbeddingSelfQuery:
+    return EmbeddingSelfQuery(
+        llm=make_fake_llm(responses),
+        client=client or make_memory_client(collection),
+        model=model or make_fake_embeddings(),
+        cache_embeddings=cache_embeddings,
+    )
+
+
+_STATUSES = ["VIGENTE", "REVOGADA", "CANCELADA", "MODIFICADA"]
+_CHUNK_TYPES = ["conteudo_principal", "referencias_normativas", "precedentes"]
+
+
+def populate_synthetic_corpus(embedder: EmbeddingSelfQuery, collection: str = "sumulas_jornada", n: int = 60) -> int:
+    """Insere n súmulas sintéticas x 3 trechos com metadados no formato da ingestão."""
+    texts, metadatas = [], []
+    for num in range(1, n + 1):
+        year = 1987 + (num * 7) % 28
+        for idx, chunk_type in enumerate(_CHUNK_TYPES):
+            texts.append(f"Súmula {num} - {chunk_type}: texto sintético sobre o tema {num % 11}.")
+            metadatas.append(
+                {
+                    "num_sumula": str(num),
+                    "status_atual": _STATUSES[num % len(_STATUSES)],
+                    "data_status": f"01/01/{str(year)[2:]}",
+                    "data_status_ano": year,
+                    "pdf_name": f"Súmula {num:03d}-87.pdf",
+                    "chunk_type": chunk_type,
+                    "chunk_index": idx,
+                }
+            )
+    embedder.get_qdrant_vector_store(collection, "hybrid").add_texts(texts=texts, metadatas=metadatas)
+    return len(texts)
+
+
+async def make_streaming_embedder(first_token_ms: float = 0.0, token_ms: float = 0.0) -> EmbeddingSelfQuery:
+    """
+    Embedder para os testes de carga do streaming: LLM falso de streaming, corpus
+    sintético e o mesmo conteúdo em um AsyncQdrantClient em memória (caminho assíncrono).
+    """
+    base = make_fake_embedder()
+    populate_synthetic_corpus(base)
+    return EmbeddingSelfQuery(
+        llm=FakeStreamingChatModel(first_token_ms=first_token_ms, token_latency_ms=token_ms),
+        client=base.client,
+        model=base.model,
+        cache_embeddings=False,
+        async_client=await make_async_mirror(base.client),
+    )
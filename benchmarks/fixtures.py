@@ -0,0 +1,141 @@
+"""
+Corpus de referência dos benchmarks: os PDFs de `sumulas/` ingeridos pelo pipeline real
+(parser local, sem LLM) em um Qdrant em memória, com embeddings falsos determinísticos.
+
+Os estados gravados pela ingestão (manifesto, vocabulário esparso, dead letter) vão para
+um diretório temporário; as conversões PDF -> texto usam o cache de conversões
+(endereçado pelo conteúdo), então só a primeira montagem paga o MarkItDown.
+
+Uso:
+    corpus = build_fixture_corpus()
+    llm = await install_query_path(corpus, FakeLatency(first_token_ms=300))
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from qdrant_client import QdrantClient
+
+from app.graph.rag_graph import COLLECTION_NAME
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery, set_shared_embedder
+from app.retrieval.retriever import clear_retriever_cache
+from app.utils.answer_cache import set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import (
+    CountingEmbeddings,
+    FakeExtractionLLM,
+    FakeStreamingChatModel,
+    make_async_mirror,
+    make_fake_embeddings,
+    make_memory_client,
+)
+
+# Resposta do query constructor falso: parte semântica + filtro (busca vetorial filtrada)
+QUERY_RESPONSE = "```json\n" + json.dumps(
+    {"query": "despesa com dotação orçamentária própria", "filter": 'eq("status_atual", "VIGENTE")', "limit": None},
+    ensure_ascii=False,
+) + "\n```"
+
+
+@dataclass
+class FakeLatency:
+    """Latências simuladas dos modelos falsos (ms)."""
+
+    first_token_ms: float = 300.0
+    token_ms: float = 20.0
+    query_ms: float = 400.0
+    embedding_ms: float = 50.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+@dataclass
+class FixtureCorpus:
+    client: QdrantClient
+    model: CountingEmbeddings
+    collection: str
+    pdfs: int
+    chunks: int
+    state_dir: str
+
+
+def use_cache_dir(directory: str) -> None:
+    """
+    Aponta CACHE_DIR e tudo o que fica sob ele (manifestos, dead letter, vocabulário
+    esparso, conversões, embeddings, respostas, conversas, snapshots) para `directory`:
+    o resultado não depende do que execuções anteriores deixaram em `.cache/`.
+    """
+    settings.CACHE_DIR = directory
+    settings.SPARSE_VOCAB_DIR = f"{directory}/sparse"
+    settings.CONVERSION_CACHE_DIR = f"{directory}/conversions"
+    settings.EMBEDDING_CACHE_DIR = f"{directory}/embeddings"
+    settings.ANSWER_CACHE_PATH = f"{directory}/answer_cache.sqlite"
+    settings.CONVERSATION_PATH = f"{directory}/conversations.sqlite"
+    settings.LOCAL_SNAPSHOT_DIR = f"{directory}/snapshots"
+
+
+def isolate_ingest_state() -> str:
+    """Aponta manifesto, dead letter e vocabulário esparso para um diretório temporário."""
+    state_dir = tempfile.mkdtemp(prefix="rag_bench_")
+    settings.CACHE_DIR = state_dir
+    settings.SPARSE_VOCAB_DIR = f"{state_dir}/sparse"
+    return state_dir
+
+
+def ingest_fixture(
+    client: QdrantClient,
+    model: CountingEmbeddings,
+    collection: str = COLLECTION_NAME,
+    pasta_pdfs: Optional[str] = None,
+) -> extract_text.IngestReport:
+    embedder = EmbeddingSelfQuery(llm=FakeExtractionLLM(), client=client, model=model, cache_embeddings=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return extract_text.main(collection=collection, pasta_pdfs=pasta_pdfs, embedder=embedder, full_rebuild=True)
+
+
+def build_fixture_corpus(collection: str = COLLECTION_NAME, pasta_pdfs: Optional[str] = None) -> FixtureCorpus:
+    state_dir = isolate_ingest_state()
+    client = make_memory_client(collection)
+    model = make_fake_embeddings()
+    report = ingest_fixture(client, model, collection, pasta_pdfs)
+    return FixtureCorpus(
+        client=client, model=model, collection=collection, pdfs=report.docs, chunks=report.chunks, state_dir=state_dir
+    )
+
+
+async def install_query_path(corpus: FixtureCorpus, latency: FakeLatency) -> FakeStreamingChatModel:
+    """
+    Embedder compartilhado do grafo sobre o corpus (cliente síncrono e espelho assíncrono),
+    com o LLM falso de streaming e sem cache de respostas. Devolve o LLM para os contadores.
+    """
+    settings.ANSWER_CACHE_BACKEND = "none"
+    set_answer_cache(None)
+    corpus.model.latency_ms = latency.embedding_ms
+    llm = FakeStreamingChatModel(
+        first_token_ms=latency.first_token_ms,
+        token_latency_ms=latency.token_ms,
+        query_latency_ms=latency.query_ms,
+        query_response=QUERY_RESPONSE,
+    )
+    set_shared_embedder(
+        EmbeddingSelfQuery(
+            llm=llm,
+            client=corpus.client,
+            model=corpus.model,
+            cache_embeddings=False,
+            async_client=await make_async_mirror(corpus.client, corpus.collection),
+        )
+    )
+    clear_retriever_cache()
+    return llm
+
+
+def describe(corpus: FixtureCorpus) -> Dict[str, Any]:
+    return {"collection": corpus.collection, "pdfs": corpus.pdfs, "chunks": corpus.chunks}
@@ -0,0 +1,291 @@
+"""
+Suíte reproduzível e offline do caminho de consulta, sobre o corpus de referência
+(benchmarks.fixtures: PDFs de `sumulas/` em Qdrant em memória, modelos falsos com
+latência simulada configurável).
+
+Cenários:
+- latency: perguntas em sequência (caminho por regras e pelo query constructor);
+  latência total, TTFT e tempo por nó/etapa (p50/p95, do evento details final);
+- throughput: N consultas simultâneas no event loop (requisições/s, tokens/s, p95);
+- cold_start: processo novo (benchmarks.cold_start_probe): import do grafo e
+  1ª/2ª consultas;
+- ingest: ingestão completa dos PDFs (textos do cache de conversões) com embeddings
+  falsos;
+- imports: `python -X importtime` dos módulos de entrada (benchmarks.bench_import_time).
+
+O resultado é um JSON (padrão `.cache/benchmarks/suite_<data>_<commit>.json`) com as
+métricas, a direção de cada uma (lower/higher) e a configuração da execução; `compare`
+aponta as regressões acima do limiar entre duas execuções e sai com código 1 se houver.
+
+Uso:
+    python -m benchmarks.suite run [--scenarios latency throughput] [--out resultado.json]
+    python -m benchmarks.suite compare antes.json depois.json [--threshold 0.1]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.graph.rag_graph import arun_streaming_rag
+from app.utils import telemetry
+from app.utils.settings import settings
+from benchmarks.bench_import_time import MODULES as IMPORT_MODULES, profile_import
+from benchmarks.fakes import make_fake_embeddings, make_memory_client
+from benchmarks.fixtures import FakeLatency, FixtureCorpus, build_fixture_corpus, describe, ingest_fixture, install_query_path
+
+SUITE_VERSION = 1
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(__file__).parent / "data"
+SCENARIOS = ("latency", "throughput", "cold_start", "ingest", "imports")
+# Diferenças absolutas menores que isso (ms) não contam como regressão
+MIN_DELTA_MS = 2.0
+
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    """better: "lower", "higher" ou "none" (informativa, fora da comparação)."""
+    return {"value": round(float(value), 3), "unit": unit, "better": better}
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def load_questions(n: int = 12) -> List[str]:
+    """Perguntas fixas, intercaladas: caminho por regras e caminho pelo query constructor (LLM)."""
+    rules = [json.loads(line)["question"] for line in (DATA_DIR / "query_parser_corpus.jsonl").open(encoding="utf-8")]
+    llm = [json.loads(line)["question"] for line in (DATA_DIR / "recall_questions.jsonl").open(encoding="utf-8")]
+    mixed = [q for pair in zip(rules, llm) for q in pair]
+    return mixed[:n]
+
+
+async def _ask(question: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    ttft, tokens, details = None, 0, {}
+    async for event in arun_streaming_rag(question):
+        if event["type"] == "token":
+            tokens += 1
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        elif event["type"] == "details":
+            details = event["data"]
+    elapsed = time.perf_counter() - start
+    return {"latency": elapsed, "ttft": ttft if ttft is not None else elapsed, "tokens": tokens, "timings": details.get("timings", {})}
+
+
+async def scenario_latency(corpus: FixtureCorpus, latency: FakeLatency, questions: List[str], repeat: int) -> Metrics:
+    await install_query_path(corpus, latency)
+    await _ask(questions[0])  # aquecimento: clientes e retriever
+    runs = [await _ask(q) for _ in range(repeat) for q in questions]
+
+    latencies = [r["latency"] * 1000 for r in runs]
+    ttfts = [r["ttft"] * 1000 for r in runs]
+    metrics: Metrics = {
+        "latency_p50_ms": metric(_pct(latencies, 0.5), "ms"),
+        "latency_p95_ms": metric(_pct(latencies, 0.95), "ms"),
+        "ttft_p50_ms": metric(_pct(ttfts, 0.5), "ms"),
+        "ttft_p95_ms": metric(_pct(ttfts, 0.95), "ms"),
+    }
+    stages = dict.fromkeys(name for r in runs for name, ms in r["timings"].items() if ms is not None)
+    for stage in stages:
+        values = [r["timings"][stage] for r in runs if r["timings"].get(stage) is not None]
+        metrics[f"stage.{stage}_p50_ms"] = metric(_pct(values, 0.5), "ms")
+    return metrics
+
+
+async def scenario_throughput(corpus: FixtureCorpus, latency: FakeLatency, questions: List[str], concurrency: int) -> Metrics:
+    await install_query_path(corpus, latency)
+    await _ask(questions[0])
+    start = time.perf_counter()
+    runs = await asyncio.gather(*(_ask(questions[i % len(questions)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "total_s": metric(elapsed, "s"),
+        "requests_per_s": metric(concurrency / elapsed, "req/s", "higher"),
+        "tokens_per_s": metric(sum(r["tokens"] for r in runs) / elapsed, "tokens/s", "higher"),
+        "ttft_p95_ms": metric(_pct([r["ttft"] * 1000 for r in runs], 0.95), "ms"),
+        "latency_p95_ms": metric(_pct([r["latency"] * 1000 for r in runs], 0.95), "ms"),
+    }
+
+
+def scenario_cold_start(latency: FakeLatency, question: str) -> Metrics:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start_probe", json.dumps({**latency.as_dict(), "question": question})],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONPATH": str(REPO_ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmarks.cold_start_probe falhou:\n{result.stderr[-2000:]}")
+    process = time.perf_counter() - start
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "import_ms": metric(probe["import_ms"], "ms"),
+        "first_query_ms": metric(probe["first_query_ms"], "ms"),
+        "second_query_ms": metric(probe["second_query_ms"], "ms"),
+        "process_s": metric(process - probe["fixture_s"], "s"),
+    }
+
+
+def scenario_ingest(corpus: FixtureCorpus, latency: FakeLatency) -> Metrics:
+    model = make_fake_embeddings(latency_ms=latency.embedding_ms)
+    report = ingest_fixture(make_memory_client(corpus.collection), model, corpus.collection)
+    elapsed = report.elapsed or 1e-9
+    return {
+        "elapsed_s": metric(elapsed, "s"),
+        "pdfs_per_s": metric(report.docs / elapsed, "pdfs/s", "higher"),
+        "chunks_per_s": metric(report.chunks / elapsed, "chunks/s", "higher"),
+        "embedding_calls": metric(model.calls, "calls"),
+        "conversions": metric(report.conversions, "pdfs", "none"),
+    }
+
+
+def scenario_imports(runs: int = 3) -> Metrics:
+    results: Metrics = {}
+    for module in IMPORT_MODULES:
+        profile = profile_import(module, runs)
+        results[f"{module}_ms"] = metric(profile.total_ms, "ms")
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _meta(latency: FakeLatency, corpus: FixtureCorpus, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "suite_version": SUITE_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "latency": latency.as_dict(),
+        "corpus": describe(corpus),
+        "questions": args.questions,
+        "repeat": args.repeat,
+        "concurrency": args.concurrency,
+        "settings": {
+            name: getattr(settings, name)
+            for name in ("RETRIEVAL_MODE", "FAST_PATH_ENABLED", "RERANK_ENABLED", "CONTEXT_TOKEN_BUDGET", "EMBEDDING_DIMENSIONS")
+        },
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    latency = FakeLatency(args.first_token_ms, args.token_ms, args.query_ms, args.embedding_ms)
+    questions = load_questions(args.questions)
+    telemetry.set_exporter(telemetry.SpanExporter())
+
+    print("Montando o corpus de referência...")
+    start = time.perf_counter()
+    corpus = build_fixture_corpus()
+    print(f"  {corpus.pdfs} PDFs, {corpus.chunks} trechos em {time.perf_counter() - start:.1f}s")
+
+    results: Dict[str, Metrics] = {}
+    steps: Dict[str, Callable[[], Metrics]] = {
+        "latency": lambda: asyncio.run(scenario_latency(corpus, latency, questions, args.repeat)),
+        "throughput": lambda: asyncio.run(scenario_throughput(corpus, latency, questions, args.concurrency)),
+        "cold_start": lambda: scenario_cold_start(latency, questions[1]),
+        "ingest": lambda: scenario_ingest(corpus, latency),
+        "imports": lambda: scenario_imports(),
+    }
+    for name in args.scenarios:
+        print(f"--- {name}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = steps[name]()
+        for key, m in results[name].items():
+            print(f"  {key:<32} {m['value']:>12.3f} {m['unit']}")
+    return {"meta": _meta(latency, corpus, args), "scenarios": results}
+
+
+def _default_out(results_dir: Path, meta: Dict[str, Any]) -> Path:
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return results_dir / f"suite_{stamp}_{meta.get('commit') or 'local'}.json"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float, min_delta_ms: float = MIN_DELTA_MS) -> List[str]:
+    """Imprime a comparação métrica a métrica e devolve as regressões ("cenário.métrica")."""
+    if old["meta"].get("latency") != new["meta"].get("latency"):
+        print(f"⚠️ Latências simuladas diferentes: {old['meta'].get('latency')} x {new['meta'].get('latency')}")
+    regressions: List[str] = []
+    print(f"{'métrica':<44} {'antes':>12} {'depois':>12} {'variação':>9}")
+    for scenario, metrics in new["scenarios"].items():
+        for name, m in metrics.items():
+            before = old["scenarios"].get(scenario, {}).get(name)
+            if before is None or m["better"] == "none":
+                continue
+            a, b = before["value"], m["value"]
+            change = (b - a) / a if a else 0.0
+            worse = change > threshold if m["better"] == "lower" else change < -threshold
+            better = change < -threshold if m["better"] == "lower" else change > threshold
+            if m["unit"] == "ms" and abs(b - a) < min_delta_ms:
+                worse = better = False
+            flag = "⚠️ regressão" if worse else ("✅ melhora" if better else "")
+            print(f"{scenario + '.' + name:<44} {a:>12.3f} {b:>12.3f} {change:>+8.1%}  {flag}")
+            if worse:
+                regressions.append(f"{scenario}.{name}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks offline do caminho de consulta.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="executa os cenários e grava o JSON")
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument("--out", default=None, help="arquivo JSON de saída")
+    run_parser.add_argument("--questions", type=int, default=12)
+    run_parser.add_argument("--repeat", type=int, default=1, help="passadas pelas perguntas no cenário latency")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    defaults = FakeLatency()
+    run_parser.add_argument("--first-token-ms", type=float, default=defaults.first_token_ms)
+    run_parser.add_argument("--token-ms", type=float, default=defaults.token_ms)
+    run_parser.add_argument("--query-ms", type=float, default=defaults.query_ms)
+    run_parser.add_argument("--embedding-ms", type=float, default=defaults.embedding_ms)
+    cmp_parser = sub.add_parser("compare", help="compara dois resultados e aponta regressões")
+    cmp_parser.add_argument("before")
+    cmp_parser.add_argument("after")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10, help="variação relativa tolerada (0.10 = 10%%)")
+    cmp_parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        old, new = (json.loads(Path(p).read_text(encoding="utf-8")) for p in (args.before, args.after))
+        regressions = compare(old, new, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regressões acima de {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\n✅ Nenhuma regressão acima de {args.threshold:.0%}.")
+        return 0
+
+    # Antes de run(): a montagem do corpus aponta CACHE_DIR para um diretório temporário
+    results_dir = Path(settings.CACHE_DIR) / "benchmarks"
+    result = run(args)
+    out = Path(args.out) if args.out else _default_out(results_dir, result["meta"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n✅ Resultado gravado em {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+import pytest
+
+from benchmarks.fixtures import FixtureCorpus, build_fixture_corpus
+
+
+@pytest.fixture(scope="session")
+def corpus() -> FixtureCorpus:
+    """Corpus de referência (PDFs de sumulas/) ingerido com modelos falsos em um Qdrant em memória."""
+    return build_fixture_corpus()
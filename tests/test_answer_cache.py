@@ -0,0 +1,54 @@
+import contextlib
+import io
+import shutil
+from pathlib import Path
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery, set_shared_embedder
+from app.utils.answer_cache import AnswerCache, MemoryCacheBackend, collection_data_version, set_answer_cache
+from app.utils.settings import settings
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+
+PDF_DIR = Path(__file__).resolve().parents[1] / "sumulas"
+
+
+def test_incremental_ingestion_changes_answer_keys_on_other_hosts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "ingest_host"))
+    monkeypatch.setattr(settings, "SPARSE_VOCAB_DIR", str(tmp_path / "ingest_host" / "sparse"))
+    monkeypatch.setattr(settings, "ANSWER_CACHE_BACKEND", "none")
+    monkeypatch.setattr(settings, "COLLECTION_ALIAS_TTL", 0.0)
+    set_answer_cache(None)
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    for pdf in sorted(PDF_DIR.glob("*.pdf"))[:3]:
+        shutil.copy(pdf, pdfs)
+
+    client = make_memory_client("sumulas_test")
+    embedder = EmbeddingSelfQuery(
+        llm=FakeExtractionLLM(), client=client, model=make_fake_embeddings(), cache_embeddings=False
+    )
+    set_shared_embedder(embedder)
+
+    def ingest(**kwargs) -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract_text.main(
+                collection="sumulas_test", pasta_pdfs=str(pdfs), embedder=embedder, convert_workers=0, **kwargs
+            )
+
+    ingest(full_rebuild=True)
+    # Outra máquina: cache de respostas em memória e nenhum manifesto em disco
+    other_host = AnswerCache(MemoryCacheBackend(), data_version=collection_data_version)
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "query_host"))
+    version = collection_data_version("sumulas_test")
+    before = other_host.make_key("súmulas vigentes", None, "sumulas_test", 5)
+    assert other_host.make_key("súmulas vigentes", None, "sumulas_test", 5) == before
+
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "ingest_host"))
+    sorted(pdfs.glob("*.pdf"))[0].unlink()
+    ingest()  # incremental, na versão ativa
+
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "query_host"))
+    physical, _, data = collection_data_version("sumulas_test").partition("@")
+    assert physical == version.partition("@")[0]  # mesma coleção física, dados novos
+    assert data not in ("-", version.partition("@")[2])
+    assert other_host.make_key("súmulas vigentes", None, "sumulas_test", 5) != before
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+from typing import Any, Dict, Optional
+
+import pytest
+
+from app.graph.memory import expire_sessions, get_checkpointer, set_checkpointer
+from app.graph.rag_graph import arun_streaming_rag, run_streaming_rag
+from app.utils.settings import settings
+from benchmarks.fixtures import FakeLatency, FixtureCorpus, install_query_path
+
+NO_LATENCY = FakeLatency(first_token_ms=0, token_ms=0, query_ms=0, embedding_ms=0)
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "CONVERSATION_PATH", str(tmp_path / "conversations.sqlite"))
+    monkeypatch.setattr(settings, "ANSWER_CACHE_BACKEND", "none")
+    set_checkpointer(None)
+    yield
+    set_checkpointer(None)
+
+
+async def _turn(question: str, session_id: Optional[str], corpus: FixtureCorpus, llm: Any) -> Dict[str, Any]:
+    embeddings, llm_calls = corpus.model.calls, llm.query_calls + llm.condense_calls
+    details: Dict[str, Any] = {}
+    async for event in arun_streaming_rag(question, session_id=session_id):
+        if event["type"] == "details":
+            details = event["data"]
+    return {
+        "retrieval": "node.retrieve" in details.get("timings", {}),
+        "embeddings": corpus.model.calls - embeddings,
+        "llm_calls": llm.query_calls + llm.condense_calls - llm_calls,
+        "conversation": details.get("conversation", {}),
+    }
+
+
+def test_follow_up_by_number_reuses_chunks_without_search(corpus, sessions):
+    async def run():
+        llm = await install_query_path(corpus, NO_LATENCY)
+        session_id = uuid.uuid4().hex
+        first = await _turn("Súmula 40", session_id, corpus, llm)
+        follow_up = await _turn("Quais os precedentes da súmula 40?", session_id, corpus, llm)
+        return first, follow_up
+
+    first, follow_up = asyncio.run(run())
+    assert first["retrieval"]
+    assert follow_up["conversation"]["kind"] == "rules"
+    assert follow_up["conversation"]["reused_docs"] > 0
+    assert (follow_up["retrieval"], follow_up["embeddings"], follow_up["llm_calls"]) == (False, 0, 0)
+
+
+def test_anaphoric_follow_up_is_condensed_then_reused(corpus, sessions):
+    async def run():
+        llm = await install_query_path(corpus, NO_LATENCY)
+        session_id = uuid.uuid4().hex
+        await _turn("O que diz a súmula 12?", session_id, corpus, llm)
+        follow_up = await _turn("e os precedentes dela?", session_id, corpus, llm)
+        fresh = await _turn("e os precedentes dela?", None, corpus, llm)
+        return follow_up, fresh
+
+    follow_up, fresh = asyncio.run(run())
+    assert follow_up["conversation"]["kind"] == "condense"
+    assert follow_up["conversation"]["reused_docs"] > 0
+    # Uma chamada ao LLM (a reescrita da pergunta) no lugar da busca e do embedding
+    assert (follow_up["retrieval"], follow_up["embeddings"], follow_up["llm_calls"]) == (False, 0, 1)
+    assert fresh["retrieval"]
+
+
+def test_new_topic_in_session_searches_again(corpus, sessions):
+    async def run():
+        llm = await install_query_path(corpus, NO_LATENCY)
+        session_id = uuid.uuid4().hex
+        await _turn("Súmula 40", session_id, corpus, llm)
+        return await _turn("Súmulas vigentes sobre licitação", session_id, corpus, llm)
+
+    turn = asyncio.run(run())
+    assert turn["conversation"]["kind"] == "new_topic"
+    assert turn["conversation"]["reused_docs"] == 0
+    assert turn["retrieval"]
+
+
+def test_sync_sessions_persist_and_expire(corpus, sessions):
+    asyncio.run(install_query_path(corpus, NO_LATENCY))
+    session_id = uuid.uuid4().hex
+    turns = []
+    for question in ("Súmula 40", "Quais os precedentes da súmula 40?"):
+        details = [e["data"] for e in run_streaming_rag(question, session_id=session_id) if e["type"] == "details"]
+        turns.append(details[-1]["conversation"])
+    assert [t["turn"] for t in turns] == [1, 2]
+    assert turns[1]["reused_docs"] > 0
+
+    checkpointer = get_checkpointer()
+    assert expire_sessions(checkpointer, ttl=3600) == 0
+    assert expire_sessions(checkpointer, ttl=-1) == 1
+    assert checkpointer.get_tuple({"configurable": {"thread_id": session_id}}) is None
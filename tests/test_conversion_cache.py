@@ -0,0 +1,41 @@
+import contextlib
+import io
+import shutil
+from pathlib import Path
+
+from app.ingest import extract_text
+from app.ingest.embed_qdrant import EmbeddingSelfQuery
+from app.utils.settings import settings
+from benchmarks.fakes import FakeExtractionLLM, make_fake_embeddings, make_memory_client
+
+PDF_DIR = Path(__file__).resolve().parents[1] / "sumulas"
+
+
+def test_warm_conversion_cache_does_no_conversions(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(settings, "CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(settings, "SPARSE_VOCAB_DIR", str(cache_dir / "sparse"))
+    monkeypatch.setattr(settings, "CONVERSION_CACHE_DIR", str(cache_dir / "conversions"))
+    monkeypatch.setattr(settings, "CONVERSION_CACHE_ENABLED", True)
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    for pdf in sorted(PDF_DIR.glob("*.pdf"))[:3]:
+        shutil.copy(pdf, pdfs)
+
+    client = make_memory_client("sumulas_test")
+
+    def ingest(reconvert: bool = False) -> extract_text.IngestReport:
+        embedder = EmbeddingSelfQuery(
+            llm=FakeExtractionLLM(), client=client, model=make_fake_embeddings(), cache_embeddings=False
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            return extract_text.main(
+                collection="sumulas_test", pasta_pdfs=str(pdfs), embedder=embedder, full_rebuild=True,
+                convert_workers=0, reconvert=reconvert,
+            )
+
+    cold, warm, forced = ingest(), ingest(), ingest(reconvert=True)
+    assert (cold.conversions, cold.conversion_hits) == (3, 0)
+    assert (warm.conversions, warm.conversion_hits) == (0, 3)
+    assert warm.chunks == cold.chunks
+    assert forced.conversions == 3
@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from app.retrieval.retriever import SelfQueryConfig, construct_query
+from app.utils.settings import settings
+from benchmarks.bench_query_parser import CORPUS, canonical
+from benchmarks.fixtures import FakeLatency, install_query_path
+
+NO_LATENCY = FakeLatency(first_token_ms=0, token_ms=0, query_ms=0, embedding_ms=0)
+
+
+def test_fast_path_agrees_with_llm_path(corpus, monkeypatch):
+    """
+    O LLM falso responde com o filtro rotulado de cada pergunta; o caminho por regras
+    precisa chegar ao mesmo filtro sem chamar o LLM, e as perguntas rotuladas `null`
+    precisam cair no LLM.
+    """
+    rows = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    llm = asyncio.run(install_query_path(corpus, NO_LATENCY))
+    cfg = SelfQueryConfig(collection_name=corpus.collection)
+
+    disagreements = []
+    for row in rows:
+        llm.query_response = json.dumps(
+            {"query": row["question"], "filter": row["filter"] or "NO_FILTER", "limit": None}, ensure_ascii=False
+        )
+        monkeypatch.setattr(settings, "FAST_PATH_ENABLED", False)
+        from_llm = construct_query(row["question"], cfg)
+        monkeypatch.setattr(settings, "FAST_PATH_ENABLED", True)
+        calls = llm.query_calls
+        fast = construct_query(row["question"], cfg)
+        used_llm = llm.query_calls > calls
+
+        if row["filter"] is None:
+            ok = used_llm
+        else:
+            ok = not used_llm and canonical(fast.filter) == canonical(from_llm.filter)
+        if not ok:
+            disagreements.append((row["question"], canonical(fast.filter), canonical(from_llm.filter), used_llm))
+
+    assert disagreements == []
@@ -0,0 +1,43 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, List
+
+from app.graph.rag_graph import arun_streaming_rag
+from app.retrieval import retriever
+from app.utils.settings import settings
+from benchmarks.fixtures import FakeLatency, install_query_path
+
+NO_LATENCY = FakeLatency(first_token_ms=0, token_ms=0, query_ms=0, embedding_ms=0)
+QUESTIONS_PATH = Path(__file__).resolve().parents[1] / "benchmarks" / "data" / "recall_questions.jsonl"
+
+
+def _questions(n: int) -> List[str]:
+    lines = QUESTIONS_PATH.read_text(encoding="utf-8").splitlines()
+    return [json.loads(line)["question"] for line in lines if line.strip()][:n]
+
+
+def test_query_constructor_is_built_once_and_called_once_per_question(corpus, monkeypatch):
+    monkeypatch.setattr(settings, "FAST_PATH_ENABLED", False)
+    constructors = 0
+    build_constructor = retriever.load_query_constructor_runnable
+
+    def counted_constructor(*args: Any, **kwargs: Any) -> Any:
+        nonlocal constructors
+        constructors += 1
+        return build_constructor(*args, **kwargs)
+
+    monkeypatch.setattr(retriever, "load_query_constructor_runnable", counted_constructor)
+    questions = _questions(6)
+
+    async def run():
+        llm = await install_query_path(corpus, NO_LATENCY)
+        for question in questions:
+            async for _ in arun_streaming_rag(question):
+                pass
+        return llm
+
+    llm = asyncio.run(run())
+    # `analyze` (k) e `retrieve` (k × RERANK_OVERFETCH) dividem o mesmo query constructor
+    assert constructors == 1
+    assert llm.query_calls == len(questions)
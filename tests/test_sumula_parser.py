@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from app.ingest import extract_text
+from app.ingest.conversion_cache import ConversionCache
+from app.ingest.manifest import file_sha256
+from app.ingest.sumula_parser import try_parse
+
+PDF_DIR = Path(__file__).resolve().parents[1] / "sumulas"
+
+
+def test_try_parse_accepts_every_sumula_pdf(corpus):
+    # O corpus já converteu os PDFs: os textos saem do cache de conversões
+    conversions = ConversionCache()
+    pdfs = sorted(PDF_DIR.glob("*.pdf"))
+    failures = {}
+    for pdf in pdfs:
+        text = conversions.get(file_sha256(pdf))
+        if text is None:
+            text = extract_text.convert_pdf(str(pdf))[1]
+        item, problems = try_parse(text, pdf.name)
+        if item is None:
+            failures[pdf.name] = problems
+        else:
+            assert item.chunks.conteudo_principal, pdf.name
+
+    assert len(pdfs) == 60
+    assert failures == {}